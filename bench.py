@@ -0,0 +1,776 @@
+"""Benchmarks de Tux Assistant
+
+Uso:
+    python bench.py            # Ejecuta todos los benchmarks
+    python bench.py router     # Ejecuta solo los indicados
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import main
+
+BENCHMARKS = {}
+
+def benchmark(name):
+    """Registra una función como benchmark"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+def measure(func, repeat=5):
+    """Mejor tiempo (segundos) de varias ejecuciones de func"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+PREGUNTAS = [
+    "¿Cuánta RAM tengo?",
+    "¿Qué procesos están consumiendo más CPU?",
+    "¿Qué distro uso?",
+    "Cual es mi IP pública",
+    "¿Cuánto espacio libre queda en el disco?",
+    "¿Cómo hago un bucle for en Python?",
+    "Explícame cómo crear un programa en C",
+    "¿Cómo cread una credencial SSH?",
+    "Hola Tux, ¿cómo estás?",
+    "¿Qué comando uso para comprimir una carpeta?",
+]
+
+# Hablan de memoria, red, procesos o del kernel pero piden una explicación: las responde la IA
+PREGUNTAS_IA = [
+    "Explícame la memoria virtual",
+    "¿Cómo veo el uso de memoria de un programa en Python?",
+    "¿Cómo configuro la red en Ubuntu?",
+    "¿Qué es el kernel de Linux?",
+    "¿Cómo mato un proceso?",
+]
+# ...y estas preguntan por el equipo: respuesta directa del sistema
+PREGUNTAS_SISTEMA = ["¿Cuánta RAM tengo?", "¿Cómo está mi memoria?", "¿Qué versión del kernel tengo?",
+                     "¿Qué es lo que más consume memoria?", "Cual es mi IP pública"]
+
+def legacy_is_system_question(text):
+    """Clasificación anterior: subcadenas sobre el texto en minúsculas"""
+    system_keywords = ['proceso', 'memoria', 'cpu', 'disco', 'almacenamiento',
+                       'sistema', 'consumiendo', 'ram', 'red', 'redes']
+    return any(keyword in text.lower() for keyword in system_keywords)
+
+@benchmark('router')
+def bench_router(rounds=2000):
+    """Preguntas clasificadas por segundo (enrutador vs. búsqueda de subcadenas)"""
+    corpus = PREGUNTAS * rounds
+    router = main.intent_router
+
+    def run_router():
+        for text in corpus:
+            router.route(text)
+
+    def run_legacy():
+        for text in corpus:
+            legacy_is_system_question(text)
+
+    router_time = measure(run_router)
+    legacy_time = measure(run_legacy)
+    print(f"  enrutador:           {len(corpus) / router_time:>12,.0f} preguntas/s")
+    print(f"  subcadenas (antes):  {len(corpus) / legacy_time:>12,.0f} preguntas/s")
+
+    # Falsos positivos del método anterior ("programa" contiene "ram", "cread" contiene "red")
+    for text in PREGUNTAS:
+        route = router.route(text)
+        routed = route.intent in main.SYSTEM_ANSWER_INTENTS and route.confidence >= main.ROUTE_MIN_CONFIDENCE
+        if routed != legacy_is_system_question(text):
+            print(f"  difiere: {text!r} -> {route.intent} ({route.confidence:.2f}), antes: {not routed}")
+
+    failures = 0
+    for text, expected in [(text, False) for text in PREGUNTAS_IA] + [(text, True) for text in PREGUNTAS_SISTEMA]:
+        route = router.route(text)
+        routed = route.intent in main.SYSTEM_ANSWER_INTENTS and route.confidence >= main.ROUTE_MIN_CONFIDENCE
+        failures += routed != expected
+        print(f"  {'✔' if routed == expected else '✘'} {text:<55} -> {route.intent} ({route.confidence:.2f}), "
+              f"{'sistema' if routed else 'IA'}")
+    return failures == 0
+
+@benchmark('http')
+def bench_http(rounds=200):
+    """Latencia de /api/version: cliente compartido vs. una sesión nueva por petición"""
+    import requests
+    client = main.ollama_client
+    if not client.healthy():
+        print("  Ollama no responde: benchmark omitido")
+        return
+    url = client.base_url + "/api/version"
+
+    def run_pooled():
+        for _ in range(rounds):
+            client.get("/api/version").content
+
+    def run_fresh():
+        for _ in range(rounds):
+            with requests.Session() as session:
+                session.get(url, timeout=main.OLLAMA_TIMEOUT).content
+
+    pooled_time = measure(run_pooled, repeat=3)
+    fresh_time = measure(run_fresh, repeat=3)
+    print(f"  cliente compartido:  {pooled_time / rounds * 1000:>8.2f} ms/petición")
+    print(f"  sesión nueva:        {fresh_time / rounds * 1000:>8.2f} ms/petición")
+    for path, metric in client.stats().items():
+        print(f"  {path}: {metric['count']} peticiones, media {metric['avg_ms']:.2f} ms, máx {metric['max_ms']:.2f} ms")
+
+def count_wakeups(seconds, setup=None):
+    """Eventos de temporizador que recibe la aplicación en `seconds` segundos"""
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    class TimerCounter(QObject):
+        def __init__(self):
+            super().__init__()
+            self.count = 0
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Timer:
+                self.count += 1
+            return False
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tux = main.TuxAssistant()
+    if setup:
+        setup(tux)
+    counter = TimerCounter()
+    app.installEventFilter(counter)
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec_()
+    app.removeEventFilter(counter)
+    tux.cleanup_threads()
+    tux.hide()
+    return counter.count * 60 / seconds
+
+@benchmark('wakeups')
+def bench_wakeups(seconds=10):
+    """Despertares por minuto con Tux en reposo (animación incluida y en pausa)"""
+    def pause_animation(tux):
+        tux.movie.setPaused(True)
+
+    print(f"  con animación:  {count_wakeups(seconds):>8.0f} despertares/min")
+    print(f"  en pausa:       {count_wakeups(seconds, pause_animation):>8.0f} despertares/min")
+
+    # El muestreador del sistema es un hilo: sus pasadas no son temporizadores de Qt
+    samples = [0]
+    sample = main.process_table.sample
+    def counting_sample():
+        samples[0] += 1
+        sample()
+    main.process_table.sample = counting_sample
+    sampler = main.SystemSampler(active_seconds=seconds / 2)
+    sampler.start()
+    time.sleep(seconds / 2)
+    active = sampler.passes
+    time.sleep(seconds / 2)
+    idle = sampler.passes - active
+    periodic_samples = samples[0]
+    sampler.refresh(main.PROCESS_SECTIONS)  # Una pregunta sobre procesos: las tres secciones a la vez
+    sampler.stop()
+    main.process_table.sample = sample
+    print(f"  muestreador activo: {active * 120 / seconds:>6.0f} pasadas/min, en reposo: {idle * 120 / seconds:.0f}")
+    print(f"  tabla de procesos:  {periodic_samples} recorridos en las pasadas, "
+          f"{samples[0] - periodic_samples} por una pregunta de procesos")
+
+LAYOUTS = {
+    'un monitor': [((0, 0, 1920, 1080), (0, 0, 1920, 1040))],
+    'dos monitores': [((0, 0, 2560, 1440), (0, 32, 2560, 1408)),
+                      ((2560, 0, 1920, 1080), (2560, 0, 1920, 1080))],
+    'tres monitores': [((1920, 0, 3840, 2160), (1920, 0, 3840, 2112)),
+                       ((0, 540, 1920, 1080), (0, 540, 1920, 1080)),
+                       ((5760, -420, 1080, 1920), (5760, -420, 1080, 1920))],
+}
+
+@benchmark('layout')
+def bench_layout(count=20000):
+    """Colocaciones (burbuja + chat) por segundo en distintas distribuciones de monitores"""
+    import random
+    solver = main.layout_solver
+    rng = random.Random(1)
+    for name, screens in LAYOUTS.items():
+        index = main.ScreenIndex([(main.Rect(*geometry), main.Rect(*available))
+                                  for geometry, available in screens])
+        # Posiciones del Tux repartidas por todas las pantallas (incluidos los bordes)
+        positions = []
+        for _ in range(count):
+            geometry = rng.choice(screens)[0]
+            positions.append(main.Rect(rng.randint(geometry[0] - 60, geometry[0] + geometry[2] - 70),
+                                       rng.randint(geometry[1] - 60, geometry[1] + geometry[3] - 70),
+                                       130, 130))
+
+        def run():
+            for tux in positions:
+                solver.solve(index, tux, (320, 120), (400, 500))
+
+        elapsed = measure(run)
+        print(f"  {name:<16} {count / elapsed:>12,.0f} colocaciones/s")
+
+@benchmark('drag')
+def bench_drag(seconds=2.0, rate=1000):
+    """Arrastre simulado con un ratón de alta frecuencia: eventos, colocaciones y latencia"""
+    from PyQt5.QtCore import Qt, QEvent, QPoint, QTimer
+    from PyQt5.QtGui import QMouseEvent
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tux = main.TuxAssistant()
+    tux.move(600, 500)
+    tux.bubble.show_text("Arrastrando a Tux por la pantalla", 60000, play_sound=False)
+    tux.get_chat_window().show()
+
+    solves = [0]
+    solve = main.layout_solver.solve
+    def counting_solve(*args, **kwargs):
+        solves[0] += 1
+        return solve(*args, **kwargs)
+    main.layout_solver.solve = counting_solve
+
+    def mouse_event(kind, local, global_pos):
+        return QMouseEvent(kind, local, global_pos, Qt.LeftButton, Qt.LeftButton, Qt.NoModifier)
+
+    start = tux.pos() + QPoint(60, 60)
+    tux.mousePressEvent(mouse_event(QEvent.MouseButtonPress, QPoint(60, 60), start))
+    total = int(seconds * rate)
+    step = [0]
+    started = time.perf_counter()
+
+    def tick():
+        # Varios eventos por tick si el temporizador se retrasa (ratón a `rate` Hz)
+        due = min(total, int((time.perf_counter() - started) * rate))
+        while step[0] < due:
+            step[0] += 1
+            offset = QPoint(step[0] % 400, (step[0] // 2) % 300)
+            tux.mouseMoveEvent(mouse_event(QEvent.MouseMove, QPoint(60, 60) + offset, start + offset))
+        if step[0] >= total:
+            timer.stop()
+            tux.mouseReleaseEvent(mouse_event(QEvent.MouseButtonRelease, QPoint(60, 60), start + offset))
+            QTimer.singleShot(50, app.quit)
+
+    timer = QTimer()
+    timer.timeout.connect(tick)
+    timer.start(1)
+    app.exec_()
+    main.layout_solver.solve = solve
+
+    report = tux.drag_stats.report()
+    print(f"  eventos de ratón:   {report['events']:>8}")
+    print(f"  frames aplicados:   {report['frames']:>8}")
+    print(f"  colocaciones:       {solves[0]:>8}")
+    print(f"  latencia media:     {report.get('avg_ms', 0):>8.2f} ms")
+    print(f"  latencia p95:       {report.get('p95_ms', 0):>8.2f} ms")
+    print(f"  latencia máxima:    {report.get('max_ms', 0):>8.2f} ms")
+    tux.cleanup_threads()
+    tux.hide()
+
+ANIMATION_SESSION = """
+import os, sys, time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import psutil
+import main
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+process = psutil.Process()
+rss = process.memory_info().rss
+started = time.perf_counter()
+cache = main.AnimationCache(main.TUX_ANIMATIONS, main.QSize(130, 130), max_bytes=int(sys.argv[1]))
+if sys.argv[2] == 'eager':
+    for name in main.TUX_ANIMATIONS:
+        cache.get(name)
+movie = cache.get('sentado')
+startup = time.perf_counter() - started
+startup_rss = process.memory_info().rss - rss
+# Sesión larga: todas las animaciones se muestran un rato
+for name in main.TUX_ANIMATIONS:
+    movie.stop()
+    cache.pin(name)
+    movie = cache.get(name)
+    movie.start()
+    until = time.perf_counter() + 0.3
+    while time.perf_counter() < until:
+        app.processEvents()
+print(startup * 1000, startup_rss / 1024, (process.memory_info().rss - rss) / 1024, len(cache.movies))
+"""
+
+@benchmark('animations')
+def bench_animations():
+    """Carga de animaciones: todas al inicio sin límite vs. bajo demanda con LRU"""
+    import subprocess
+    runs = [('todas al inicio', str(1 << 40), 'eager'),
+            ('bajo demanda', str(main.ANIMATION_CACHE_MAX_BYTES), 'lazy')]
+    for label, max_bytes, mode in runs:
+        output = subprocess.run([sys.executable, '-c', ANIMATION_SESSION, max_bytes, mode],
+                                capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        startup_ms, startup_kb, session_kb, loaded = output.stdout.split()[-4:]
+        print(f"  {label:<16} inicio {float(startup_ms):>6.2f} ms, RSS inicio +{float(startup_kb):>6.0f} KB, "
+              f"tras la sesión +{float(session_kb):>6.0f} KB ({loaded} cargadas)")
+
+@benchmark('frames')
+def bench_frames(seconds=5.0, name='busqueda2'):
+    """CPU en reproducción continua: QMovie escalando cada frame vs. frames ya escalados"""
+    import tempfile
+    from PyQt5.QtCore import QSize, QTimer
+    from PyQt5.QtGui import QMovie
+    from PyQt5.QtWidgets import QApplication, QLabel
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    path = main.TUX_ANIMATIONS[name]
+    size = QSize(130, 130)
+
+    def play(movie, connect):
+        label = QLabel()
+        label.resize(size)
+        label.show()
+        connect(label, movie)
+        movie.start()
+        cpu = time.process_time()
+        QTimer.singleShot(int(seconds * 1000), app.quit)
+        app.exec_()
+        movie.stop()
+        label.hide()
+        return (time.process_time() - cpu) / seconds * 100
+
+    movie = QMovie(path)
+    movie.setScaledSize(size)
+    qmovie_cpu = play(movie, lambda label, movie: label.setMovie(movie))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        main.FRAME_CACHE_DIR = cache_dir
+        started = time.perf_counter()
+        main.load_frame_animation(path, size)
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        animation = main.load_frame_animation(path, size)
+        warm = time.perf_counter() - started
+        cache_size = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir))
+    frames_cpu = play(animation, lambda label, animation: animation.frameChanged.connect(
+        lambda frame: label.setPixmap(animation.currentPixmap())))
+
+    print(f"  QMovie:               {qmovie_cpu:>6.2f} % CPU")
+    print(f"  frames en caché:      {frames_cpu:>6.2f} % CPU")
+    print(f"  carga sin caché:      {cold * 1000:>6.1f} ms (decodificar, escalar y guardar)")
+    print(f"  carga desde disco:    {warm * 1000:>6.1f} ms ({cache_size / 1024:.0f} KB en disco)")
+
+@benchmark('power')
+def bench_power(seconds=4.0):
+    """CPU de Tux en cada modo de energía de la animación (según AnimationPowerPolicy)"""
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tux = main.TuxAssistant()
+
+    def run(animation, inactivity_state='active', on_battery=False, exposed=True):
+        tux.inactivity_state = inactivity_state
+        # Coherente con check_inactivity (que corre cada 10 s)
+        tux.last_activity_time = time.time() - {'active': 0, 'idle': 90, 'relaxed': 400}[inactivity_state]
+        tux.relaxed_start_time = time.time()
+        tux.power_policy.on_battery = on_battery
+        tux.power_policy.last_battery_check = time.monotonic()
+        tux.window_exposed = exposed
+        tux.set_animation(animation)
+        tux.update_power_mode()
+        QTimer.singleShot(int(seconds * 1000), app.quit)
+        app.exec_()
+
+    # Normal y batería con la misma animación para comparar solo la velocidad
+    run('relajado3')
+    run('relajado3', on_battery=True)
+    run('relajado3', inactivity_state='relaxed')
+    run('sentado', inactivity_state='idle')
+    run('relajado3', exposed=False)
+    for mode, usage in tux.power_policy.stats().items():
+        if usage['seconds'] >= 1:
+            print(f"  {mode:<8} {usage['cpu_percent']:>6.2f} % CPU  ({usage['seconds']:.1f} s)")
+    tux.cleanup_threads()
+    tux.hide()
+
+@benchmark('sounds')
+def bench_sounds(plays=200):
+    """Coste por burbuja: decodificar el MP3 cada vez frente al banco de sonidos"""
+    import numpy as np
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    if not main.init_audio():
+        print("  sin audio disponible")
+        return
+    mixer = main.mixer
+    path = main.SOUNDS['bubble'][0]
+    if os.path.exists(path):
+        elapsed = measure(lambda: [mixer.Sound(path).play() for _ in range(20)], repeat=3)
+        print(f"  decodificar cada vez {elapsed / 20 * 1000:>9.3f} ms/burbuja")
+    bank = main.SoundBank(min_interval=0)
+    bank.preload()
+    elapsed = measure(lambda: [bank.play('bubble') for _ in range(plays)])
+    print(f"  banco de sonidos     {elapsed / plays * 1000:>9.3f} ms/burbuja")
+
+    # Ráfaga: 50 burbujas seguidas no deben ocupar más de un canal
+    mixer.stop()
+    bank = main.SoundBank()
+    played = sum(bank.play('bubble') for _ in range(50))
+    busy = sum(mixer.Channel(i).get_busy() for i in range(mixer.get_num_channels()))
+    print(f"  ráfaga de 50         {played:>5} reproducidas, {busy} canal(es) ocupados")
+    mixer.stop()
+
+    # Tono de respaldo: bucle por muestra (versión anterior) frente a NumPy
+    def loop_tone():
+        sample_rate = 44100
+        samples = []
+        for i in range(int(0.1 * sample_rate)):
+            samples.append(np.sin(2 * np.pi * 440 * i / sample_rate) * 0.5)
+        samples = (np.array(samples) * 32767).astype(np.int16)
+        return mixer.Sound(buffer=samples.tobytes())
+
+    loop = measure(loop_tone)
+    vectorized = measure(main.SoundBank.tone)
+    print(f"  tono con bucle       {loop * 1000:>9.3f} ms")
+    print(f"  tono vectorizado     {vectorized * 1000:>9.3f} ms")
+
+STARTUP_SESSION = """
+import json, os, sys, time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import main
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+# Mismos pasos que el arranque de main.py
+main.startup_mark('imports')
+main.start_background_services()
+app = QApplication(sys.argv)
+main.startup_mark('QApplication')
+tux = main.TuxAssistant()
+main.startup_mark('TuxAssistant')
+deadline = time.perf_counter() + 5
+
+def finish():
+    if not (tux.first_frame_shown and main.audio_ready.is_set()) and time.perf_counter() < deadline:
+        QTimer.singleShot(5, finish)
+        return
+    started = time.perf_counter()
+    tux.get_chat_window()
+    chat = time.perf_counter() - started
+    tux.cleanup_threads()
+    print(json.dumps([main.startup_phases, chat]))
+    app.quit()
+
+QTimer.singleShot(0, finish)
+app.exec_()
+"""
+
+@benchmark('startup')
+def bench_startup(runs=5):
+    """Arranque en frío: mediana de cada fase desde que se empieza a importar main"""
+    import json
+    import statistics
+    import subprocess
+    import tempfile
+    phases = {}
+    chat = []
+    with tempfile.TemporaryDirectory() as cache_home:
+        # Cachés vacías en la primera ejecución; el resto, como un arranque normal
+        env = dict(os.environ, XDG_CACHE_HOME=cache_home, XDG_DATA_HOME=cache_home)
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-c', STARTUP_SESSION], capture_output=True, text=True,
+                                    env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+            run_phases, chat_seconds = json.loads(output.stdout.strip().splitlines()[-1])
+            for phase, elapsed in run_phases:
+                phases.setdefault(phase, []).append(elapsed)
+            chat.append(chat_seconds)
+    for phase, values in sorted(phases.items(), key=lambda item: statistics.median(item[1])):
+        print(f"  {phase:<14} {statistics.median(values) * 1000:>7.1f} ms")
+    print(f"  ventana de chat (primer doble clic) {statistics.median(chat) * 1000:.1f} ms")
+
+class LegacyChat:
+    """Chat anterior: un QWidget + QHBoxLayout + QLabel con su hoja de estilos por mensaje"""
+
+    def __init__(self):
+        from PyQt5.QtWidgets import QScrollArea, QVBoxLayout, QWidget
+        self.view = QScrollArea()
+        self.view.setWidgetResizable(True)
+        self.view.setHorizontalScrollBarPolicy(main.Qt.ScrollBarAlwaysOff)
+        container = QWidget()
+        self.layout = QVBoxLayout(container)
+        self.layout.setSpacing(8)
+        self.layout.addStretch()
+        self.view.setWidget(container)
+
+    def add_message(self, text, is_user):
+        from PyQt5.QtWidgets import QHBoxLayout, QLabel, QWidget
+        widget = QWidget()
+        layout = QHBoxLayout(widget)
+        layout.setContentsMargins(10, 8, 10, 8)
+        label = QLabel(text)
+        label.setObjectName("messageText")
+        label.setWordWrap(True)
+        label.setMaximumWidth(300)
+        label.setStyleSheet("#messageText { background-color: #FF6C2C; color: #0A0A0F; border-radius: 15px; "
+                            "padding: 12px; font-family: 'Segoe UI', 'Arial'; font-size: 11pt; }")
+        if is_user:
+            layout.addStretch()
+        layout.addWidget(label)
+        self.layout.insertWidget(self.layout.count() - 1, widget)
+
+    def scroll_to_bottom(self):
+        scrollbar = self.view.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+class VirtualChat:
+    """Chat actual: ChatHistoryModel + ChatMessageDelegate"""
+
+    def __init__(self):
+        self.model = main.ChatHistoryModel()
+        self.view = main.ChatListView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(main.ChatMessageDelegate(self.view))
+        self.view.setVerticalScrollMode(main.QAbstractItemView.ScrollPerPixel)
+
+    def add_message(self, text, is_user):
+        self.model.append(text, is_user)
+
+    def scroll_to_bottom(self):
+        self.view.scrollToBottom()
+
+@benchmark('chat')
+def bench_chat(checkpoints=(100, 1000, 5000, 10000), samples=20, time_limit=60):
+    """Coste de añadir un mensaje y de desplazar el chat según el tamaño del historial"""
+    import psutil
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    process = psutil.Process()
+    text = "Para ver el espacio libre usa `df -h`; para una carpeta, `du -sh carpeta`.\nSegunda línea."
+    for label, chat_class in (('widgets', LegacyChat), ('modelo/vista', VirtualChat)):
+        chat = chat_class()
+        chat.view.resize(370, 400)
+        chat.view.show()
+        rss = process.memory_info().rss
+        started = time.perf_counter()
+        count = 0
+        for checkpoint in checkpoints:
+            while count < checkpoint - samples:
+                chat.add_message(f"{count}: {text}", count % 2 == 0)
+                count += 1
+                if count % 500 == 0:
+                    app.processEvents()
+            app.processEvents()
+
+            # Añadir: mensaje + recolocar + ir al final + dibujar
+            begin = time.perf_counter()
+            for _ in range(samples):
+                chat.add_message(f"{count}: {text}", count % 2 == 0)
+                count += 1
+                app.processEvents()
+                chat.scroll_to_bottom()
+                chat.view.viewport().repaint()
+            append_ms = (time.perf_counter() - begin) / samples * 1000
+
+            # Desplazar: una página hacia arriba por paso
+            scrollbar = chat.view.verticalScrollBar()
+            begin = time.perf_counter()
+            for step in range(samples):
+                scrollbar.setValue(max(0, scrollbar.value() - 300))
+                chat.view.viewport().repaint()
+            scroll_ms = (time.perf_counter() - begin) / samples * 1000
+            print(f"  {label:<13} {count:>6} mensajes: añadir {append_ms:>7.2f} ms, "
+                  f"desplazar {scroll_ms:>6.2f} ms, RSS +{(process.memory_info().rss - rss) / 1024 ** 2:>6.1f} MB")
+            if checkpoint != checkpoints[-1] and time.perf_counter() - started > time_limit:
+                print(f"  {label:<13} (se detiene: más de {time_limit} s)")
+                break
+        chat.view.hide()
+        chat.view.deleteLater()
+        app.processEvents()
+
+HISTORY_TOPICS = ["grub", "ssh", "docker", "particiones", "python", "systemd", "nvidia", "wifi", "cron", "firewall"]
+
+@benchmark('history')
+def bench_history(messages=100000, searches=50):
+    """Historial persistente: escritura por lotes y búsqueda FTS5 en 100k mensajes"""
+    import random
+    import statistics
+    import tempfile
+    rng = random.Random(7)
+    words = ("para hacer eso usa el comando con permisos de administrador revisa la configuracion "
+             "del servicio reinicia el equipo y comprueba los registros del sistema").split()
+    now = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        store = main.HistoryStore(os.path.join(directory, "history.sqlite3"))
+        store.start()
+        texts = []
+        begin = time.perf_counter()
+        for i in range(messages):
+            # Un tema raro (grub) y el resto repartidos; fechas de los últimos 60 días
+            topic = "grub" if rng.random() < 0.002 else rng.choice(HISTORY_TOPICS[1:])
+            text = " ".join(rng.sample(words, 12)) + f" {topic} {i}"
+            texts.append(text)
+            store.append(text, i % 2 == 0, now - (messages - i) * 60 * 60 * 24 * 60 / messages)
+        enqueue = time.perf_counter() - begin
+        store.flush()
+        total = time.perf_counter() - begin
+        print(f"  encolar (hilo de la interfaz) {enqueue / messages * 1e6:>8.2f} µs/mensaje")
+        print(f"  escritura por lotes           {messages / total:>8,.0f} mensajes/s ({store.batches} lotes)")
+
+        def timed(func):
+            samples = []
+            for _ in range(searches):
+                started = time.perf_counter()
+                result = func()
+                samples.append(time.perf_counter() - started)
+            return statistics.median(samples) * 1000, result
+
+        question = "¿Qué me dijiste de grub la semana pasada?"
+        elapsed, answer = timed(lambda: main.answer_from_history(question, store))
+        print(f"  «{question}» {elapsed:>6.2f} ms ({answer.count('•')} resultados)")
+        for label, terms in (('tema raro (grub)', ['grub']), ('tema común (docker)', ['docker']),
+                             ('dos temas', ['docker', 'nvidia'])):
+            elapsed, hits = timed(lambda: store.search(terms))
+            print(f"  FTS5 {label:<22} {elapsed:>6.2f} ms")
+        elapsed, hits = timed(lambda: [text for text in texts if 'grub' in text.lower()][-5:])
+        print(f"  recorrer la lista en memoria  {elapsed:>6.2f} ms")
+        store.stop()
+
+@benchmark('memory')
+def bench_memory(dim=768, sizes=(10000, 100000), queries=50):
+    """Memoria semántica: construir el índice, buscar top-k y memoria usada por cada 10k recuerdos"""
+    import statistics
+    import tempfile
+    import numpy as np
+    import psutil
+    process = psutil.Process()
+    rng = np.random.default_rng(3)
+    answer = "Para eso usa sudo update-grub y reinicia. " * 4
+    with tempfile.TemporaryDirectory() as directory:
+        index = main.MemoryIndex(directory)
+        for size in sizes:
+            rss = process.memory_info().rss
+            begin = time.perf_counter()
+            while index.count < size:
+                vectors = rng.standard_normal((main.MEMORY_BATCH_SIZE, dim), dtype=np.float32)
+                index.add(vectors, [(f"pregunta {index.count + i}", answer, time.time())
+                                    for i in range(len(vectors))])
+            build = time.perf_counter() - begin
+
+            samples = []
+            for _ in range(queries):
+                query = rng.standard_normal(dim, dtype=np.float32)
+                started = time.perf_counter()
+                index.search(query, min_score=-1)
+                samples.append(time.perf_counter() - started)
+            per_10k = 10000 / size
+            print(f"  {size:>7,} recuerdos: índice {build:>6.2f} s, top-{main.MEMORY_TOP_K} "
+                  f"{statistics.median(samples) * 1000:>6.2f} ms, por cada 10k: "
+                  f"{index.stats()['bytes'] * per_10k / 1024 ** 2:>5.1f} MB de vectores, "
+                  f"RSS +{(process.memory_info().rss - rss) * per_10k / 1024 ** 2:>5.1f} MB")
+
+        # Misma búsqueda sin NumPy (bucle de Python) sobre los primeros 10k
+        vectors = index.matrix[:10000].tolist()
+        query = rng.standard_normal(dim).tolist()
+        started = time.perf_counter()
+        sorted(range(len(vectors)), key=lambda i: -sum(a * b for a, b in zip(vectors[i], query)))[:3]
+        print(f"  bucle de Python (10k)         {(time.perf_counter() - started) * 1000:>8.2f} ms")
+
+        started = time.perf_counter()
+        reloaded = main.MemoryIndex(directory)
+        print(f"  reabrir {reloaded.count:,} recuerdos       {(time.perf_counter() - started) * 1000:>8.2f} ms")
+
+    # Embeddings por lotes frente a uno por petición (necesita Ollama)
+    if not main.ollama_client.healthy():
+        print("  (Ollama no responde: se omiten los embeddings)")
+        return
+    texts = [f"Pregunta: pregunta {i}\nRespuesta: {answer}" for i in range(128)]
+    try:
+        started = time.perf_counter()
+        for text in texts:
+            main.ollama_client.embed([text], model=main.EMBED_MODEL)
+        single = time.perf_counter() - started
+        started = time.perf_counter()
+        for i in range(0, len(texts), main.MEMORY_BATCH_SIZE):
+            main.ollama_client.embed(texts[i:i + main.MEMORY_BATCH_SIZE], model=main.EMBED_MODEL)
+        batched = time.perf_counter() - started
+    except Exception as e:
+        print(f"  (sin embeddings de {main.EMBED_MODEL}: {e})")
+        return
+    print(f"  embeddings uno a uno          {single / len(texts) * 1000:>8.2f} ms/par")
+    print(f"  embeddings en lotes de {main.MEMORY_BATCH_SIZE}     {batched / len(texts) * 1000:>8.2f} ms/par")
+
+# Regresiones del índice de comandos: (pregunta, órdenes aceptables; None = responde la IA, ¿opciones?)
+COMMAND_CHECKS = [
+    ("¿Cómo borro un archivo?", {None, 'rm'}, True),  # no shred ('...and optionally delete it')
+    ("como reinicio el servicio ssh", {None, 'systemctl', 'ssh'}, True),  # no systemd-halt.service
+    ("¿Qué hace ls?", {'ls'}, False),  # sin opciones que solo mencionan 'ls'
+    ("¿Cómo copio una carpeta?", {'cp'}, True),
+    ("¿Cómo hago un bucle for en Python?", {None}, True),
+    ("¿Cómo busco texto dentro de archivos?", {None, 'grep'}, True),  # no zipgrep
+    ("¿Cómo cuento las líneas de un archivo?", {None, 'wc'}, True),  # no fincore ('count pages...')
+    ("¿Qué comando uso para comprimir una carpeta?", {None, 'tar'}, True),  # gzip no comprime carpetas
+]
+# Preguntas que no deben pasar por el índice (van directas a la IA)
+COMMAND_ROUTE_CHECKS = ["Hola Tux, ¿cómo estás?", "¿Cómo hago un bucle for en Python?"]
+
+@benchmark('commands')
+def bench_commands(queries=50):
+    """Índice de comandos: construirlo desde /usr/share/man, ponerlo al día y responder sin la IA"""
+    import statistics
+    import tempfile
+    questions = ["¿Cómo copio una carpeta?", "¿Cómo veo las últimas líneas de un archivo?",
+                 "¿Cómo cambio el dueño de un archivo?", "¿Cómo cambio los permisos de un archivo?",
+                 "¿Cómo ordeno las líneas de un archivo?", "¿Cómo creo un usuario?", "¿Para qué sirve chmod?",
+                 "¿Qué comando uso para comprimir una carpeta?", "¿Cómo se descomprime un tar.gz?",
+                 "¿Cómo hago un bucle for en Python?"]
+    with tempfile.TemporaryDirectory() as directory:
+        index = main.CommandIndex(os.path.join(directory, "commands.sqlite3"))
+        build = index.update()
+        print(f"  construir ({build['pages']:,} páginas)     {build['seconds'] * 1000:>8.0f} ms")
+        update = index.update()
+        print(f"  poner al día sin cambios      {update['seconds'] * 1000:>8.1f} ms")
+        # Simular una página modificada: solo esa se vuelve a leer
+        with index._connect() as connection:
+            connection.execute("UPDATE sources SET mtime = 0 WHERE rowid = 1")
+        update = index.update()
+        print(f"  poner al día con 1 cambiada   {update['seconds'] * 1000:>8.1f} ms ({update['changed']} página)")
+        print(f"  tamaño del índice             {index.stats().get('bytes', 0) / 1024 ** 2:>8.1f} MB")
+
+        for question in questions:
+            samples = []
+            for _ in range(queries):
+                started = time.perf_counter()
+                answer = main.answer_from_commands(question, index)
+                samples.append(time.perf_counter() - started)
+            result = answer.split(":")[0][2:] if answer else "(IA)"
+            print(f"  {question:<45} {statistics.median(samples) * 1000:>6.2f} ms -> {result}")
+
+        failures = 0
+        for question, accepted, options in COMMAND_CHECKS:
+            answer = main.answer_from_commands(question, index)
+            name = answer.split(":")[0][2:].split()[0] if answer else None
+            ok = name in accepted and (options or "•" not in answer)
+            failures += not ok
+            print(f"  {'✔' if ok else '✘'} {question:<43} -> {name or '(IA)'}")
+        for question in COMMAND_ROUTE_CHECKS:
+            intent = main.intent_router.route(question).intent
+            ok = intent != 'comandos'
+            failures += not ok
+            print(f"  {'✔' if ok else '✘'} {question:<43} -> intención {intent}")
+        index.close()
+    return failures == 0
+
+def main_cli(names):
+    names = names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Benchmark desconocido: {name} (disponibles: {', '.join(BENCHMARKS)})")
+            return 1
+    status = 0
+    for name in names:
+        print(f"[{name}] {BENCHMARKS[name].__doc__}")
+        if BENCHMARKS[name]() is False:
+            # El benchmark incluye comprobaciones y alguna falló
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main_cli(sys.argv[1:]))
@@ -1,34 +1,119 @@
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 
-import pygame
-from pygame import mixer
+import time
+STARTUP_T0 = time.perf_counter()  # Inicio del arranque (para medir cada fase)
 
 import sys
 import signal
-import requests
 import subprocess
-import time
 import socket
+import struct
+import gzip
+import zlib
 
-from PyQt5.QtWidgets import QApplication, QLabel, QInputDialog, QLineEdit, QTextEdit, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QScrollArea, QFrame
-from PyQt5.QtCore import Qt, QPoint, QSize, QTimer, QThread, pyqtSignal, QRect, QPropertyAnimation, QEasingCurve
-from PyQt5.QtGui import QMovie, QGuiApplication, QCursor, QPainter, QBrush, QPen, QPolygon, QColor, QFont
+from PyQt5.QtWidgets import QApplication, QLabel, QInputDialog, QLineEdit, QTextEdit, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QScrollArea, QFrame, QListView, QAbstractItemView, QStyledItemDelegate, QStyle
+from PyQt5.QtCore import Qt, QEvent, QObject, QPoint, QPointF, QRectF, QSize, QTimer, QThread, pyqtSignal, QRect, QPropertyAnimation, QEasingCurve, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QMovie, QImage, QImageReader, QPixmap, QGuiApplication, QCursor, QPainter, QBrush, QPen, QPolygon, QColor, QFont, QKeySequence, QTextLayout, QTextOption
 
 import psutil
 import platform
 import datetime
 import socket as sock
 import json
-from typing import Dict, List
+import re
+import heapq
+import hashlib
+import unicodedata
+import logging
+import math
+import operator
+import threading
+import queue
+import sqlite3
+import functools
+from array import array
+from collections import OrderedDict, deque
+from typing import Dict, List, NamedTuple, Optional
 
 import getpass
 USERNAME = getpass.getuser()
 
+logger = logging.getLogger("tux")
+
+# pygame y requests tardan en importarse: se importan al usarlos por primera vez
+pygame = None
+mixer = None
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_URL = OLLAMA_BASE_URL + "/api/generate"
 MODEL_NAME = "mistral"
 OLLAMA_PORT = 11434
+OLLAMA_READY_TIMEOUT = 60  # Segundos máximos esperando a que Ollama responda
+# Cuánto tiempo mantiene Ollama el modelo cargado en memoria (ej. "30m", "2h", "-1" = siempre)
+OLLAMA_KEEP_ALIVE = os.environ.get("TUX_KEEP_ALIVE", "30m")
+WARMUP_MIN_INTERVAL = 60  # Segundos mínimos entre dos precargas del modelo
+OLLAMA_TIMEOUT = (5, 60)  # Segundos para conectar / entre dos fragmentos de la respuesta
+OLLAMA_CONNECT_RETRIES = 3  # Reintentos si la conexión es rechazada (Ollama reiniciándose)
+AI_STOP_TIMEOUT_MS = 500  # Espera máxima de la interfaz al cancelar una respuesta de la IA
+OLLAMA_MAX_CONCURRENT = int(os.environ.get("TUX_OLLAMA_CONCURRENCY", "1"))  # Peticiones simultáneas a Ollama
+OLLAMA_SLOW_SECONDS = 20  # Primer fragmento más lento que esto: Ollama está saturado
+OLLAMA_BUSY_RETRIES = 2  # Reintentos de una pregunta cuando Ollama responde 503
+OLLAMA_BACKOFF_MAX = 30  # Segundos máximos de espera tras un 503
+SCHEDULER_MAX_QUEUE = 8  # Trabajos pendientes como máximo en la cola del asistente
+
+# 🗃️ Datos locales (caché de respuestas, etc.)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "tux_assistant")
+ANSWER_CACHE_PATH = os.path.join(CACHE_DIR, "answer_cache.json")
+ANSWER_CACHE_MAX_ENTRIES = 256
+ANSWER_CACHE_MAX_BYTES = 1024 * 1024  # Tamaño máximo del archivo de caché
+FRAME_CACHE_DIR = os.path.join(CACHE_DIR, "frames")  # Frames de las animaciones ya escalados
+DATA_DIR = os.path.join(os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")), "tux_assistant")
+HISTORY_DB_PATH = os.path.join(DATA_DIR, "history.sqlite3")  # Historial del chat (SQLite + FTS5)
+HISTORY_BATCH_SECONDS = 1.0  # Espera máxima antes de escribir un lote de mensajes
+HISTORY_BATCH_SIZE = 500  # Mensajes como máximo por transacción
+HISTORY_MEMORY_MESSAGES = 1000  # Mensajes recientes que el chat guarda en memoria
+HISTORY_SEARCH_LIMIT = 5  # Resultados al buscar en el historial
+MEMORY_DIR = os.path.join(DATA_DIR, "memory")  # Memoria semántica (vectores + preguntas/respuestas)
+EMBED_MODEL = os.environ.get("TUX_EMBED_MODEL", "nomic-embed-text")  # Modelo de Ollama para los embeddings
+MEMORY_TOP_K = 3  # Recuerdos como máximo en cada prompt
+MEMORY_MIN_SCORE = 0.55  # Similitud coseno mínima para que un recuerdo se use
+MEMORY_BATCH_SIZE = 32  # Pares pregunta/respuesta por petición de embeddings
+MEMORY_BATCH_SECONDS = 2.0  # Espera máxima para juntar un lote
+MEMORY_RETRY_SECONDS = 30  # Espera antes de reintentar si Ollama no pudo calcular embeddings
+MEMORY_MAX_PENDING = 256  # Pares esperando embedding como máximo (se descartan los más viejos)
+MEMORY_EMBED_CHARS = 1500  # Caracteres de cada par que se envían al modelo
+MEMORY_RECALL_WAIT = 0.25  # Espera máxima por los recuerdos antes de generar (el resto sigue en segundo plano)
+MEMORY_RECALL_TIMEOUT = 30  # Segundos para el embedding de la pregunta (incluye cargar el modelo)
+COMMAND_INDEX_PATH = os.path.join(CACHE_DIR, "commands.sqlite3")  # Índice de las páginas man/tldr (se puede borrar)
+COMMAND_MAN_DIRS = ["/usr/share/man", "/usr/local/share/man"]
+COMMAND_MAN_SECTIONS = ["man1", "man8", "es/man1", "es/man8"]  # Órdenes de usuario y de administración
+COMMAND_TLDR_DIRS = [os.path.expanduser("~/.local/share/tldr/pages.es"), os.path.expanduser("~/.local/share/tldr/pages"),
+                     os.path.expanduser("~/.cache/tldr/pages"), "/usr/share/tldr/pages"]
+COMMAND_COLUMN_WEIGHTS = (10.0, 4.0, 1.0)  # Peso BM25 del nombre, el resumen y las opciones
+COMMAND_CANDIDATES = 30  # Páginas candidatas de FTS5 que se vuelven a ordenar
+COMMAND_TITLE_BOOST = 2.0  # Bonificación si las palabras de la pregunta están en el nombre o el resumen
+COMMAND_MIN_SCORE = 8.0  # Puntaje BM25 mínimo para responder sin la IA
+COMMAND_MIN_COVERAGE = 0.6  # Fracción mínima de las palabras de la pregunta presentes en la página
+COMMAND_MIN_TITLE_COVERAGE = 1.0  # Fracción mínima presente en el nombre o el resumen (NAME): todas
+COMMAND_VERB_BOOST = 1.0  # Bonificación si el resumen empieza con el verbo de la pregunta ('remove files...')
+COMMAND_MIN_MARGIN = 1.5  # Ventaja mínima sobre la siguiente página candidata
+COMMAND_SUBCOMMAND_PENALTY = 0.8  # Las páginas de subórdenes (git-mv, dpkg-deb) pesan menos que la orden principal
+COMMAND_ANSWER_LINES = 3  # Opciones o ejemplos que se muestran
+COMMAND_TAG_CHARS = 80  # Caracteres máximos de una opción ('-a, --all')
+COMMAND_OPTION_CHARS = 200  # Caracteres máximos de la descripción de una opción
+COMMAND_BODY_CHARS = 20000  # Caracteres de opciones que se indexan por página
+COMMAND_OPTIMIZE_CHANGES = 200  # Páginas cambiadas a partir de las que se compacta el índice
+STREAM_RESPONSES = True  # Mostrar la respuesta token a token mientras se genera
+STREAM_FRAME_MS = 16  # Intervalo (~1 frame) para agrupar actualizaciones parciales
+CHAT_MAX_ROWS = 200  # Mensajes en la vista del chat a la vez (los anteriores se cargan al subir)
+CHAT_FETCH_ROWS = 100  # Mensajes anteriores que se cargan al llegar arriba del chat
+CHAT_LAYOUT_CACHE = 1024  # Textos ya maquetados que guarda el delegado del chat
+CONVERSATION_MAX_CONTEXT = 3072  # Tokens de contexto antes de reiniciar la conversación
+SYSTEM_ANSWER_TIMEOUT_MS = 5000  # Tiempo máximo para una respuesta del sistema
+PUBLIC_IP_TIMEOUT = 3  # Segundos para consultar la IP pública
+PUBLIC_IP_TTL = 300  # Segundos que se reutiliza la IP pública obtenida
 
 TUX_SYSTEM_PROMPT = f"""
 Eres TUX, la mascota oficial de Linux.
@@ -56,6 +141,13 @@ TUX_ANIMATIONS = {
     'caminando': 'assets/tux_caminando.gif'
 }
 
+THINKING_ANIMATIONS = ['busqueda', 'busqueda2']
+ANIMATION_CACHE_MAX_BYTES = 2 * 1024 * 1024  # Memoria máxima de frames de animaciones cargadas
+ANIMATION_IDLE_SECONDS = 180  # Animaciones sin usar más tiempo que esto se liberan
+# Velocidad de la animación (%) según el modo de energía; 0 = imagen fija
+ANIMATION_POWER_SPEED = {'normal': 100, 'battery': 50, 'relaxed': 25, 'idle': 0, 'hidden': 0}
+BATTERY_CHECK_INTERVAL = 60  # Segundos entre consultas del estado de la batería
+
 def verify_animations():
     """Verifica que existan todas las animaciones"""
     missing = []
@@ -68,238 +160,2092 @@ def verify_animations():
         return False
     return True
 
+# ⏱️ TIEMPOS DE ARRANQUE
+startup_phases = []  # (fase, segundos desde STARTUP_T0)
+STARTUP_LOG_LEVEL = logging.WARNING if os.environ.get("TUX_STARTUP_TIMES") else logging.INFO  # Visibles sin TUX_DEBUG
+
+def startup_mark(phase):
+    """Registra cuánto tardó el arranque en llegar a una fase"""
+    elapsed = time.perf_counter() - STARTUP_T0
+    startup_phases.append((phase, elapsed))
+    logger.log(STARTUP_LOG_LEVEL, "Arranque: %s en %.0f ms", phase, elapsed * 1000)
+
 # 🔍 Verificar si Ollama está corriendo
 def ollama_running():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(("127.0.0.1", OLLAMA_PORT)) == 0
 
+# Momento en que se lanzó `ollama serve` (para medir el tiempo hasta que responde)
+ollama_launch_time = None
+ollama_process = None
+
 # 🚀 Iniciar Ollama
 def start_ollama():
+    """Lanza `ollama serve` sin esperar; OllamaReadinessProbe avisa cuando responde"""
+    global ollama_launch_time, ollama_process
     if not ollama_running():
         # print("Iniciando Ollama...")
-        process = subprocess.Popen(
-            ["ollama", "serve"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        time.sleep(3)
-        return process
+        ollama_launch_time = time.monotonic()
+        try:
+            ollama_process = subprocess.Popen(
+                ["ollama", "serve"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except OSError as e:
+            logger.warning("No se pudo lanzar Ollama: %s", e)
+            return None
+        return ollama_process
     return None
 
+# 🌐 CLIENTE HTTP DE OLLAMA
+# Token de cancelación de la petición que está enviando cada hilo
+_request_scope = threading.local()
+
+def cancellable_adapter(**kwargs):
+    """HTTPAdapter cuyas conexiones se registran en el CancellationToken del hilo antes de enviar
+    
+    Se crea al abrir la sesión para no importar requests/urllib3 al arrancar.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection
+    from urllib3.connectionpool import HTTPConnectionPool
+    
+    class CancellableConnection(HTTPConnection):
+        def request(self, *args, **kw):
+            token = getattr(_request_scope, 'token', None)
+            if token is not None:
+                # Conectar aquí para que el socket exista antes de esperar la respuesta
+                if self.sock is None:
+                    self.connect()
+                token.attach(self)
+            super().request(*args, **kw)
+    
+    class CancellablePool(HTTPConnectionPool):
+        ConnectionCls = CancellableConnection
+    
+    class CancellableAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kw):
+            super().init_poolmanager(*args, **kw)
+            self.poolmanager.pool_classes_by_scheme = {'http': CancellablePool}
+    
+    return CancellableAdapter(**kwargs)
+
+class OllamaClient:
+    """Cliente compartido para todo el tráfico con Ollama
+    
+    Reutiliza conexiones (pool), aplica timeouts reales de conexión/lectura,
+    reintenta con espera exponencial si la conexión es rechazada y guarda
+    la latencia de cada petición por endpoint.
+    """
+    
+    def __init__(self, base_url=OLLAMA_BASE_URL, timeout=OLLAMA_TIMEOUT,
+                 retries=OLLAMA_CONNECT_RETRIES, pool_size=OLLAMA_MAX_CONCURRENT + 2):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self._session = None
+        self.metrics = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def session(self):
+        """Sesión HTTP creada en la primera petición (importa requests)"""
+        with self.lock:
+            if self._session is None:
+                import requests
+                
+                session = requests.Session()
+                # Ollama es local: sin proxies del entorno
+                session.trust_env = False
+                adapter = cancellable_adapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+    
+    def request(self, method, path, timeout=None, retries=None, cancel_token=None, **kwargs):
+        """Petición a Ollama; con stream=True la latencia es hasta recibir las cabeceras
+        
+        Con cancel_token, la conexión queda registrada en él desde antes de enviar.
+        """
+        import requests
+        from urllib3.exceptions import NewConnectionError
+        
+        url = self.base_url + path
+        retries = self.retries if retries is None else retries
+        delay = 0.1
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            _request_scope.token = cancel_token
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                reason = getattr(e.args[0], 'reason', None) if e.args else None
+                if attempt < retries and isinstance(reason, NewConnectionError):
+                    # La petición no llegó a enviarse: se puede repetir sin riesgo
+                    time.sleep(delay)
+                    delay *= 2
+                    continue
+                self._record(path, time.perf_counter() - started, ok=False)
+                raise
+            except requests.exceptions.RequestException:
+                self._record(path, time.perf_counter() - started, ok=False)
+                raise
+            finally:
+                _request_scope.token = None
+            
+            self._record(path, time.perf_counter() - started, ok=response.status_code < 500)
+            return response
+    
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+    
+    def generate(self, payload, stream=False, timeout=None, cancel_token=None):
+        return self.post("/api/generate", json=payload, stream=stream, timeout=timeout, cancel_token=cancel_token)
+    
+    def embed(self, texts, model=EMBED_MODEL, timeout=None):
+        """Vectores de embedding de una lista de textos"""
+        response = self.post("/api/embed", json={"model": model, "input": texts}, timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("embeddings", [])
+    
+    def healthy(self, timeout=(0.5, 2)):
+        """True si Ollama responde a /api/version (sin reintentos)"""
+        import requests
+        
+        try:
+            return self.get("/api/version", timeout=timeout, retries=0).ok
+        except requests.exceptions.RequestException:
+            return False
+    
+    def _record(self, path, elapsed, ok=True):
+        with self.lock:
+            metric = self.metrics.setdefault(path, {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0, 'last': 0.0})
+            metric['count'] += 1
+            metric['total'] += elapsed
+            metric['max'] = max(metric['max'], elapsed)
+            metric['last'] = elapsed
+            if not ok:
+                metric['errors'] += 1
+        logger.debug("Ollama %s: %.1f ms%s", path, elapsed * 1000, "" if ok else " (error)")
+    
+    def stats(self):
+        """Latencias por endpoint en milisegundos"""
+        with self.lock:
+            return {
+                path: {
+                    'count': metric['count'],
+                    'errors': metric['errors'],
+                    'avg_ms': metric['total'] / metric['count'] * 1000,
+                    'max_ms': metric['max'] * 1000,
+                    'last_ms': metric['last'] * 1000,
+                }
+                for path, metric in self.metrics.items()
+            }
+    
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+ollama_client = OllamaClient()
+
+class OllamaReadinessProbe(QThread):
+    """Consulta /api/version con espera exponencial hasta que Ollama responde"""
+    ready = pyqtSignal(float)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, started_at=None, timeout=OLLAMA_READY_TIMEOUT, launch=False):
+        super().__init__()
+        self.started_at = started_at or time.monotonic()
+        self.timeout = timeout
+        self.launch = launch
+        self._stop_event = threading.Event()
+        
+    def run(self):
+        # Lanzar `ollama serve` aquí para no retrasar la primera imagen del Tux
+        if self.launch and start_ollama() is not None:
+            self.started_at = ollama_launch_time
+        
+        delay = 0.05
+        while not self._stop_event.is_set():
+            if ollama_client.healthy():
+                self.ready.emit(time.monotonic() - self.started_at)
+                return
+            
+            if time.monotonic() - self.started_at + delay > self.timeout:
+                self.failed.emit("Ollama no respondió a tiempo")
+                return
+            
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, 1.0)
+    
+    def stop(self):
+        self._stop_event.set()
+
 # 🔧 FUNCIONES PARA RECOPILAR INFORMACIÓN DEL SISTEMA
+def _collect_sistema() -> Dict:
+    """Información básica del sistema"""
+    return {
+        'sistema_operativo': platform.system(),
+        'distribucion': platform.freedesktop_os_release().get('PRETTY_NAME', 'Desconocida') 
+            if os.path.exists('/etc/os-release') else platform.platform(),
+        'version_kernel': platform.release(),
+        'arquitectura': platform.machine(),
+        'hostname': sock.gethostname(),
+        'usuario': USERNAME,
+        'fecha_hora': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'zona_horaria': time.tzname[0] if time.daylight else time.tzname[1]
+    }
+
+def _collect_cpu(interval=0.1) -> Dict:
+    """Información de CPU (interval=None no bloquea: mide desde la llamada anterior)"""
+    freq = psutil.cpu_freq()
+    return {
+        'nucleos_fisicos': psutil.cpu_count(logical=False),
+        'nucleos_logicos': psutil.cpu_count(logical=True),
+        'uso_actual': f"{psutil.cpu_percent(interval=interval)}%",
+        'frecuencia_actual': f"{freq.current:.2f} MHz" if freq else "N/A"
+    }
+
+def _collect_memoria() -> Dict:
+    """Información de memoria"""
+    mem = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    return {
+        'total_ram': f"{mem.total / (1024**3):.2f} GB",
+        'ram_disponible': f"{mem.available / (1024**3):.2f} GB",
+        'ram_usada': f"{mem.used / (1024**3):.2f} GB",
+        'porcentaje_ram_usada': f"{mem.percent}%",
+        'total_swap': f"{swap.total / (1024**3):.2f} GB" if swap.total > 0 else "0 GB",
+        'swap_usada': f"{swap.used / (1024**3):.2f} GB" if swap.total > 0 else "0 GB"
+    }
+
+def _collect_discos() -> List[Dict]:
+    """Información de disco"""
+    disk_info = []
+    for partition in psutil.disk_partitions():
+        try:
+            usage = psutil.disk_usage(partition.mountpoint)
+            disk_info.append({
+                'dispositivo': partition.device,
+                'punto_montaje': partition.mountpoint,
+                'sistema_archivos': partition.fstype,
+                'total': f"{usage.total / (1024**3):.2f} GB",
+                'usado': f"{usage.used / (1024**3):.2f} GB",
+                'libre': f"{usage.free / (1024**3):.2f} GB",
+                'porcentaje_usado': f"{usage.percent}%"
+            })
+        except:
+            continue
+    return disk_info
+
+class ProcessEntry:
+    """Estado de un proceso entre muestras"""
+    __slots__ = ('pid', 'create_time', 'name', 'process', 'cpu_total', 'io_total',
+                 'rss', 'cpu', 'io', 'sampled_at', 'io_denied')
+
+    def __init__(self, process, create_time, name):
+        self.pid = process.pid
+        self.create_time = create_time
+        self.name = name
+        self.process = process
+        self.cpu_total = 0.0
+        self.io_total = 0
+        self.rss = 0
+        self.cpu = 0.0  # % de CPU entre las dos últimas muestras
+        self.io = 0.0  # Bytes/s leídos + escritos entre las dos últimas muestras
+        self.sampled_at = None
+        self.io_denied = False
+
+PROCESS_BASELINE_AGE = 10.0  # Con una muestra más vieja, los deltas no dicen nada del momento actual
+PROCESS_SAMPLE_WINDOW = 0.2  # Segundos entre las dos muestras que se toman entonces
+
+class ProcessTable:
+    """Tabla de procesos persistente entre muestras, indexada por (pid, create_time)"""
+    def __init__(self):
+        self.entries = {}  # (pid, create_time) -> ProcessEntry
+        self.keys_by_pid = {}  # pid -> (pid, create_time)
+        self.sampled_at = None
+        self.lock = threading.Lock()
+
+    def sample(self):
+        """Actualiza la tabla: los PIDs nuevos se leen completos, los conocidos solo sus contadores"""
+        with self.lock:
+            now = time.monotonic()
+            alive = set()
+            
+            for pid in psutil.pids():
+                key = self.keys_by_pid.get(pid)
+                entry = self.entries.get(key) if key else None
+                
+                if entry is not None and self._update(entry, now):
+                    alive.add(key)
+                    continue
+                
+                # PID nuevo (o reutilizado por otro proceso): leerlo completo
+                if entry is not None:
+                    del self.entries[key]
+                entry = self._add(pid, now)
+                if entry is not None:
+                    alive.add(self.keys_by_pid[pid])
+            
+            # Olvidar los procesos que terminaron
+            for key in set(self.entries) - alive:
+                del self.entries[key]
+                if self.keys_by_pid.get(key[0]) == key:
+                    del self.keys_by_pid[key[0]]
+            
+            self.sampled_at = now
+
+    def refresh(self, max_age=1.0):
+        """Muestrea solo si la última muestra es más vieja que max_age segundos
+        
+        La tabla se lee solo al preguntar por procesos: si la muestra anterior
+        es vieja (o no hay), se toman dos seguidas para medir el uso actual.
+        """
+        if self.sampled_at is None or time.monotonic() - self.sampled_at >= PROCESS_BASELINE_AGE:
+            self.sample()
+            time.sleep(PROCESS_SAMPLE_WINDOW)
+            self.sample()
+        elif time.monotonic() - self.sampled_at >= max_age:
+            self.sample()
+
+    def _add(self, pid, now):
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                entry = ProcessEntry(process, process.create_time(), process.name())
+                self._read_counters(entry)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self.keys_by_pid.pop(pid, None)
+            return None
+        
+        entry.sampled_at = now
+        key = (pid, entry.create_time)
+        self.entries[key] = entry
+        self.keys_by_pid[pid] = key
+        return entry
+
+    def _update(self, entry, now):
+        """Calcula los deltas de CPU y E/S; False si el PID ya no es el mismo proceso"""
+        cpu_before = entry.cpu_total
+        io_before = entry.io_total
+        try:
+            # is_running() compara el create_time actual del PID con el guardado:
+            # detecta un PID reutilizado aunque sus contadores sean mayores
+            if not entry.process.is_running():
+                return False
+            with entry.process.oneshot():
+                self._read_counters(entry)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+        
+        # Los contadores acumulados nunca bajan: si lo hacen, el PID fue reutilizado
+        if entry.cpu_total < cpu_before or entry.io_total < io_before:
+            return False
+        
+        elapsed = now - entry.sampled_at
+        if elapsed > 0:
+            entry.cpu = (entry.cpu_total - cpu_before) / elapsed * 100
+            entry.io = (entry.io_total - io_before) / elapsed
+        entry.sampled_at = now
+        return True
+
+    def _read_counters(self, entry):
+        cpu_times = entry.process.cpu_times()
+        entry.cpu_total = cpu_times.user + cpu_times.system
+        entry.rss = entry.process.memory_info().rss
+        
+        if not entry.io_denied:
+            try:
+                io = entry.process.io_counters()
+                entry.io_total = io.read_bytes + io.write_bytes
+            except (psutil.AccessDenied, AttributeError, NotImplementedError):
+                # Procesos de otros usuarios: no volver a intentarlo
+                entry.io_denied = True
+
+    def top(self, n=10, by='cpu') -> List[ProcessEntry]:
+        """Los n procesos con mayor 'cpu', 'rss' o 'io' (heap, sin ordenar toda la tabla)"""
+        with self.lock:
+            return heapq.nlargest(n, self.entries.values(), key=operator.attrgetter(by))
+
+    def top_as_dicts(self, n=10, by='cpu', min_value=0.0) -> List[Dict]:
+        """Los procesos principales con el formato de get_system_info()"""
+        total_memory = psutil.virtual_memory().total
+        procesos = []
+        for entry in self.top(n, by):
+            if getattr(entry, by) <= min_value:
+                break
+            procesos.append({
+                'pid': entry.pid,
+                'nombre': entry.name,
+                'cpu': f"{entry.cpu:.1f}%",
+                'memoria': f"{entry.rss / total_memory * 100:.1f}%",
+                'rss': f"{entry.rss / (1024**2):.1f} MB",
+                'io': f"{entry.io / (1024**2):.2f} MB/s"
+            })
+        return procesos
+
+process_table = ProcessTable()
+
+def _collect_procesos_top() -> List[Dict]:
+    """Procesos en ejecución que más CPU consumen"""
+    try:
+        return process_table.top_as_dicts(10, by='cpu', min_value=0.1)
+    except:
+        return []
+
+def _collect_procesos_memoria() -> List[Dict]:
+    """Procesos que más memoria (RSS) usan"""
+    try:
+        return process_table.top_as_dicts(10, by='rss')
+    except:
+        return []
+
+def _collect_procesos_io() -> List[Dict]:
+    """Procesos con más lectura/escritura en disco"""
+    try:
+        return process_table.top_as_dicts(10, by='io')
+    except:
+        return []
+
+def _collect_red() -> List[Dict]:
+    """Información de red"""
+    net_info = []
+    try:
+        for interface, addrs in psutil.net_if_addrs().items():
+            for addr in addrs:
+                if addr.family == sock.AF_INET:
+                    net_info.append({
+                        'interfaz': interface,
+                        'ip': addr.address,
+                        'mascara': addr.netmask
+                    })
+    except:
+        pass
+    return net_info
+
+def _collect_carga_sistema() -> Dict:
+    """Información de carga del sistema"""
+    load = os.getloadavg()
+    return {
+        '1_minuto': load[0],
+        '5_minutos': load[1],
+        '15_minutos': load[2]
+    }
+
+def _collect_uptime() -> str:
+    """Tiempo de actividad"""
+    uptime = datetime.datetime.now() - datetime.datetime.fromtimestamp(psutil.boot_time())
+    return str(uptime).split('.')[0]
+
+def _collect_home_usuario() -> Dict:
+    """Espacio en directorio home del usuario"""
+    home_path = os.path.expanduser("~")
+    try:
+        home_usage = psutil.disk_usage(home_path)
+        return {
+            'ruta': home_path,
+            'total': f"{home_usage.total / (1024**3):.2f} GB",
+            'usado': f"{home_usage.used / (1024**3):.2f} GB",
+            'libre': f"{home_usage.free / (1024**3):.2f} GB",
+            'porcentaje_usado': f"{home_usage.percent}%"
+        }
+    except:
+        return {'ruta': home_path, 'error': 'No se pudo leer'}
+
+# Secciones que leen la tabla de procesos: se refresca una vez antes de recopilarlas juntas
+PROCESS_SECTIONS = ('procesos_top', 'procesos_memoria', 'procesos_io')
+
+# Secciones de get_system_info y la función que recopila cada una
+SYSTEM_COLLECTORS = {
+    'sistema': _collect_sistema,
+    'cpu': _collect_cpu,
+    'memoria': _collect_memoria,
+    'discos': _collect_discos,
+    'procesos_top': _collect_procesos_top,
+    'procesos_memoria': _collect_procesos_memoria,
+    'procesos_io': _collect_procesos_io,
+    'red': _collect_red,
+    'carga_sistema': _collect_carga_sistema,
+    'uptime': _collect_uptime,
+    'home_usuario': _collect_home_usuario
+}
+
 def get_system_info() -> Dict:
     """Obtiene información completa del sistema"""
     info = {}
     
     try:
-        # Información básica del sistema
-        info['sistema'] = {
-            'sistema_operativo': platform.system(),
-            'distribucion': platform.freedesktop_os_release().get('PRETTY_NAME', 'Desconocida') 
-                if os.path.exists('/etc/os-release') else platform.platform(),
-            'version_kernel': platform.release(),
-            'arquitectura': platform.machine(),
-            'hostname': sock.gethostname(),
-            'usuario': USERNAME,
-            'fecha_hora': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'zona_horaria': time.tzname[0] if time.daylight else time.tzname[1]
-        }
-        
-        # Información de CPU
-        cpu_info = {
-            'nucleos_fisicos': psutil.cpu_count(logical=False),
-            'nucleos_logicos': psutil.cpu_count(logical=True),
-            'uso_actual': f"{psutil.cpu_percent(interval=0.1)}%",
-            'frecuencia_actual': f"{psutil.cpu_freq().current:.2f} MHz" if psutil.cpu_freq() else "N/A"
-        }
-        info['cpu'] = cpu_info
-        
-        # Información de memoria
-        mem = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-        info['memoria'] = {
-            'total_ram': f"{mem.total / (1024**3):.2f} GB",
-            'ram_disponible': f"{mem.available / (1024**3):.2f} GB",
-            'ram_usada': f"{mem.used / (1024**3):.2f} GB",
-            'porcentaje_ram_usada': f"{mem.percent}%",
-            'total_swap': f"{swap.total / (1024**3):.2f} GB" if swap.total > 0 else "0 GB",
-            'swap_usada': f"{swap.used / (1024**3):.2f} GB" if swap.total > 0 else "0 GB"
-        }
-        
-        # Información de disco
-        disk_info = []
-        for partition in psutil.disk_partitions():
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                disk_info.append({
-                    'dispositivo': partition.device,
-                    'punto_montaje': partition.mountpoint,
-                    'sistema_archivos': partition.fstype,
-                    'total': f"{usage.total / (1024**3):.2f} GB",
-                    'usado': f"{usage.used / (1024**3):.2f} GB",
-                    'libre': f"{usage.free / (1024**3):.2f} GB",
-                    'porcentaje_usado': f"{usage.percent}%"
-                })
-            except:
+        process_table.refresh()
+        for section, collector in SYSTEM_COLLECTORS.items():
+            info[section] = collector()
+    except Exception as e:
+        info['error'] = f"No se pudo obtener información del sistema: {str(e)}"
+    
+    return info
+
+# ⏱️ MUESTREO DEL SISTEMA EN SEGUNDO PLANO
+SAMPLER_INTERVAL = 1.0  # Cada cuánto se despierta el muestreador mientras se usa Tux (segundos)
+SAMPLER_ACTIVE_SECONDS = 60.0  # Tras la última petición de datos el muestreador duerme sin despertarse
+
+# Segundos que cada sección se considera vigente antes de volver a leerla
+SYSTEM_SECTION_TTL = {
+    'sistema': 3600.0,  # Distro, kernel y host no cambian; la hora se pone en cada pasada
+    'cpu': 2.0,
+    'memoria': 2.0,
+    'carga_sistema': 2.0,
+    'uptime': 2.0,
+    'procesos_top': 5.0,
+    'procesos_memoria': 5.0,
+    'procesos_io': 5.0,
+    'red': 30.0,
+    'discos': 60.0,
+    'home_usuario': 60.0
+}
+
+class SystemSampler(threading.Thread):
+    """Hilo que mantiene una instantánea reciente de get_system_info() mientras se usa Tux
+    
+    Cada petición de datos (touch) lo mantiene activo `active_seconds`; después
+    duerme sin despertarse hasta la siguiente. Las secciones de procesos
+    recorren todos los procesos y solo se leen cuando alguien las pide.
+    """
+    def __init__(self, interval=SAMPLER_INTERVAL, ttl=None, active_seconds=SAMPLER_ACTIVE_SECONDS):
+        super().__init__(name="SystemSampler", daemon=True)
+        self.interval = interval
+        self.active_seconds = active_seconds
+        self.ttl = dict(SYSTEM_SECTION_TTL)
+        self.ttl.update(ttl or {})
+        self.collectors = dict(SYSTEM_COLLECTORS)
+        self.collectors['cpu'] = self._collect_cpu
+        self.periodic = [section for section in self.ttl if section not in PROCESS_SECTIONS]
+        self.updated_at = {}
+        self.active_at = time.monotonic()
+        self.passes = 0  # Pasadas periódicas (para medir cuánto se despierta)
+        self._snapshot = {}
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if time.monotonic() - self.active_at >= self.active_seconds:
+                # Nadie pidió datos hace rato: dormir hasta touch() o stop()
+                self._wake_event.wait()
+                self._wake_event.clear()
                 continue
-        info['discos'] = disk_info
-        
-        # Procesos en ejecución
-        procesos = []
-        try:
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+            self.refresh(self.periodic)
+            self.passes += 1
+            self._stop_event.wait(self.interval)
+
+    def touch(self):
+        """Alguien va a necesitar datos: seguir muestreando (o despertar)"""
+        self.active_at = time.monotonic()
+        self._wake_event.set()
+
+    def _collect_cpu(self):
+        # Entre pasadas seguidas el uso se mide sin bloquear; tras una pausa el promedio
+        # desde la última lectura no diría nada del momento actual
+        recent = time.monotonic() - self.updated_at.get('cpu', float('-inf')) < 2 * self.ttl['cpu']
+        return _collect_cpu(interval=None if recent else 0.1)
+
+    def refresh(self, sections=None, force=False):
+        """Vuelve a leer las secciones (todas si no se indican) cuyo TTL expiró"""
+        with self.lock:
+            now = time.monotonic()
+            due = [section for section in (self.ttl if sections is None else sections)
+                   if section in self.ttl and
+                   (force or now - self.updated_at.get(section, float('-inf')) >= self.ttl[section])]
+            if any(section in PROCESS_SECTIONS for section in due):
                 try:
-                    pinfo = proc.info
-                    if pinfo['cpu_percent'] is not None and pinfo['cpu_percent'] > 0.1:
-                        procesos.append({
-                            'pid': pinfo['pid'],
-                            'nombre': pinfo['name'],
-                            'cpu': f"{pinfo['cpu_percent']:.1f}%",
-                            'memoria': f"{pinfo['memory_percent']:.1f}%"
-                        })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    continue
+                    process_table.refresh()
+                except Exception as e:
+                    logger.debug("No se pudo muestrear los procesos: %s", e)
             
-            # Ordenar por uso de CPU
-            procesos.sort(key=lambda x: float(x['cpu'].replace('%', '')), reverse=True)
-            info['procesos_top'] = procesos[:10]
-        except:
-            info['procesos_top'] = []
+            changed = {}
+            for section in due:
+                try:
+                    changed[section] = self.collectors[section]()
+                    self.updated_at[section] = now
+                except Exception as e:
+                    logger.debug("No se pudo muestrear %s: %s", section, e)
+            if 'sistema' in self._snapshot and 'sistema' not in changed:
+                # La hora es lo único que cambia en 'sistema'
+                changed['sistema'] = dict(self._snapshot['sistema'],
+                                          fecha_hora=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            
+            if changed:
+                # Copiar y reemplazar: los lectores nunca ven una instantánea a medias
+                snapshot = dict(self._snapshot)
+                snapshot.update(changed)
+                self._snapshot = snapshot
+
+    def snapshot(self) -> Dict:
+        """Devuelve la última instantánea sin recopilar nada (O(1))"""
+        return self._snapshot
+
+    def fresh_snapshot(self) -> Dict:
+        """Solo las secciones leídas dentro de su TTL (más un par de pasadas de margen)"""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        return {section: value for section, value in snapshot.items()
+                if now - self.updated_at.get(section, float('-inf')) <= self.ttl[section] + 2 * self.interval}
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+system_sampler = None
+
+def start_system_sampler(interval=SAMPLER_INTERVAL):
+    """Arranca el muestreador global del sistema"""
+    global system_sampler
+    if system_sampler is None or not system_sampler.is_alive():
+        system_sampler = SystemSampler(interval=interval)
+        system_sampler.start()
+    return system_sampler
+
+def wake_system_sampler():
+    """Avisa al muestreador de que pronto se necesitarán datos (chat abierto, pregunta)"""
+    if system_sampler is not None and system_sampler.is_alive():
+        system_sampler.touch()
+
+def get_system_snapshot(sections=None) -> Dict:
+    """Información del sistema desde el muestreador (o recopilada al momento si no hay)
+    
+    Antes se vuelven a leer las secciones pedidas (todas si no se indican)
+    cuyo TTL expiró: así las de procesos solo se leen cuando hacen falta.
+    """
+    if system_sampler is not None and system_sampler.is_alive():
+        system_sampler.touch()
+        system_sampler.refresh(sections)
+        snapshot = system_sampler.snapshot()
+        if snapshot:
+            return snapshot
+    return get_system_info()
+
+# 🧭 ENRUTADOR DE INTENCIONES
+_ACCENT_TABLE = str.maketrans("áàäâéèëêíìïîóòöôúùüûñç¿¡", "aaaaeeeeiiiioooouuuunc  ")
+_WORD_RE = re.compile(r"\w+")
+
+def tokenize_question(text: str) -> List[str]:
+    """Palabras en minúsculas y sin tildes ni signos de puntuación"""
+    text = text.lower().translate(_ACCENT_TABLE)
+    if not text.isascii():
+        # Otras marcas diacríticas (poco comunes en español)
+        text = unicodedata.normalize('NFKD', text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WORD_RE.findall(text)
+
+def normalize_question(text: str) -> str:
+    """Minúsculas, sin tildes ni signos de puntuación y con espacios simples"""
+    return " ".join(tokenize_question(text))
+
+class Route(NamedTuple):
+    intent: str
+    confidence: float
+    scores: Dict[str, float]
+
+class IntentRouter:
+    """Clasifica preguntas en intenciones con un trie sobre palabras completas normalizadas
+    
+    Dos pseudo-intenciones no se eligen nunca: EXPLAIN marca las preguntas que
+    piden explicar o enseñar ("¿qué es el kernel?", "¿cómo configuro la red?")
+    y STATE las que preguntan por este equipo ("mi", "tengo", "cuánta"). Una
+    explicación sin pistas de estado baja la confianza de las intenciones de
+    `state_intents`, que se responden con datos del sistema.
+    """
+    GENERAL = 'general'
+    EXPLAIN = 'explicacion'
+    STATE = 'estado'
+
+    def __init__(self, confident_score=2.0, explain_factor=0.3):
+        self.root = {}  # palabra -> nodo; la clave None guarda [(intención, peso)]
+        self.max_depth = 0
+        self.confident_score = confident_score  # Puntaje a partir del cual no hay duda
+        self.explain_factor = explain_factor  # Confianza que queda al pedir una explicación
+        self.state_intents = set()  # Intenciones sobre el estado actual del equipo
+
+    def add_intent(self, intent, phrases, weight=1.0):
+        """Registra frases (una o varias palabras) que indican una intención"""
+        for phrase in phrases:
+            tokens = normalize_question(phrase).split()
+            node = self.root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append((intent, weight))
+            self.max_depth = max(self.max_depth, len(tokens))
+
+    def route_tokens(self, tokens) -> Route:
+        """Recorre las palabras una vez y suma el peso de las frases encontradas"""
+        scores = {}
+        root = self.root
+        depth = self.max_depth
+        for i in range(len(tokens)):
+            node = root
+            for token in tokens[i:i + depth]:
+                node = node.get(token)
+                if node is None:
+                    break
+                for intent, weight in node.get(None, ()):
+                    scores[intent] = scores.get(intent, 0.0) + weight
+        
+        explain = scores.pop(self.EXPLAIN, 0.0)
+        state = scores.pop(self.STATE, 0.0)
+        if not scores:
+            return Route(self.GENERAL, 1.0, scores)
+        
+        intent = max(scores, key=scores.get)
+        best = scores[intent]
+        confidence = best / sum(scores.values()) * min(1.0, best / self.confident_score)
+        if explain and not state and intent in self.state_intents:
+            # "Explícame la memoria virtual" habla de memoria, pero no de la de este equipo
+            confidence *= self.explain_factor
+        return Route(intent, confidence, scores)
+
+    def route(self, text) -> Route:
+        return self.route_tokens(tokenize_question(text))
+
+intent_router = IntentRouter()
+intent_router.add_intent('procesos', ['proceso', 'procesos', 'consumiendo', 'programas abiertos', 'programas en ejecucion'], 2.0)
+intent_router.add_intent('procesos', ['consume', 'consumen', 'gastando'], 1.0)
+intent_router.add_intent('memoria', ['ram', 'memoria', 'memoria ram', 'swap'], 2.0)
+intent_router.add_intent('discos', ['disco', 'discos', 'almacenamiento', 'particion', 'particiones', 'ssd', 'hdd'], 2.0)
+intent_router.add_intent('discos', ['espacio', 'espacio libre', 'home', 'carpeta personal'], 1.0)
+intent_router.add_intent('cpu', ['cpu', 'procesador', 'nucleos', 'nucleo', 'cores'], 2.0)
+intent_router.add_intent('cpu', ['carga', 'frecuencia', 'load'], 1.0)
+intent_router.add_intent('red', ['red', 'redes', 'ip', 'direccion ip', 'ip publica', 'wifi', 'ethernet', 'interfaz de red'], 2.0)
+intent_router.add_intent('red', ['internet', 'conexion', 'conectado', 'mascara'], 1.0)
+intent_router.add_intent('sistema', ['informacion del sistema', 'mi sistema', 'distro', 'distribucion', 'kernel', 'uptime', 'hostname'], 2.0)
+intent_router.add_intent('sistema', ['sistema', 'informacion', 'version', 'encendido', 'encendida'], 1.0)
+intent_router.add_intent('historial', ['me dijiste', 'dijiste', 'me contaste', 'hablamos', 'te pregunte', 'te dije', 'historial'], 3.0)
+intent_router.add_intent('comandos', ['comando', 'comandos', 'terminal', 'consola', 'linea de comandos'], 2.0)
+# "¿Cómo copio una carpeta?": se consulta el índice y, si no está seguro, responde la IA.
+# Solo con algo propio de la terminal: un "¿cómo…?" cualquiera va directo a la IA
+intent_router.add_intent('comandos', ['que comando', 'para que sirve', 'que hace', 'archivo', 'archivos',
+                                      'fichero', 'ficheros', 'carpeta', 'carpetas', 'directorio', 'directorios',
+                                      'permisos', 'enlace simbolico', 'servicio', 'paquete', 'paquetes'], 1.0)
+# "¿Cómo veo el uso de memoria en Python?" o "¿Qué es el kernel?" piden una explicación (la IA);
+# "¿Cómo está mi memoria?" o "¿Qué es lo que más consume?" siguen preguntando por el equipo
+intent_router.add_intent(IntentRouter.EXPLAIN, ['como', 'explicame', 'explica', 'explicar', 'que es', 'que son',
+                                                'que significa', 'en que consiste', 'ensename', 'tutorial'])
+intent_router.add_intent(IntentRouter.STATE, ['mi', 'mis', 'tengo', 'tiene', 'tienes', 'cuanta', 'cuanto',
+                                              'cuantos', 'cuantas', 'esta', 'estan', 'va', 'anda', 'ahora',
+                                              'actual', 'actualmente', 'este equipo', 'lo que'])
+
+# Intenciones con respuesta directa en get_detailed_system_answer
+SYSTEM_ANSWER_INTENTS = {'procesos', 'memoria', 'discos', 'cpu', 'sistema', 'red', 'historial', 'comandos'}
+ROUTE_MIN_CONFIDENCE = 0.5
+# Los comandos pasan igualmente por el índice, que deja a la IA lo que no tiene claro
+intent_router.state_intents = SYSTEM_ANSWER_INTENTS - {'comandos', 'historial'}
+
+# Secciones de get_system_info de las que depende cada intención
+INTENT_SECTIONS = {
+    'procesos': ['procesos_top', 'procesos_memoria', 'procesos_io'],
+    'memoria': ['memoria'],
+    'discos': ['discos', 'home_usuario'],
+    'cpu': ['cpu', 'carga_sistema'],
+    'red': ['red'],
+    'sistema': ['sistema', 'uptime', 'carga_sistema'],
+    'historial': [],
+    'comandos': [],
+    IntentRouter.GENERAL: []
+}
+
+def route_sections(route: Route) -> List[str]:
+    """Secciones del sistema relevantes para todas las intenciones detectadas"""
+    sections = []
+    for intent in route.scores or [route.intent]:
+        for section in INTENT_SECTIONS.get(intent, []):
+            if section not in sections:
+                sections.append(section)
+    return sections
+
+# 🗃️ CACHÉ DE RESPUESTAS
+# Preguntas cuya respuesta cambia con el tiempo y no se deben reutilizar
+UNCACHEABLE_KEYWORDS = {'hora', 'fecha', 'hoy', 'ahora', 'dia', 'chiste', 'aleatorio', 'otro', 'otra',
+                        'dijiste', 'contaste', 'hablamos', 'pregunte', 'dije', 'historial'}
+
+def _bucket(percent_text, step):
+    """Redondea un porcentaje ('42.3%') a múltiplos de step"""
+    try:
+        return int(float(str(percent_text).rstrip('%')) // step * step)
+    except ValueError:
+        return percent_text
+
+def system_fingerprint(system_info: Dict, sections: List[str]) -> Optional[str]:
+    """Huella gruesa de las secciones: cambia solo si cambian los datos que importan"""
+    facts = {}
+    for section in sections:
+        value = system_info.get(section)
+        if value is None:
+            return None
+        if section == 'sistema':
+            value = {k: v for k, v in value.items() if k != 'fecha_hora'}
+        elif section == 'memoria':
+            value = (value['total_ram'], value['total_swap'], _bucket(value['porcentaje_ram_usada'], 10))
+        elif section == 'cpu':
+            value = (value['nucleos_logicos'], _bucket(value['uso_actual'], 25))
+        elif section == 'discos':
+            value = [(d['punto_montaje'], d['total'], _bucket(d['porcentaje_usado'], 5)) for d in value]
+        elif section == 'home_usuario':
+            value = (value.get('total'), _bucket(value.get('porcentaje_usado', '0%'), 5))
+        elif section.startswith('procesos_'):
+            value = [p['nombre'] for p in value[:3]]
+        elif section == 'carga_sistema':
+            value = round(value['1_minuto'])
+        elif section == 'uptime':
+            value = value.split(',')[0] if 'day' in value else '0'
+        facts[section] = value
+    return hashlib.sha1(json.dumps(facts, sort_keys=True, default=str).encode()).hexdigest()
+
+class AnswerCache:
+    """Caché LRU de respuestas, invalidada cuando cambian los datos del sistema relevantes"""
+    def __init__(self, path=ANSWER_CACHE_PATH, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 max_bytes=ANSWER_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # pregunta normalizada -> (huella, respuesta, fecha)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+        self._save_timer = None
+        self.load()
+
+    def _key(self, question, system_info):
+        """Clave y huella de una pregunta (None si no se puede reutilizar)"""
+        normalized = normalize_question(question)
+        tokens = normalized.split()
+        if not tokens or UNCACHEABLE_KEYWORDS.intersection(tokens):
+            return None, None
+        
+        sections = route_sections(intent_router.route_tokens(tokens))
+        fingerprint = system_fingerprint(system_info, sections)
+        if fingerprint is None:
+            return None, None
+        return normalized, fingerprint
+
+    @staticmethod
+    def _entry_size(key, answer):
+        return len(key.encode()) + len(answer.encode()) + 64
+
+    def get(self, question, system_info) -> Optional[str]:
+        """Devuelve la respuesta guardada si los datos del sistema no cambiaron"""
+        key, fingerprint = self._key(question, system_info)
+        with self.lock:
+            entry = self.entries.get(key) if key else None
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry[0] != fingerprint:
+                # Los datos en los que se basó la respuesta ya no son ciertos
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                self._schedule_save()
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, question, answer, system_info):
+        """Guarda una respuesta"""
+        key, fingerprint = self._key(question, system_info)
+        if key is None or not answer:
+            return
         
-        # Información de red
-        net_info = []
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (fingerprint, answer, time.time())
+            self.size += self._entry_size(key, answer)
+            self._evict()
+            self._schedule_save()
+
+    def _remove(self, key):
+        fingerprint, answer, _ = self.entries.pop(key)
+        self.size -= self._entry_size(key, answer)
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta respetar los límites"""
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self._schedule_save()
+
+    def stats(self) -> Dict:
+        """Estadísticas de aciertos y fallos"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'aciertos': self.hits,
+                'fallos': self.misses,
+                'invalidaciones': self.invalidations,
+                'tasa_aciertos': self.hits / total if total else 0.0,
+                'entradas': len(self.entries),
+                'bytes': self.size
+            }
+
+    def load(self):
+        """Carga la caché desde disco (si existe)"""
+        if not self.path:
+            return
         try:
-            for interface, addrs in psutil.net_if_addrs().items():
-                for addr in addrs:
-                    if addr.family == sock.AF_INET:
-                        net_info.append({
-                            'interfaz': interface,
-                            'ip': addr.address,
-                            'mascara': addr.netmask
-                        })
-        except:
-            pass
-        info['red'] = net_info
-        
-        # Información de carga del sistema
-        load = os.getloadavg()
-        info['carga_sistema'] = {
-            '1_minuto': load[0],
-            '5_minutos': load[1],
-            '15_minutos': load[2]
-        }
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            for key, fingerprint, answer, saved_at in data.get('entries', []):
+                self.entries[key] = (fingerprint, answer, saved_at)
+                self.size += self._entry_size(key, answer)
+            self._evict()
+        except (OSError, ValueError, TypeError):
+            self.entries.clear()
+            self.size = 0
+
+    def _schedule_save(self):
+        """Agrupa las escrituras a disco y las hace fuera del hilo de la interfaz"""
+        if not self.path or (self._save_timer and self._save_timer.is_alive()):
+            return
+        self._save_timer = threading.Timer(2.0, self.save)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def save(self):
+        """Guarda la caché en disco (en orden LRU)"""
+        if not self.path:
+            return
+        with self.lock:
+            data = {
+                'version': 1,
+                'entries': [[key, *entry] for key, entry in self.entries.items()]
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.debug("No se pudo guardar la caché de respuestas: %s", e)
+
+def get_cached_system_snapshot() -> Dict:
+    """Secciones vigentes del muestreador, sin recopilar nada (vacía si no hay)
+    
+    Mientras duerme sus datos envejecen: sin la sección, la huella de la caché
+    no se puede calcular y la respuesta guardada no se reutiliza.
+    """
+    if system_sampler is not None and system_sampler.is_alive():
+        return system_sampler.fresh_snapshot()
+    return {}
+
+def _format_sistema(system_info: Dict) -> List[str]:
+    sys_info = system_info['sistema']
+    return [
+        f"SISTEMA: {sys_info['distribucion']} | Kernel: {sys_info['version_kernel']} | Usuario: {sys_info['usuario']}",
+        f"HOST: {sys_info['hostname']} | Hora: {sys_info['fecha_hora']} | Uptime: {system_info.get('uptime', 'N/A')}"
+    ]
+
+def _format_cpu(system_info: Dict) -> List[str]:
+    cpu = system_info['cpu']
+    return [f"CPU: {cpu['nucleos_fisicos']} núcleos físicos, {cpu['nucleos_logicos']} lógicos | Uso: {cpu['uso_actual']} | Frecuencia: {cpu.get('frecuencia_actual', 'N/A')}"]
+
+def _format_memoria(system_info: Dict) -> List[str]:
+    mem = system_info['memoria']
+    return [f"RAM: {mem['total_ram']} total | {mem['ram_disponible']} libre | {mem['porcentaje_ram_usada']} usado | Swap: {mem['total_swap']}"]
+
+def _format_discos(system_info: Dict) -> List[str]:
+    disk_summary = []
+    for disk in system_info['discos'][:3]:
+        disk_summary.append(f"{disk['punto_montaje']}: {disk['porcentaje_usado']} usado ({disk['usado']}/{disk['total']})")
+    return [f"DISCOS: {' | '.join(disk_summary)}"] if disk_summary else []
+
+def _format_home_usuario(system_info: Dict) -> List[str]:
+    home = system_info['home_usuario']
+    if 'error' in home:
+        return []
+    return [f"HOME ({USERNAME}): {home['porcentaje_usado']} usado ({home['usado']}/{home['total']}) libre: {home['libre']}"]
+
+def _format_procesos(title, section, value_key):
+    def formatter(system_info: Dict) -> List[str]:
+        top_procs = []
+        for i, proc in enumerate(system_info[section][:3], 1):
+            top_procs.append(f"{i}. {proc['nombre']} ({value_key(proc)})")
+        return [f"{title}: {' | '.join(top_procs)}"] if top_procs else []
+    return formatter
+
+def _format_carga_sistema(system_info: Dict) -> List[str]:
+    load = system_info['carga_sistema']
+    return [f"CARGA: 1min:{load['1_minuto']:.2f} | 5min:{load['5_minutos']:.2f} | 15min:{load['15_minutos']:.2f}"]
+
+def _format_red(system_info: Dict) -> List[str]:
+    net_summary = []
+    for net in system_info['red']:
+        if net['interfaz'] != 'lo':
+            net_summary.append(f"{net['interfaz']}: {net['ip']}")
+    return [f"RED: {' | '.join(net_summary)}"] if net_summary else []
+
+# Cómo se describe cada sección en el prompt (en el orden del prompt completo)
+PROMPT_SECTION_FORMATTERS = {
+    'sistema': _format_sistema,
+    'cpu': _format_cpu,
+    'memoria': _format_memoria,
+    'discos': _format_discos,
+    'home_usuario': _format_home_usuario,
+    'procesos_top': _format_procesos("PROCESOS TOP", 'procesos_top',
+                                     lambda p: f"CPU: {p['cpu']}, Mem: {p['memoria']}"),
+    'procesos_memoria': _format_procesos("PROCESOS POR MEMORIA", 'procesos_memoria',
+                                         lambda p: f"RSS: {p.get('rss', p['memoria'])}"),
+    'procesos_io': _format_procesos("PROCESOS POR E/S", 'procesos_io',
+                                    lambda p: f"E/S: {p.get('io', 'N/A')}"),
+    'carga_sistema': _format_carga_sistema,
+    'red': _format_red
+}
+
+def format_system_section(system_info: Dict, section: str) -> List[str]:
+    """Líneas del prompt para una sección (vacío si no hay datos)"""
+    formatter = PROMPT_SECTION_FORMATTERS.get(section)
+    if formatter is None or not system_info.get(section):
+        return []
+    try:
+        return formatter(system_info)
+    except (KeyError, TypeError, ValueError):
+        return []
+
+def format_system_info_for_prompt(system_info: Dict, sections: Optional[List[str]] = None) -> str:
+    """Formatea la información del sistema para incluir en el prompt"""
+    prompt_sections = []
+    
+    for section in sections or ['sistema', 'cpu', 'memoria', 'discos', 'home_usuario',
+                                'procesos_top', 'carga_sistema', 'red']:
+        prompt_sections.extend(format_system_section(system_info, section))
+
+    return "\n".join(prompt_sections)
+
+# 📝 CONSTRUCCIÓN DEL PROMPT CON PRESUPUESTO DE TOKENS
+PROMPT_SYSTEM_BUDGET = 120  # Tokens máximos de información del sistema por prompt
+PROMPT_MEMORY_BUDGET = 150  # Tokens máximos de recuerdos de conversaciones anteriores
+CHARS_PER_TOKEN = 3.5  # Aproximación para texto en español con el tokenizador de Mistral
+
+def estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (sin cargar el tokenizador del modelo)"""
+    return int(len(text) / CHARS_PER_TOKEN + 0.999) if text else 0
+
+class BuiltPrompt(NamedTuple):
+    text: str
+    tokens: int
+    system_tokens: int
+    sections: List[str]
+    memory_tokens: int = 0
+
+class PromptBuilder:
+    """Arma el prompt incluyendo solo las secciones del sistema relevantes para la pregunta"""
+    # Secciones que siempre ayudan (distro y usuario) si queda presupuesto
+    BASE_SECTIONS = ['sistema']
+
+    def __init__(self, budget=PROMPT_SYSTEM_BUDGET, memory_budget=PROMPT_MEMORY_BUDGET):
+        self.budget = budget
+        self.memory_budget = memory_budget
+
+    def select_sections(self, route: Optional[Route], first_turn: bool) -> List[str]:
+        """Secciones en orden de prioridad: las de la intención más probable primero"""
+        sections = []
+        if route is not None:
+            for intent in sorted(route.scores, key=route.scores.get, reverse=True):
+                sections.extend(INTENT_SECTIONS.get(intent, []))
+        if first_turn:
+            sections.extend(self.BASE_SECTIONS)
+        
+        unique = []
+        for section in sections:
+            if section in PROMPT_SECTION_FORMATTERS and section not in unique:
+                unique.append(section)
+        return unique
+
+    def system_context(self, system_info: Dict, sections: List[str]):
+        """Líneas de las secciones que caben en el presupuesto (recortando la última)"""
+        lines = []
+        included = []
+        remaining = self.budget
+        for section in sections:
+            for line in format_system_section(system_info, section):
+                cost = estimate_tokens(line) + 1
+                if cost > remaining:
+                    # Recortar la línea si todavía cabe algo útil
+                    if remaining >= 12:
+                        line = line[:int((remaining - 2) * CHARS_PER_TOKEN)] + "…"
+                        lines.append(line)
+                        included.append(section)
+                    return lines, included
+                lines.append(line)
+                remaining -= cost
+                if section not in included:
+                    included.append(section)
+        return lines, included
+
+    def memory_context(self, memories) -> List[str]:
+        """Recuerdos (del más parecido al menos) que caben en el presupuesto"""
+        lines = []
+        remaining = self.memory_budget
+        for memory in memories:
+            line = f"- Preguntó: {memory.question} | Respondiste: {' '.join(memory.answer.split())}"
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                if remaining >= 20:
+                    lines.append(line[:int((remaining - 2) * CHARS_PER_TOKEN)] + "…")
+                break
+            lines.append(line)
+            remaining -= cost
+        return lines
+
+    def build(self, question, system_info: Optional[Dict] = None,
+              route: Optional[Route] = None, first_turn=True, memories=()) -> BuiltPrompt:
+        """Construye el prompt. Sin first_turn el modelo ya tiene la personalidad en su contexto"""
+        if route is None:
+            route = intent_router.route(question)
+        
+        system_lines, sections = [], []
+        if system_info is not None:
+            if 'error' in system_info and first_turn:
+                system_lines = ["[Información del sistema no disponible]"]
+            else:
+                system_lines, sections = self.system_context(system_info, self.select_sections(route, first_turn))
+        
+        prompt = f"{TUX_SYSTEM_PROMPT}\n\n" if first_turn else ""
+        system_text = "\n".join(system_lines)
+        if system_text:
+            prompt += f"INFORMACIÓN ACTUAL DEL SISTEMA:\n{system_text}\n\n"
+        memory_text = "\n".join(self.memory_context(memories))
+        if memory_text:
+            prompt += f"CONVERSACIONES ANTERIORES RELACIONADAS:\n{memory_text}\n\n"
+        prompt += f"Usuario: {question}\nTux:"
+        
+        built = BuiltPrompt(prompt, estimate_tokens(prompt), estimate_tokens(system_text), sections,
+                            estimate_tokens(memory_text))
+        logger.debug(
+            "Prompt de ~%d tokens (%d de sistema: %s; %d de recuerdos) para la intención %s",
+            built.tokens, built.system_tokens, ", ".join(sections) or "ninguna", built.memory_tokens, route.intent
+        )
+        return built
+
+prompt_builder = PromptBuilder()
+
+# 🧠 MEMORIA SEMÁNTICA
+class Memory(NamedTuple):
+    score: float
+    question: str
+    answer: str
+    time: float
+
+MEMORY_MAGIC = b"TUXV"
+MEMORY_HEADER = struct.Struct("<4sII")  # magia, dimensión, número de vectores
+
+class MemoryIndex:
+    """Vectores normalizados (float32) en un archivo mapeado en memoria
+    
+    `vectors.f32` es una cabecera y una matriz de filas de `dim` floats con
+    espacio de sobra para crecer; `entries.jsonl` guarda la pregunta y la
+    respuesta de cada fila. En memoria solo quedan los offsets de cada línea.
+    """
+    def __init__(self, directory=MEMORY_DIR):
+        import numpy as np
+        self.np = np
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.entries_path = os.path.join(directory, "entries.jsonl")
+        self.dim = 0
+        self.count = 0
+        self.capacity = 0
+        self.matrix = None
+        self.offsets = array('q')
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        """Abre lo guardado; las filas sin texto (escritura cortada) se descartan"""
+        try:
+            with open(self.entries_path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if line.endswith(b"\n"):
+                        self.offsets.append(offset)
+                    offset += len(line)
+            with open(self.vectors_path, 'rb') as f:
+                magic, dim, count = MEMORY_HEADER.unpack(f.read(MEMORY_HEADER.size))
+        except (OSError, struct.error):
+            self.offsets = array('q')
+            return
+        if magic != MEMORY_MAGIC or not dim:
+            self.offsets = array('q')
+            return
         
-        # Tiempo de actividad
-        uptime = datetime.datetime.now() - datetime.datetime.fromtimestamp(psutil.boot_time())
-        info['uptime'] = str(uptime).split('.')[0]
+        self.dim = dim
+        self.count = min(count, len(self.offsets))
+        del self.offsets[self.count:]
+        self.capacity = (os.path.getsize(self.vectors_path) - MEMORY_HEADER.size) // (dim * 4)
+        self._map()
+
+    def _map(self):
+        self.matrix = self.np.memmap(self.vectors_path, dtype=self.np.float32, mode='r+',
+                                     offset=MEMORY_HEADER.size, shape=(self.capacity, self.dim))
+
+    def _reserve(self, rows):
+        """Agranda el archivo (al doble) si no caben `rows` filas más"""
+        if self.count + rows <= self.capacity:
+            return
+        self.capacity = max(self.count + rows, self.capacity * 2, 1024)
+        self.matrix = None
+        with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'w+b') as f:
+            f.truncate(MEMORY_HEADER.size + self.capacity * self.dim * 4)
+        self._map()
+
+    def _reset(self, dim):
+        """Empieza de cero (primera vez o el modelo de embeddings cambió de dimensión)"""
+        if self.count:
+            logger.warning("Dimensión de embeddings %d -> %d: se reinicia la memoria", self.dim, dim)
+        self.matrix = None
+        for path in (self.vectors_path, self.entries_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim, self.count, self.capacity = dim, 0, 0
+        self.offsets = array('q')
+
+    def add(self, vectors, entries):
+        """Añade filas: vectors (n x dim) y entries [(pregunta, respuesta, fecha)]"""
+        np = self.np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        
+        with self.lock:
+            if vectors.shape[1] != self.dim:
+                self._reset(vectors.shape[1])
+            self._reserve(len(vectors))
+            
+            # Primero el texto: una fila sin texto se descarta al cargar
+            with open(self.entries_path, 'ab') as f:
+                offset = f.tell()
+                for question, answer, timestamp in entries:
+                    line = (json.dumps({'q': question, 'a': answer, 't': timestamp}, ensure_ascii=False) + "\n").encode()
+                    self.offsets.append(offset)
+                    f.write(line)
+                    offset += len(line)
+            
+            self.matrix[self.count:self.count + len(vectors)] = vectors
+            self.count += len(vectors)
+            self.matrix.flush()
+            with open(self.vectors_path, 'r+b') as f:
+                f.write(MEMORY_HEADER.pack(MEMORY_MAGIC, self.dim, self.count))
+
+    def search(self, vector, k=MEMORY_TOP_K, min_score=MEMORY_MIN_SCORE) -> List[Memory]:
+        """Las k filas más parecidas (coseno) con similitud >= min_score"""
+        np = self.np
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self.lock:
+            if not self.count or norm == 0 or len(query) != self.dim:
+                return []
+            scores = self.matrix[:self.count] @ (query / norm)
+            if self.count > k:
+                best = np.argpartition(scores, -k)[-k:]
+            else:
+                best = np.arange(self.count)
+            best = best[np.argsort(scores[best])[::-1]]
+            
+            memories = []
+            with open(self.entries_path, 'rb') as f:
+                for row in best:
+                    if scores[row] < min_score:
+                        break
+                    f.seek(self.offsets[row])
+                    entry = json.loads(f.readline())
+                    memories.append(Memory(float(scores[row]), entry['q'], entry['a'], entry['t']))
+            return memories
+
+    def stats(self):
+        return {'entries': self.count, 'dim': self.dim,
+                'bytes': self.count * self.dim * 4 + len(self.offsets) * self.offsets.itemsize,
+                'reserved_bytes': self.capacity * self.dim * 4}
+
+class SemanticMemory(threading.Thread):
+    """Recuerda pares pregunta/respuesta y recupera los parecidos a una pregunta nueva
+    
+    Los embeddings se piden a Ollama por lotes en este hilo; la búsqueda es
+    un producto matriz-vector de NumPy sobre el índice mapeado en memoria.
+    Sin NumPy o sin el modelo de embeddings la memoria queda desactivada.
+    """
+    def __init__(self, directory=MEMORY_DIR, client=None, model=EMBED_MODEL,
+                 batch_size=MEMORY_BATCH_SIZE, batch_seconds=MEMORY_BATCH_SECONDS):
+        super().__init__(name="SemanticMemory", daemon=True)
+        self.directory = directory
+        self.client = client or ollama_client
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.queue = queue.Queue()
+        self.index = None  # Se abre en el hilo (importar NumPy y mapear el archivo)
+        self.embedded = 0
+        self.batches = 0
+        self.recalls = 0
+        self.recall_time = 0.0
+        self.recall_skipped = 0
+        self.recall_busy = False  # Hay un embedding de pregunta en marcha
+        self.recall_lock = threading.Lock()
+        self.unavailable_until = 0.0  # Tras un fallo de embeddings no se reintenta hasta entonces
+
+    def embed_available(self):
+        """False durante MEMORY_RETRY_SECONDS después de que fallen los embeddings"""
+        return time.monotonic() >= self.unavailable_until
+
+    def _embed_failed(self, error):
+        if self.embed_available():
+            logger.warning("Embeddings no disponibles (%s): %s", self.model, error)
+        self.unavailable_until = time.monotonic() + MEMORY_RETRY_SECONDS
+
+    def remember(self, question, answer):
+        """Encola un par para calcular su embedding en segundo plano"""
+        if question and answer:
+            self.queue.put((question, answer, time.time()))
+
+    def recall(self, question, k=MEMORY_TOP_K, min_score=MEMORY_MIN_SCORE, wait=MEMORY_RECALL_WAIT) -> List[Memory]:
+        """Recuerdos relacionados con la pregunta ([] si no hay memoria o no llegan a tiempo)
+        
+        El embedding se pide en otro hilo y solo se espera `wait` segundos: si el
+        modelo está cargando, la respuesta no se retrasa y la petición sigue en
+        segundo plano (así el modelo queda cargado para la siguiente pregunta).
+        """
+        index = self.index
+        if index is None or not index.count or not self.embed_available():
+            return []
+        with self.recall_lock:
+            if self.recall_busy:
+                # El embedding anterior todavía no terminó: no apilar otro
+                self.recall_skipped += 1
+                return []
+            self.recall_busy = True
+        
+        started = time.perf_counter()
+        result = {}
+        done = threading.Event()
+        
+        def embed():
+            try:
+                result['vector'] = self.client.embed([question], model=self.model,
+                                                     timeout=(0.5, MEMORY_RECALL_TIMEOUT))[0]
+            except Exception as e:
+                self._embed_failed(e)
+            finally:
+                self.recall_busy = False
+                done.set()
+        
+        threading.Thread(target=embed, name="tux-recall", daemon=True).start()
+        if not done.wait(wait) or 'vector' not in result:
+            self.recall_skipped += 1
+            return []
+        try:
+            memories = index.search(result['vector'], k, min_score)
+        except Exception as e:
+            logger.debug("Sin recuerdos para la pregunta: %s", e)
+            return []
+        self.recalls += 1
+        self.recall_time += time.perf_counter() - started
+        return memories
+
+    def run(self):
+        try:
+            self.index = MemoryIndex(self.directory)
+        except ImportError:
+            logger.warning("Memoria semántica desactivada: falta NumPy")
+            return
+        except OSError as e:
+            logger.warning("No se pudo abrir la memoria semántica: %s", e)
+            return
         
-        # Espacio en directorio home del usuario
-        home_path = os.path.expanduser("~")
+        pending = deque(maxlen=MEMORY_MAX_PENDING)
+        stopping = False
+        while not stopping:
+            # Sin pendientes se espera sin despertar; con pendientes, hasta el próximo reintento
+            try:
+                item = self.queue.get(timeout=MEMORY_RETRY_SECONDS if pending else None)
+            except queue.Empty:
+                item = ()
+            batch = [item]
+            deadline = time.monotonic() + self.batch_seconds
+            while batch[-1] is not None and len(pending) + len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            stopping = None in batch
+            pending.extend(entry for entry in batch if entry)
+            while pending:
+                chunk = [pending[i] for i in range(min(self.batch_size, len(pending)))]
+                if not self._embed(chunk):
+                    break
+                for _ in chunk:
+                    pending.popleft()
+            for entry in batch:
+                if entry != ():
+                    self.queue.task_done()
+
+    def _embed(self, entries):
+        """Calcula los embeddings de un lote y lo añade al índice"""
+        texts = [f"Pregunta: {question}\nRespuesta: {answer}"[:MEMORY_EMBED_CHARS]
+                 for question, answer, _ in entries]
         try:
-            home_usage = psutil.disk_usage(home_path)
-            info['home_usuario'] = {
-                'ruta': home_path,
-                'total': f"{home_usage.total / (1024**3):.2f} GB",
-                'usado': f"{home_usage.used / (1024**3):.2f} GB",
-                'libre': f"{home_usage.free / (1024**3):.2f} GB",
-                'porcentaje_usado': f"{home_usage.percent}%"
-            }
-        except:
-            info['home_usuario'] = {'ruta': home_path, 'error': 'No se pudo leer'}
+            vectors = self.client.embed(texts, model=self.model, timeout=(2, 120))
+        except Exception as e:
+            self._embed_failed(e)
+            return False
+        if len(vectors) != len(entries):
+            logger.warning("Ollama devolvió %d embeddings para %d textos", len(vectors), len(entries))
+            return False
+        
+        self.index.add(vectors, entries)
+        self.embedded += len(entries)
+        self.batches += 1
+        return True
+
+    def flush(self):
+        """Espera a que se procese lo encolado (o a que falle el embedding)"""
+        if self.is_alive():
+            self.queue.join()
+
+    def stop(self, timeout=2):
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(timeout)
+
+    def stats(self):
+        stats = self.index.stats() if self.index else {}
+        stats.update(embedded=self.embedded, batches=self.batches, recall_skipped=self.recall_skipped,
+                     recall_ms=self.recall_time / self.recalls * 1000 if self.recalls else 0.0)
+        return stats
+
+semantic_memory = SemanticMemory()
+
+def start_semantic_memory():
+    """Arranca el hilo que calcula embeddings de la memoria"""
+    if not semantic_memory.is_alive() and semantic_memory.ident is None:
+        semantic_memory.start()
+    return semantic_memory
+
+audio_ready = threading.Event()
+
+def init_audio():
+    """Importa pygame, inicializa el mixer y decodifica los sonidos"""
+    global pygame, mixer
+    try:
+        import pygame as pygame_module
+        pygame = pygame_module
+        mixer = pygame.mixer
+        # Solo el mixer: pygame.init() arrancaría también vídeo, joystick...
+        mixer.init()
+        mixer.music.set_volume(0.7)
+        sound_bank.preload()
+        audio_ready.set()
+        startup_mark('audio')
+        return True
+    except Exception as e:
+        # print(f"Error inicializando audio: {e}")
+        return False
+
+def start_background_services():
+    """Audio y muestreo del sistema en segundo plano (no retrasan la ventana)"""
+    threading.Thread(target=init_audio, name="tux-audio", daemon=True).start()
+    start_system_sampler()
+    start_history_store()
+    start_semantic_memory()
+    start_command_index()
+
+# 🔊 SONIDOS
+SOUNDS = {'bubble': ('assets/bubble_sound.mp3', 0.8)}  # nombre -> (archivo, volumen)
+SOUND_MIN_INTERVAL = 0.15  # Segundos mínimos entre dos reproducciones del mismo sonido
+
+class SoundBank:
+    """Sonidos decodificados una sola vez; cada uno suena en su propio canal sin apilarse"""
+    
+    def __init__(self, sounds=SOUNDS, min_interval=SOUND_MIN_INTERVAL):
+        self.sources = sounds
+        self.min_interval = min_interval
+        self.sounds = {}  # nombre -> mixer.Sound (None si no se pudo cargar)
+        self.channels = {}
+        self.last_played = {}
+    
+    def preload(self):
+        """Decodifica todos los sonidos y reserva un canal para cada uno"""
+        for name in self.sources:
+            self.get(name)
+    
+    def get(self, name):
+        if name in self.sounds:
+            return self.sounds[name]
         
+        path, volume = self.sources[name]
+        try:
+            if os.path.exists(path):
+                sound = mixer.Sound(path)
+            else:
+                sound = self.tone()
+                volume *= 0.75
+            sound.set_volume(volume)
+        except Exception as e:
+            logger.warning("No se pudo cargar el sonido %s: %s", name, e)
+            sound = None
+        
+        self.sounds[name] = sound
+        if sound is not None:
+            # Canales reservados: los sonidos del mixer no pueden quitárselos
+            index = len(self.channels)
+            mixer.set_reserved(index + 1)
+            self.channels[name] = mixer.Channel(index)
+        return sound
+    
+    @staticmethod
+    def tone(frequency=440, duration=0.1, amplitude=0.5):
+        """Tono senoidal generado con NumPy en el formato del mixer"""
+        import numpy as np
+        
+        sample_rate, sample_format, channels = mixer.get_init()
+        t = np.arange(int(duration * sample_rate)) / sample_rate
+        samples = (np.sin(2 * np.pi * frequency * t) * amplitude * 32767).astype(np.int16)
+        if channels > 1:
+            samples = np.repeat(samples[:, np.newaxis], channels, axis=1)
+        return mixer.Sound(buffer=samples.tobytes())
+    
+    def play(self, name):
+        """Reproduce el sonido salvo que acabe de sonar (ráfagas de burbujas)"""
+        if mixer is None or not mixer.get_init():
+            return False
+        
+        now = time.monotonic()
+        if now - self.last_played.get(name, float('-inf')) < self.min_interval:
+            return False
+        
+        sound = self.get(name)
+        if sound is None:
+            return False
+        
+        self.last_played[name] = now
+        # En su canal: si aún sonaba, vuelve a empezar en lugar de sumar otra copia
+        self.channels[name].play(sound)
+        return True
+
+sound_bank = SoundBank()
+
+def play_bubble_sound():
+    """Reproduce el sonido de burbuja"""
+    if not audio_ready.is_set():
+        return  # El audio aún se está iniciando
+    try:
+        sound_bank.play('bubble')
     except Exception as e:
-        info['error'] = f"No se pudo obtener información del sistema: {str(e)}"
+        pass  # Silenciar error de sonido
+
+# 📐 COLOCACIÓN DE LA BURBUJA Y EL CHAT
+class Rect(NamedTuple):
+    x: int
+    y: int
+    width: int
+    height: int
+    
+    def contains(self, x, y):
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+    
+    def intersects(self, other):
+        return (self.x < other.x + other.width and other.x < self.x + self.width and
+                self.y < other.y + other.height and other.y < self.y + self.height)
+
+def rect_from_qrect(rect):
+    return Rect(rect.x(), rect.y(), rect.width(), rect.height())
+
+class ScreenIndex:
+    """Geometría de las pantallas como tuplas; se reconstruye solo cuando cambian"""
+    
+    def __init__(self, screens):
+        # [(geometría, geometría disponible)], la pantalla principal primero
+        self.screens = screens or [(Rect(0, 0, 1920, 1080), Rect(0, 0, 1920, 1080))]
+        self.last = self.screens[0]
+    
+    @classmethod
+    def from_qt(cls):
+        primary = QGuiApplication.primaryScreen()
+        screens = sorted(QGuiApplication.screens(), key=lambda screen: screen is not primary)
+        return cls([(rect_from_qrect(screen.geometry()), rect_from_qrect(screen.availableGeometry()))
+                    for screen in screens])
+    
+    def available_at(self, x, y):
+        """Área disponible de la pantalla que contiene (x, y), o de la principal"""
+        # Casi siempre es la misma pantalla que la vez anterior
+        if self.last[0].contains(x, y):
+            return self.last[1]
+        for entry in self.screens:
+            if entry[0].contains(x, y):
+                self.last = entry
+                return entry[1]
+        return self.screens[0][1]
+
+class Placement(NamedTuple):
+    bubble: Optional[Rect]
+    bubble_above: bool  # La burbuja está encima del Tux (flecha hacia abajo)
+    arrow_x: int  # Punta de la flecha, relativa a la burbuja (sin limitar a sus bordes)
+    chat: Optional[Rect]
+
+class LayoutSolver:
+    """Calcula en una pasada dónde van la burbuja y el chat alrededor del Tux"""
+    BUBBLE_GAP = 5
+    BUBBLE_MARGIN = 30
+    BUBBLE_MIN_SPACE = 20  # Espacio mínimo sobre la burbuja para ponerla encima
+    CHAT_GAP = 10
+    CHAT_MARGIN = 20
+    
+    def solve(self, screens, tux, bubble_size=None, chat_size=None):
+        """Posiciones de la burbuja y el chat (tamaños (ancho, alto) o None si no se muestran)"""
+        area = screens.available_at(tux.x, tux.y)
+        tux_center_x = tux.x + tux.width // 2
+        
+        bubble = None
+        bubble_above = True
+        arrow_x = 0
+        if bubble_size:
+            width, height = bubble_size
+            margin = self.BUBBLE_MARGIN
+            x = tux_center_x - width // 2
+            y = tux.y - height - self.BUBBLE_GAP
+            if tux.y - area.y - height < self.BUBBLE_MIN_SPACE:
+                # No cabe encima: debajo del Tux
+                y = tux.y + tux.height + self.BUBBLE_GAP
+                bubble_above = False
+            x = max(area.x + margin, min(x, area.x + area.width - width - margin))
+            bubble = Rect(x, y, width, height)
+            arrow_x = tux_center_x - x
+        
+        chat = None
+        if chat_size:
+            width, height = chat_size
+            margin = self.CHAT_MARGIN
+            x = tux_center_x - width // 2
+            x = max(area.x + margin, min(x, area.x + area.width - width - margin))
+            
+            fits_above = tux.y - area.y >= height + margin
+            above_y = tux.y - height - self.CHAT_GAP
+            below_y = tux.y + tux.height + self.CHAT_GAP
+            y = above_y if fits_above else below_y
+            y = max(area.y + margin, min(y, area.y + area.height - height - margin))
+            
+            if bubble and Rect(x, y, width, height).intersects(bubble):
+                # Lado opuesto a la burbuja
+                if y < tux.y:
+                    y = below_y
+                elif fits_above:
+                    y = above_y
+            chat = Rect(x, y, width, height)
+        
+        return Placement(bubble, bubble_above, arrow_x, chat)
+
+layout_solver = LayoutSolver()
+
+# 🖥️ SEGUIMIENTO DE PANTALLAS
+class ScreenTracker(QObject):
+    """Sabe en qué pantalla está Tux sin sondear: reacciona a las señales de Qt"""
+    screenChanged = pyqtSignal(object)  # Tux pasó a otra pantalla
+    geometryChanged = pyqtSignal(object)  # Cambió la geometría o la lista de pantallas
+    
+    def __init__(self, widget):
+        super().__init__()
+        self.widget = widget
+        self.current_screen = None
+        self.current_geometry = QRect()
+        self.window_handle = None
+        self.index = ScreenIndex.from_qt()
+        
+        app = QGuiApplication.instance()
+        app.screenAdded.connect(self.on_screen_added)
+        app.screenRemoved.connect(self.on_screen_removed)
+        app.primaryScreenChanged.connect(self.on_geometry_changed)
+        for screen in QGuiApplication.screens():
+            self.watch_screen(screen)
+        
+        self.refresh()
+    
+    def watch_screen(self, screen):
+        screen.geometryChanged.connect(self.on_geometry_changed)
+        screen.availableGeometryChanged.connect(self.on_geometry_changed)
+    
+    def attach_window(self):
+        """Sigue la señal screenChanged de la ventana nativa (existe tras show())"""
+        handle = self.widget.windowHandle()
+        if handle is not None and handle is not self.window_handle:
+            self.window_handle = handle
+            handle.screenChanged.connect(lambda screen: self.refresh())
+    
+    def screen_at(self, pos):
+        """Pantalla que contiene pos (o la principal)"""
+        for screen in QGuiApplication.screens():
+            if screen.geometry().contains(pos):
+                return screen
+        return QGuiApplication.primaryScreen()
+    
+    def update_position(self, pos):
+        """Llamar cuando Tux se mueve; solo recalcula si salió de su pantalla"""
+        if self.current_screen is not None and self.current_geometry.contains(pos):
+            return
+        self.refresh(pos)
+    
+    def refresh(self, pos=None):
+        """Recalcula la pantalla de Tux y avisa si cambió"""
+        screen = self.screen_at(self.widget.pos() if pos is None else pos)
+        if screen is not None:
+            self.current_geometry = screen.geometry()
+        if screen is not self.current_screen:
+            self.current_screen = screen
+            self.screenChanged.emit(screen)
+    
+    def on_screen_added(self, screen):
+        self.watch_screen(screen)
+        self.on_geometry_changed()
+    
+    def on_screen_removed(self, screen):
+        if screen is self.current_screen:
+            self.current_screen = None
+        self.on_geometry_changed()
+    
+    def on_geometry_changed(self, *args):
+        self.index = ScreenIndex.from_qt()
+        self.refresh()
+        self.geometryChanged.emit(self.current_screen)
+
+# 🎞️ CACHÉ DE ANIMACIONES
+FRAME_CACHE_MAGIC = b"TUXFRM1\n"
+_FRAME_CACHE_HEADER = struct.Struct("<8sqqHHH")  # magia, mtime_ns y tamaño del GIF, ancho, alto, frames
+_FRAME_HEADER = struct.Struct("<HI")  # retardo (ms), bytes comprimidos
+
+def frame_cache_path(path, pixel_size):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(FRAME_CACHE_DIR, f"{name}-{pixel_size.width()}x{pixel_size.height()}.frames")
+
+def decode_gif_frames(path, pixel_size):
+    """Decodifica todos los frames del GIF escalados a pixel_size; devuelve (imágenes, retardos ms)"""
+    reader = QImageReader(path)
+    images = []
+    delays = []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        images.append(image.scaled(pixel_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+                      .convertToFormat(QImage.Format_ARGB32_Premultiplied))
+        delays.append(max(reader.nextImageDelay(), 20))
+    return images, delays
+
+def save_frame_cache(cache_path, source_stat, pixel_size, images, delays):
+    """Guarda los frames (ARGB premultiplicado comprimido con zlib) de forma atómica"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    chunks = [_FRAME_CACHE_HEADER.pack(FRAME_CACHE_MAGIC, source_stat.st_mtime_ns, source_stat.st_size,
+                                       pixel_size.width(), pixel_size.height(), len(images))]
+    for image, delay in zip(images, delays):
+        data = zlib.compress(image.constBits().asstring(image.sizeInBytes()), 1)
+        chunks.append(_FRAME_HEADER.pack(min(delay, 65535), len(data)))
+        chunks.append(data)
+    
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(chunks))
+    os.replace(tmp_path, cache_path)
+
+def load_frame_cache(cache_path, source_stat, pixel_size):
+    """Frames guardados (imágenes, retardos) o None si no existen o el GIF cambió"""
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        magic, mtime_ns, source_size, width, height, count = _FRAME_CACHE_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if (magic != FRAME_CACHE_MAGIC or mtime_ns != source_stat.st_mtime_ns or source_size != source_stat.st_size
+            or (width, height) != (pixel_size.width(), pixel_size.height())):
+        return None
+    
+    images = []
+    delays = []
+    offset = _FRAME_CACHE_HEADER.size
+    try:
+        for _ in range(count):
+            delay, length = _FRAME_HEADER.unpack_from(data, offset)
+            offset += _FRAME_HEADER.size
+            pixels = zlib.decompress(data[offset:offset + length])
+            offset += length
+            # copy(): la imagen no debe depender del buffer de bytes
+            images.append(QImage(pixels, width, height, width * 4, QImage.Format_ARGB32_Premultiplied).copy())
+            delays.append(delay)
+    except (struct.error, zlib.error):
+        return None
+    return images, delays
+
+def load_frame_animation(path, size, device_pixel_ratio=1.0):
+    """FrameAnimation del GIF escalado, usando la caché en disco si sigue siendo válida"""
+    try:
+        source_stat = os.stat(path)
+    except OSError:
+        return None
+    
+    pixel_size = size * device_pixel_ratio
+    cache_path = frame_cache_path(path, pixel_size)
+    cached = load_frame_cache(cache_path, source_stat, pixel_size)
+    if cached is None:
+        images, delays = decode_gif_frames(path, pixel_size)
+        if not images:
+            return None
+        try:
+            save_frame_cache(cache_path, source_stat, pixel_size, images, delays)
+        except OSError as e:
+            logger.warning("No se pudo guardar la caché de frames: %s", e)
+    else:
+        images, delays = cached
+    
+    pixmaps = []
+    for image in images:
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        pixmaps.append(pixmap)
+    return FrameAnimation(pixmaps, delays)
+
+class FrameAnimation(QObject):
+    """Reproduce frames ya escalados (misma interfaz básica que QMovie)"""
+    frameChanged = pyqtSignal(int)
+    
+    def __init__(self, pixmaps=None, delays=None):
+        super().__init__()
+        self.pixmaps = pixmaps or []
+        self.delays = delays or []
+        self.frame = 0
+        self.speed = 100
+        self.running = False
+        self.paused = False
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.next_frame)
+    
+    def isValid(self):
+        return bool(self.pixmaps)
+    
+    def frameCount(self):
+        return len(self.pixmaps)
+    
+    def currentFrameNumber(self):
+        return self.frame
+    
+    def currentPixmap(self):
+        return self.pixmaps[self.frame] if self.pixmaps else QPixmap()
+    
+    def byte_size(self):
+        return sum(pixmap.width() * pixmap.height() * 4 for pixmap in self.pixmaps)
+    
+    def start(self):
+        if not self.pixmaps:
+            return
+        self.running = True
+        self.paused = False
+        self.frameChanged.emit(self.frame)
+        self._schedule()
+    
+    def stop(self):
+        self.running = False
+        self.paused = False
+        self.timer.stop()
+        self.frame = 0
+    
+    def setPaused(self, paused):
+        if not self.running or paused == self.paused:
+            return
+        self.paused = paused
+        if paused:
+            self.timer.stop()
+        else:
+            self._schedule()
     
-    return info
+    def setSpeed(self, percent):
+        """Velocidad de reproducción en % (100 = la del GIF)"""
+        percent = max(1, percent)
+        if percent == self.speed:
+            return
+        self.speed = percent
+        if self.running and not self.paused and self.timer.isActive():
+            self._schedule()
 
-def format_system_info_for_prompt(system_info: Dict) -> str:
-    """Formatea la información del sistema para incluir en el prompt"""
-    prompt_sections = []
+    def jumpToFrame(self, frame):
+        if not 0 <= frame < len(self.pixmaps):
+            return False
+        self.frame = frame
+        self.frameChanged.emit(frame)
+        return True
+    
+    def next_frame(self):
+        if not self.running or self.paused:
+            return
+        self.frame = (self.frame + 1) % len(self.pixmaps)
+        self.frameChanged.emit(self.frame)
+        self._schedule()
+    
+    def _schedule(self):
+        # Una imagen fija no necesita temporizador
+        if len(self.pixmaps) > 1:
+            self.timer.start(self.delays[self.frame] * 100 // self.speed)
+
+class AnimationCache:
+    """Carga cada animación la primera vez que se usa y guarda unas pocas (LRU)
     
-    if 'sistema' in system_info:
-        sys_info = system_info['sistema']
-        prompt_sections.append(f"SISTEMA: {sys_info['distribucion']} | Kernel: {sys_info['version_kernel']} | Usuario: {sys_info['usuario']}")
-        prompt_sections.append(f"HOST: {sys_info['hostname']} | Hora: {sys_info['fecha_hora']} | Uptime: {system_info.get('uptime', 'N/A')}")
+    El coste de cada animación es la memoria de sus frames ya escalados.
+    """
     
-    if 'cpu' in system_info:
-        cpu = system_info['cpu']
-        prompt_sections.append(f"CPU: {cpu['nucleos_fisicos']} núcleos físicos, {cpu['nucleos_logicos']} lógicos | Uso: {cpu['uso_actual']} | Frecuencia: {cpu.get('frecuencia_actual', 'N/A')}")
+    def __init__(self, paths, size, max_bytes=ANIMATION_CACHE_MAX_BYTES, idle_seconds=ANIMATION_IDLE_SECONDS,
+                 device_pixel_ratio=1.0):
+        self.paths = paths
+        self.size = size
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.device_pixel_ratio = device_pixel_ratio
+        self.movies = OrderedDict()  # nombre -> (FrameAnimation, bytes, último uso)
+        self.total_bytes = 0
+        self.pinned = None  # La animación en pantalla nunca se libera
     
-    if 'memoria' in system_info:
-        mem = system_info['memoria']
-        prompt_sections.append(f"RAM: {mem['total_ram']} total | {mem['ram_disponible']} libre | {mem['porcentaje_ram_usada']} usado | Swap: {mem['total_swap']}")
+    def get(self, name):
+        """Animación ya escalada (None si no existe el archivo)"""
+        entry = self.movies.get(name)
+        if entry is not None:
+            self.movies[name] = (entry[0], entry[1], time.monotonic())
+            self.movies.move_to_end(name)
+            return entry[0]
+        
+        path = self.paths.get(name)
+        if not path:
+            return None
+        movie = load_frame_animation(path, self.size, self.device_pixel_ratio)
+        if movie is None:
+            return None
+        
+        cost = movie.byte_size()
+        self.movies[name] = (movie, cost, time.monotonic())
+        self.total_bytes += cost
+        self._evict()
+        return movie
     
-    if 'discos' in system_info and system_info['discos']:
-        disk_summary = []
-        for disk in system_info['discos'][:3]:
-            disk_summary.append(f"{disk['punto_montaje']}: {disk['porcentaje_usado']} usado ({disk['usado']}/{disk['total']})")
-        if disk_summary:
-            prompt_sections.append(f"DISCOS: {' | '.join(disk_summary)}")
+    def set_device_pixel_ratio(self, device_pixel_ratio):
+        """Otra densidad de píxeles: los frames cargados ya no sirven"""
+        if device_pixel_ratio == self.device_pixel_ratio:
+            return False
+        self.device_pixel_ratio = device_pixel_ratio
+        for name in list(self.movies):
+            self._remove(name)
+        return True
     
-    if 'home_usuario' in system_info and 'error' not in system_info['home_usuario']:
-        home = system_info['home_usuario']
-        prompt_sections.append(f"HOME ({USERNAME}): {home['porcentaje_usado']} usado ({home['usado']}/{home['total']}) libre: {home['libre']}")
+    def pin(self, name):
+        self.pinned = name
     
-    if 'procesos_top' in system_info and system_info['procesos_top']:
-        top_procs = []
-        for i, proc in enumerate(system_info['procesos_top'][:3], 1):
-            top_procs.append(f"{i}. {proc['nombre']} (CPU: {proc['cpu']}, Mem: {proc['memoria']})")
-        if top_procs:
-            prompt_sections.append(f"PROCESOS TOP: {' | '.join(top_procs)}")
-    
-    if 'carga_sistema' in system_info:
-        load = system_info['carga_sistema']
-        prompt_sections.append(f"CARGA: 1min:{load['1_minuto']:.2f} | 5min:{load['5_minutos']:.2f} | 15min:{load['15_minutos']:.2f}")
-
-    if 'red' in system_info and system_info['red']:
-        net_summary = []
-        for net in system_info['red']:
-            if net['interfaz'] != 'lo':
-                net_summary.append(f"{net['interfaz']}: {net['ip']}")
-        if net_summary:
-            prompt_sections.append(f"RED: {' | '.join(net_summary)}")
+    def prefetch(self, names):
+        """Carga las animaciones indicadas antes de que hagan falta"""
+        for name in names:
+            self.get(name)
+    
+    def _evict(self):
+        for name in list(self.movies):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if name != self.pinned:
+                self._remove(name)
+    
+    def evict_idle(self):
+        """Libera las animaciones que llevan tiempo sin usarse"""
+        now = time.monotonic()
+        for name, (movie, cost, last_used) in list(self.movies.items()):
+            if name != self.pinned and now - last_used > self.idle_seconds:
+                self._remove(name)
+    
+    def _remove(self, name):
+        movie, cost, last_used = self.movies.pop(name)
+        movie.stop()
+        self.total_bytes -= cost
+        logger.debug("Animación liberada: %s", name)
+    
+    def stats(self):
+        return {'loaded': list(self.movies), 'bytes': self.total_bytes}
 
-    return "\n".join(prompt_sections)
+class AnimationPowerPolicy:
+    """Decide a qué velocidad se anima Tux y mide cuánta CPU gasta en cada modo"""
 
-def init_audio():
-    """Inicializa el sistema de audio"""
-    try:
-        pygame.init()
-        mixer.init()
-        mixer.music.set_volume(0.7)
+    def __init__(self):
+        self.mode = 'normal'
+        self.mode_since = time.monotonic()
+        self.cpu_since = time.process_time()
+        self.usage = {}  # modo -> [segundos de CPU, segundos en el modo]
+        self.on_battery = False
+        self.last_battery_check = 0.0
+
+    def check_battery(self):
+        """Consulta la batería como mucho cada BATTERY_CHECK_INTERVAL segundos"""
+        now = time.monotonic()
+        if now - self.last_battery_check >= BATTERY_CHECK_INTERVAL:
+            self.last_battery_check = now
+            try:
+                battery = psutil.sensors_battery()
+                self.on_battery = battery is not None and not battery.power_plugged
+            except Exception:
+                self.on_battery = False
+        return self.on_battery
+
+    def choose(self, exposed, busy, inactivity_state):
+        """Modo de energía para el estado actual de Tux"""
+        if not exposed:
+            return 'hidden'
+        if busy:
+            # Pensando o caminando: siempre animación completa
+            return 'normal'
+        if inactivity_state in ('idle', 'relaxed'):
+            return inactivity_state
+        if self.check_battery():
+            return 'battery'
+        return 'normal'
+
+    def set_mode(self, mode):
+        """Cambia de modo acumulando la CPU del anterior; True si cambió"""
+        if mode == self.mode:
+            return False
+        self._account()
+        logger.debug("Modo de animación: %s -> %s", self.mode, mode)
+        self.mode = mode
         return True
-    except Exception as e:
-        # print(f"Error inicializando audio: {e}")
-        return False
 
-def play_bubble_sound():
-    """Reproduce el sonido de burbuja"""
-    try:
-        sound_path = "assets/bubble_sound.mp3"
-        
-        if os.path.exists(sound_path):
-            sound = mixer.Sound(sound_path)
-            sound.set_volume(0.8)
-            sound.play()
-        else:
-            import numpy as np
-            
-            sample_rate = 44100
-            duration = 0.1
-            frequency = 440
-            
-            samples = []
-            for i in range(int(duration * sample_rate)):
-                value = np.sin(2 * np.pi * frequency * i / sample_rate)
-                samples.append(value * 0.5)
-            
-            samples = (np.array(samples) * 32767).astype(np.int16)
-            sound = pygame.mixer.Sound(buffer=samples.tobytes())
-            sound.set_volume(0.6)
-            sound.play()
-            
-    except Exception as e:
-        pass  # Silenciar error de sonido
+    def _account(self):
+        now = time.monotonic()
+        cpu = time.process_time()
+        usage = self.usage.setdefault(self.mode, [0.0, 0.0])
+        usage[0] += cpu - self.cpu_since
+        usage[1] += now - self.mode_since
+        self.mode_since = now
+        self.cpu_since = cpu
+
+    def stats(self):
+        """CPU del proceso (%) y tiempo pasado en cada modo"""
+        self._account()
+        return {
+            mode: {'cpu_percent': cpu / wall * 100 if wall else 0.0, 'seconds': wall}
+            for mode, (cpu, wall) in self.usage.items()
+        }
 
 class Bubble(QLabel):
     def __init__(self, play_sound=True):
@@ -375,14 +2321,13 @@ class Bubble(QLabel):
         
         self.close_button.mousePressEvent = self.close_bubble
         
-        self.screen_check_timer = QTimer()
-        self.screen_check_timer.timeout.connect(self.update_screen_if_needed)
-        self.screen_check_timer.start(100)
-        
         # Variables para calcular la posición de la flecha
         self.arrow_position_x = 0  # Posición X relativa de la flecha
         self.arrow_position = "top"  # Posición inicial de la flecha
         
+        # Texto acumulado durante una respuesta en streaming
+        self.streamed_text = ""
+        
         self.hide()
     
     def paintEvent(self, event):
@@ -460,32 +2405,20 @@ class Bubble(QLabel):
     def set_tux_assistant(self, tux_assistant):
         """Establece la referencia al asistente Tux"""
         self.tux_assistant = tux_assistant
+        tux_assistant.screen_tracker.screenChanged.connect(self.update_screen_if_needed)
+        tux_assistant.screen_tracker.geometryChanged.connect(self.update_screen_if_needed)
 
     def get_tux_screen(self):
         """Obtiene la pantalla donde está el Tux"""
         if not self.tux_assistant:
             return QApplication.primaryScreen()
-        
-        screens = QGuiApplication.screens()
-        tux_pos = self.tux_assistant.pos()
-        
-        for screen in screens:
-            screen_geometry = screen.geometry()
-            if screen_geometry.contains(tux_pos):
-                return screen
-        
-        return QApplication.primaryScreen()
+        return self.tux_assistant.screen_tracker.current_screen or QApplication.primaryScreen()
 
-    def update_screen_if_needed(self):
-        """Actualiza la pantalla si el Tux cambió de monitor"""
-        if not self.tux_assistant or not self.isVisible():
-            return
-        
-        new_screen = self.get_tux_screen()
-        if new_screen != self.current_screen:
-            self.current_screen = new_screen
-            if self.isVisible():
-                self.position_above_tux()
+    def update_screen_if_needed(self, screen=None):
+        """El Tux cambió de monitor (o cambió la geometría): recolocar si está visible"""
+        self.current_screen = self.get_tux_screen()
+        if self.isVisible():
+            self.position_above_tux()
 
     def show_text(self, text, duration=None, play_sound=True):
         """Muestra texto en la burbuja"""
@@ -514,6 +2447,16 @@ class Bubble(QLabel):
         if duration:
             self.hide_timer.start(duration)
 
+    def begin_stream(self):
+        """Prepara la burbuja para recibir una respuesta por partes"""
+        self.hide_timer.stop()
+        self.streamed_text = ""
+
+    def append_text(self, text, play_sound=False):
+        """Añade texto parcial a la respuesta que se está mostrando"""
+        self.streamed_text += text
+        self.show_text(self.streamed_text, play_sound=play_sound)
+
     def format_text(self, text):
         """Formatea el texto para mejor presentación con estilo tecnológico"""
         import re
@@ -572,92 +2515,34 @@ class Bubble(QLabel):
             self.move(screen_geometry.width() - self.width() - 50, 50)
             return
         
-        try:
-            screen = self.current_screen or self.get_tux_screen()
-            screen_geometry = screen.availableGeometry()
-            
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            tux_x = tux_global_pos.x()
-            tux_y = tux_global_pos.y()
-            tux_width = self.tux_assistant.width()
-            tux_height = self.tux_assistant.height()
-            
-            # Calcular el centro del Tux
-            tux_center_x = tux_x + tux_width // 2
-            
-            screen_tux_x = tux_x - screen_geometry.x()
-            screen_tux_y = tux_y - screen_geometry.y()
-            
-            # Calcular posición centrada horizontalmente
-            bubble_x = screen_tux_x + (tux_width // 2) - (self.width() // 2)
-            
-            # Intentar poner encima del Tux primero
-            bubble_y = screen_tux_y - self.height() - 5  # 5px de espacio (sin flecha)
-            self.arrow_position = "bottom"  # Flecha apunta hacia abajo (hacia el Tux)
-            
-            absolute_x = screen_geometry.x() + bubble_x
-            absolute_y = screen_geometry.y() + bubble_y
-            
-            # Guardar la posición X original antes de ajustar
-            original_absolute_x = absolute_x
-            
-            # ✅ VERIFICAR SI HAY ESPACIO SUFICIENTE ARRIBA
-            space_above = screen_tux_y - self.height()
-            if space_above < 20:  # Menos de 20px de espacio arriba
-                # No hay espacio suficiente arriba, mostrar debajo del Tux
-                absolute_y = screen_geometry.y() + screen_tux_y + tux_height + 5
-                self.arrow_position = "top"  # Flecha apunta hacia arriba (hacia el Tux)
-            
-            # ✅ AJUSTAR POSICIÓN HORIZONTAL PARA NO SALIRSE DE LA PANTALLA
-            margin = 30  # Margen mínimo desde los bordes
-            
-            # Ajustar posición izquierda
-            left_adjustment = 0
-            if absolute_x < screen_geometry.x() + margin:
-                left_adjustment = (screen_geometry.x() + margin) - absolute_x
-                absolute_x = screen_geometry.x() + margin
-            
-            # Ajustar posición derecha
-            elif absolute_x + self.width() > screen_geometry.x() + screen_geometry.width() - margin:
-                right_adjustment = absolute_x + self.width() - (screen_geometry.x() + screen_geometry.width() - margin)
-                absolute_x = screen_geometry.x() + screen_geometry.width() - self.width() - margin
-            
-            # ✅ Asegurar que la burbuja no sea más ancha que la pantalla
-            max_width = screen_geometry.width() - 2 * margin
-            if self.width() > max_width:
-                self.setFixedWidth(max_width)
-                self.adjustSize()
-                # Recalcular posición centrada
-                bubble_x = screen_tux_x + (tux_width // 2) - (self.width() // 2)
-                absolute_x = screen_geometry.x() + bubble_x
-                # Ajustar nuevamente si se sale
-                if absolute_x < screen_geometry.x() + margin:
-                    absolute_x = screen_geometry.x() + margin
-            
-            # ✅ CALCULAR LA POSICIÓN DE LA FLECHA PARA APUNTAR AL TUX
-            # Si la burbuja se movió para ajustarse a los bordes, la flecha debe ajustarse
-            bubble_center_x = absolute_x + self.width() // 2
-            tux_center_global_x = tux_x + tux_width // 2
-            
-            # Calcular dónde debería estar la flecha para apuntar al Tux
-            # En coordenadas relativas a la burbuja
-            self.arrow_position_x = tux_center_global_x - absolute_x
-            
-            # Limitar la flecha para que no se salga de los bordes de la burbuja
-            min_arrow_x = self.arrow_width + 10
-            max_arrow_x = self.width() - self.arrow_width - 10
-            self.arrow_position_x = max(min_arrow_x, min(self.arrow_position_x, max_arrow_x))
-            
-            self.move(int(absolute_x), int(absolute_y))
-            self.position_close_button()
-            
-            # Forzar redibujado de la flecha
-            self.update()
-            
-        except Exception as e:
-            screen = self.current_screen or QApplication.primaryScreen()
-            screen_geometry = screen.availableGeometry()
-            self.move(screen_geometry.width() - self.width() - 50, 50)
+        # ✅ Asegurar que la burbuja no sea más ancha que la pantalla
+        tux = self.tux_assistant
+        area = tux.screen_tracker.index.available_at(tux.x(), tux.y())
+        max_width = area.width - 2 * LayoutSolver.BUBBLE_MARGIN
+        if self.width() > max_width:
+            self.setFixedWidth(max_width)
+            self.adjustSize()
+        
+        self.apply_placement(tux.solve_layout(bubble=True, chat=False))
+
+    def apply_placement(self, placement):
+        """Mueve la burbuja a la posición calculada y orienta la flecha hacia el Tux"""
+        if placement.bubble is None:
+            return
+        
+        # Flecha hacia abajo si la burbuja está encima del Tux
+        self.arrow_position = "bottom" if placement.bubble_above else "top"
+        
+        # Limitar la flecha para que no se salga de los bordes de la burbuja
+        min_arrow_x = self.arrow_width + 10
+        max_arrow_x = self.width() - self.arrow_width - 10
+        self.arrow_position_x = max(min_arrow_x, min(placement.arrow_x, max_arrow_x))
+        
+        self.move(placement.bubble.x, placement.bubble.y)
+        self.position_close_button()
+        
+        # Forzar redibujado de la flecha
+        self.update()
 
     def resizeEvent(self, event):
         """Reajusta la posición al cambiar tamaño"""
@@ -675,6 +2560,930 @@ class Bubble(QLabel):
         super().mousePressEvent(event)
 
 
+# 🗄️ HISTORIAL PERSISTENTE
+class ChatMessage(NamedTuple):
+    text: str
+    is_user: bool
+    time: float
+
+class HistoryHit(NamedTuple):
+    time: float
+    is_user: bool
+    text: str
+    snippet: str
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    is_user INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_time ON messages(time);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+class HistoryStore(threading.Thread):
+    """Historial del chat en SQLite con índice FTS5, solo de añadir
+    
+    Los mensajes se encolan sin bloquear y este hilo los escribe por lotes
+    (una transacción por lote). Las búsquedas usan otra conexión.
+    """
+    def __init__(self, path=HISTORY_DB_PATH, batch_seconds=HISTORY_BATCH_SECONDS,
+                 batch_size=HISTORY_BATCH_SIZE):
+        super().__init__(name="HistoryStore", daemon=True)
+        self.path = path
+        self.batch_seconds = batch_seconds
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.written = 0
+        self.batches = 0
+        self._reader = None
+        self.read_lock = threading.Lock()
+
+    def _connect(self, check_same_thread=True):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(HISTORY_SCHEMA)
+        return connection
+
+    def append(self, text, is_user, timestamp=None):
+        """Encola un mensaje para guardarlo (no toca el disco)"""
+        if text:
+            self.queue.put((timestamp or time.time(), int(is_user), text))
+
+    def run(self):
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            logger.warning("No se pudo abrir el historial: %s", e)
+            return
+        
+        stopping = False
+        while not stopping:
+            # Esperar sin despertar hasta que llegue algo; luego juntar lo que llegue en batch_seconds
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.batch_seconds
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            stopping = batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            if rows:
+                self._write(connection, rows)
+            for _ in batch:
+                self.queue.task_done()
+        connection.close()
+
+    def _write(self, connection, rows):
+        try:
+            with connection:
+                connection.executemany("INSERT INTO messages (time, is_user, text) VALUES (?, ?, ?)", rows)
+            self.written += len(rows)
+            self.batches += 1
+        except sqlite3.Error as e:
+            logger.warning("No se pudieron guardar %d mensajes del historial: %s", len(rows), e)
+
+    def flush(self):
+        """Espera a que todo lo encolado esté escrito"""
+        if self.is_alive():
+            self.queue.join()
+
+    def stop(self, timeout=2):
+        """Escribe lo pendiente y termina el hilo"""
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(timeout)
+        with self.read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _read(self, sql, params=()):
+        with self.read_lock:
+            try:
+                if self._reader is None:
+                    self._reader = self._connect(check_same_thread=False)
+                return self._reader.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("No se pudo leer el historial: %s", e)
+                return []
+
+    def recent(self, limit=CHAT_MAX_ROWS):
+        """Últimos mensajes guardados, del más antiguo al más nuevo"""
+        rows = self._read("SELECT text, is_user, time FROM messages ORDER BY id DESC LIMIT ?", (limit,))
+        return [ChatMessage(text, bool(is_user), timestamp) for text, is_user, timestamp in reversed(rows)]
+
+    def search(self, terms, since=None, until=None, is_user=None, limit=HISTORY_SEARCH_LIMIT):
+        """Mensajes más recientes con todos los términos; si no llegan a `limit`, con alguno"""
+        if not terms:
+            return []
+        # Prefijos entre comillas: 'particion' encuentra 'particiones' y nada se interpreta como operador
+        quoted = ['"{}"*'.format(term.replace('"', '')) for term in terms]
+        sql = ["SELECT m.id, m.time, m.is_user, m.text, snippet(messages_fts, 0, '«', '»', '…', 12)",
+               "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid",
+               "WHERE messages_fts MATCH ?"]
+        filters = []
+        if since is not None:
+            sql.append("AND m.time >= ?")
+            filters.append(since)
+        if until is not None:
+            sql.append("AND m.time < ?")
+            filters.append(until)
+        if is_user is not None:
+            sql.append("AND m.is_user = ?")
+            filters.append(int(is_user))
+        # Por rowid (orden de llegada) FTS5 se detiene al llegar a `limit`; ordenar por
+        # relevancia obligaría a puntuar todas las coincidencias
+        sql.append("ORDER BY messages_fts.rowid DESC LIMIT ?")
+        sql = " ".join(sql)
+        
+        hits = OrderedDict()
+        matches = [" AND ".join(quoted)] + ([" OR ".join(quoted)] if len(quoted) > 1 else [])
+        for match in matches:
+            for row_id, timestamp, user, text, snippet in self._read(sql, [match] + filters + [limit]):
+                hits.setdefault(row_id, HistoryHit(timestamp, bool(user), text, snippet))
+            if len(hits) >= limit:
+                break
+        return list(hits.values())[:limit]
+
+history_store = HistoryStore()
+
+def start_history_store():
+    """Arranca el hilo que escribe el historial"""
+    if not history_store.is_alive() and history_store.ident is None:
+        history_store.start()
+    return history_store
+
+# Palabras de la pregunta que no se buscan en el historial
+HISTORY_QUERY_STOPWORDS = {
+    'que', 'me', 'te', 'de', 'del', 'la', 'el', 'los', 'las', 'lo', 'un', 'una', 'sobre', 'acerca',
+    'con', 'en', 'por', 'para', 'y', 'o', 'a', 'al', 'mi', 'tu', 'se', 'algo', 'cuando', 'como',
+    'dijiste', 'contaste', 'hablamos', 'pregunte', 'dije', 'historial', 'tux', 'oye', 'recuerdas',
+    'hoy', 'ayer', 'semana', 'mes', 'pasada', 'pasado', 'esta', 'este', 'antes', 'anterior',
+}
+
+def history_time_range(normalized, now=None):
+    """Intervalo (desde, hasta) mencionado en la pregunta: hoy, ayer, esta semana, la semana pasada..."""
+    now = now or datetime.datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week = today - datetime.timedelta(days=today.weekday())
+    month = today.replace(day=1)
+    if 'semana pasada' in normalized:
+        start, end = week - datetime.timedelta(days=7), week
+    elif 'esta semana' in normalized:
+        start, end = week, None
+    elif 'mes pasado' in normalized:
+        start, end = (month - datetime.timedelta(days=1)).replace(day=1), month
+    elif 'este mes' in normalized:
+        start, end = month, None
+    elif 'ayer' in normalized.split():
+        start, end = today - datetime.timedelta(days=1), today
+    elif 'hoy' in normalized.split():
+        start, end = today, None
+    else:
+        return None, None
+    return start.timestamp(), end.timestamp() if end else None
+
+def answer_from_history(question, store=None, now=None):
+    """Responde '¿qué me dijiste de grub la semana pasada?' buscando en el historial"""
+    store = store or history_store
+    normalized = normalize_question(question)
+    tokens = normalized.split()
+    terms = [token for token in tokens if token not in HISTORY_QUERY_STOPWORDS]
+    if not terms:
+        return "🗂️ ¿Sobre qué tema quieres que busque en lo que hablamos?"
+    
+    since, until = history_time_range(normalized, now)
+    # "me dijiste" busca en las respuestas de Tux; "te pregunté", en las del usuario
+    is_user = None
+    if 'dijiste' in tokens or 'contaste' in tokens:
+        is_user = False
+    elif 'pregunte' in tokens or 'dije' in tokens:
+        is_user = True
+    
+    hits = store.search(terms, since=since, until=until, is_user=is_user)
+    topic = " ".join(terms)
+    if not hits:
+        return f"🗂️ No encontré nada sobre «{topic}» en lo que hablamos."
+    
+    respuesta = f"🗂️ Esto hablamos sobre «{topic}»:\n"
+    for hit in sorted(hits, key=lambda hit: hit.time):
+        when = datetime.datetime.fromtimestamp(hit.time).strftime("%d/%m %H:%M")
+        who = "Tú" if hit.is_user else "Tux"
+        respuesta += f"• {when} {who}: {hit.snippet}\n"
+    return respuesta
+
+# 📚 CONOCIMIENTO DE COMANDOS
+class CommandHit(NamedTuple):
+    name: str
+    summary: str
+    body: str  # Una opción o ejemplo por línea: 'etiqueta\tdescripción'
+    score: float
+    coverage: float  # Fracción de las palabras de la pregunta que aparecen en la página
+    title_coverage: float  # Fracción que aparece (palabras enteras) en el nombre o el resumen
+    verb: bool  # El resumen empieza con el verbo de la pregunta ('copy' en "¿cómo copio...?")
+    object: bool  # El objeto de la pregunta ('carpeta' -> 'directories') está en el nombre o el resumen
+
+COMMAND_INDEX_VERSION = 1  # Súbelo al cambiar cómo se analizan las páginas: el índice se rehace
+COMMAND_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS commands USING fts5(
+    name, summary, body, path UNINDEXED, kind UNINDEXED,
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+"""
+
+# Escapes de roff: fuentes (\fB), tamaños (\s-1), caracteres con nombre (\(em, \[aq]), cadenas (\*(lq)...
+_ROFF_ESCAPE_RE = re.compile(r"\\(?:f(?:\[[^\]]*\]|\(..|.)|s[+-]?\d+|\*?\((..)|\*?\[([^\]]*)\]|\*.|(.))")
+_ROFF_CHARS = {'em': '—', 'en': '–', 'aq': "'", 'cq': "'", 'oq': "'", 'lq': '"', 'rq': '"', 'dq': '"',
+               'bu': '•', 'mi': '-', 'hy': '-', 'ti': '~', 'ha': '^', 'rs': '\\', 'co': '©'}
+_ROFF_SIMPLE = {'-': '-', 'e': '\\', ' ': ' ', '~': ' '}  # \- \e \  \~ ; el resto (\& \| ...) no se ve
+_ROFF_FONT_MACROS = {'B', 'I', 'SM', 'SB'}  # Argumentos separados por espacios
+_ROFF_ALT_MACROS = {'BR', 'BI', 'IB', 'IR', 'RB', 'RI'}  # Fuentes alternadas: argumentos pegados
+_ROFF_BREAK_MACROS = {'PP', 'LP', 'P', 'SS', 'Ss', 'RS', 'RE', 'HP', 'Pp', 'Bl', 'El'}
+_MDOC_FLAGS = {'Fl': '-', 'Ar': '', 'Cm': '', 'Op': '', 'Oo': '', 'Oc': '', 'Pa': '', 'Ic': '', 'Ev': '',
+               'Li': '', 'Sy': '', 'Em': '', 'Dq': '', 'Qq': '', 'Xr': '', 'Nm': '', 'Va': ''}
+
+def _roff_char(match):
+    name = match.group(1) or match.group(2)
+    if name is not None:
+        return _ROFF_CHARS.get(name, '')
+    return _ROFF_SIMPLE.get(match.group(3), '')
+
+def roff_text(line):
+    """Texto visible de una línea de roff (sin escapes ni cambios de fuente)"""
+    return _ROFF_ESCAPE_RE.sub(_roff_char, line)
+
+def _macro_args(args):
+    """Argumentos de una macro, respetando las comillas"""
+    return [arg.strip('"') for arg in re.findall(r'"[^"]*"|\S+', args)]
+
+def parse_man_page(text):
+    """(nombres, resumen, [(opción, descripción)]) de una página man en roff (man o mdoc)"""
+    section = None
+    name_lines = []
+    options = []
+    tag = None
+    description = []
+    expect_tag = False
+
+    def finish():
+        if tag and description:
+            # La primera frase basta para responder
+            sentence = " ".join(description)
+            sentence = re.split(r"(?<=[.;])\s", sentence, 1)[0].rstrip(';')
+            options.append((tag[:COMMAND_TAG_CHARS], sentence[:COMMAND_OPTION_CHARS]))
+
+    for raw in text.splitlines():
+        if raw[:1] in ('.', "'"):
+            macro, _, args = raw[1:].strip().partition(' ')
+            if macro.startswith('\\"'):
+                continue
+            if macro in ('SH', 'Sh'):
+                finish()
+                tag, description = None, []
+                section = roff_text(args).strip().strip('"').upper()
+                continue
+            if macro in ('TP', 'TQ', 'IP', 'It') or macro in _ROFF_BREAK_MACROS:
+                finish()
+                tag, description = None, []
+                if macro in ('TP', 'TQ'):
+                    expect_tag = True
+                elif macro == 'IP' and args:
+                    tag = roff_text(_macro_args(args)[0]).strip()
+                elif macro == 'It' and args:
+                    words = [_MDOC_FLAGS.get(word, word + ' ') for word in args.split()]
+                    tag = roff_text("".join(words)).strip()
+                continue
+            if macro in _ROFF_FONT_MACROS:
+                line = " ".join(_macro_args(args))
+            elif macro in _ROFF_ALT_MACROS:
+                line = "".join(_macro_args(args))
+            elif section == 'NAME' and macro == 'Nm':
+                line = args
+            elif section == 'NAME' and macro == 'Nd':
+                line = "- " + args
+            elif macro in ('Fl', 'Ar', 'Nm', 'Xr', 'Pa', 'Cm'):
+                line = "".join(_MDOC_FLAGS.get(word, word + ' ') for word in args.split())
+            else:
+                continue
+        else:
+            line = raw
+
+        line = roff_text(line).strip()
+        if not line:
+            continue
+        if section == 'NAME':
+            name_lines.append(line)
+        elif expect_tag:
+            tag, expect_tag = line, False
+        elif tag is not None and len(description) < 4:
+            description.append(line)
+    finish()
+
+    names, _, summary = " ".join(name_lines).replace(' -- ', ' - ').partition(' - ')
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    return names, summary.strip(), options
+
+def parse_tldr_page(text):
+    """(nombres, resumen, [(ejemplo, descripción)]) de una página de tldr (markdown)"""
+    names = []
+    summary = []
+    examples = []
+    description = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('# '):
+            names = [line[2:].strip()]
+        elif line.startswith('> ') and not line.startswith('> More information'):
+            summary.append(line[2:].strip())
+        elif line.startswith('- '):
+            description = line[2:].rstrip(':').strip()
+        elif line.startswith('`') and description:
+            command = line.strip('`').replace('{{', '').replace('}}', '')
+            examples.append((command[:COMMAND_TAG_CHARS], description[:COMMAND_OPTION_CHARS]))
+            description = None
+    return names, " ".join(summary), examples
+
+class CommandIndex:
+    """Índice BM25 (SQLite FTS5) de las páginas man y tldr instaladas
+
+    Se construye una vez en CACHE_DIR; update() solo vuelve a leer las
+    páginas nuevas o modificadas y quita las que ya no existen.
+    """
+    def __init__(self, path=COMMAND_INDEX_PATH, man_dirs=COMMAND_MAN_DIRS, tldr_dirs=COMMAND_TLDR_DIRS):
+        self.path = path
+        self.man_dirs = man_dirs
+        self.tldr_dirs = tldr_dirs
+        self.ready = threading.Event()
+        self.update_lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self._reader = None
+        self.last_update = {}
+
+    def _connect(self, check_same_thread=True):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, check_same_thread=check_same_thread)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(COMMAND_SCHEMA)
+        return connection
+
+    def sources(self):
+        """(ruta, tipo, mtime, tamaño) de cada página, sin repetir los enlaces a la misma"""
+        seen = set()
+        folders = [(os.path.join(base, section), 'man') for base in self.man_dirs for section in COMMAND_MAN_SECTIONS]
+        folders += [(os.path.join(base, subdir), 'tldr') for base in self.tldr_dirs for subdir in ('common', 'linux')]
+        for folder, kind in folders:
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    real = os.path.realpath(entry.path) if entry.is_symlink() else entry.path
+                    if real in seen or not entry.is_file():
+                        continue
+                    seen.add(real)
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, kind, stat.st_mtime, stat.st_size
+
+    def _parse(self, path, kind):
+        """Fila (nombre, resumen, cuerpo) de una página, o None si no sirve"""
+        try:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rb') as f:
+                text = f.read().decode('utf-8', errors='replace')
+        except (OSError, EOFError, zlib.error):
+            return None
+        if kind == 'tldr':
+            names, summary, lines = parse_tldr_page(text)
+        else:
+            if text.startswith('.so '):
+                return None  # Solo redirige a otra página que ya se indexa
+            names, summary, lines = parse_man_page(text)
+        if not names:
+            # Sin sección NAME: el nombre del archivo (ls.1.gz -> ls)
+            names = [os.path.basename(path).split('.')[0]]
+        body = "\n".join(f"{tag}\t{description}" for tag, description in lines)
+        return " ".join(names), summary, body[:COMMAND_BODY_CHARS]
+
+    def update(self):
+        """Indexa las páginas nuevas o modificadas y quita las borradas"""
+        with self.update_lock:
+            start = time.perf_counter()
+            try:
+                connection = self._connect()
+            except sqlite3.Error as e:
+                logger.warning("No se pudo abrir el índice de comandos: %s", e)
+                return {}
+            try:
+                if connection.execute("PRAGMA user_version").fetchone()[0] != COMMAND_INDEX_VERSION:
+                    with connection:
+                        connection.execute("DELETE FROM commands")
+                        connection.execute("DELETE FROM sources")
+                    connection.execute(f"PRAGMA user_version = {COMMAND_INDEX_VERSION}")
+                known = {path: (mtime, size) for path, mtime, size in
+                         connection.execute("SELECT path, mtime, size FROM sources")}
+                changed = []
+                current = set()
+                for path, kind, mtime, size in self.sources():
+                    current.add(path)
+                    if known.get(path) != (mtime, size):
+                        changed.append((path, kind, mtime, size))
+                removed = [path for path in known if path not in current]
+
+                # Leer y analizar fuera de la transacción; escribir todo de una vez
+                rows = []
+                for path, kind, mtime, size in changed:
+                    row = self._parse(path, kind)
+                    rows.append((path, kind, mtime, size, row))
+                with connection:
+                    for path in removed + [path for path, *_ in changed]:
+                        connection.execute("DELETE FROM commands WHERE path = ?", (path,))
+                        connection.execute("DELETE FROM sources WHERE path = ?", (path,))
+                    connection.executemany(
+                        "INSERT INTO commands (name, summary, body, path, kind) VALUES (?, ?, ?, ?, ?)",
+                        [(*row, path, kind) for path, kind, mtime, size, row in rows if row])
+                    # También las que no sirven, para no volver a leerlas en cada arranque
+                    connection.executemany("INSERT INTO sources (path, mtime, size) VALUES (?, ?, ?)",
+                                           [(path, mtime, size) for path, kind, mtime, size, row in rows])
+                if len(changed) > COMMAND_OPTIMIZE_CHANGES:
+                    connection.execute("INSERT INTO commands(commands) VALUES ('optimize')")
+                    connection.commit()
+            except sqlite3.Error as e:
+                logger.warning("No se pudo actualizar el índice de comandos: %s", e)
+                return {}
+            finally:
+                connection.close()
+
+            self.last_update = {'pages': len(current), 'changed': len(changed), 'removed': len(removed),
+                                'seconds': time.perf_counter() - start}
+            logger.debug("Índice de comandos: %(pages)d páginas, %(changed)d nuevas o cambiadas, "
+                         "%(removed)d quitadas en %(seconds).2fs", self.last_update)
+            self.ready.set()
+            return self.last_update
+
+    def close(self):
+        with self.read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def _read(self, sql, params=()):
+        with self.read_lock:
+            try:
+                if self._reader is None:
+                    self._reader = self._connect(check_same_thread=False)
+                return self._reader.execute(sql, params).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("No se pudo leer el índice de comandos: %s", e)
+                return []
+
+    def search(self, groups, limit=COMMAND_CANDIDATES):
+        """Páginas que mejor responden a los grupos de términos (cada grupo son sinónimos)
+        
+        FTS5 puntúa con BM25 y luego se favorecen las páginas cuyo nombre o
+        resumen contienen las palabras de la pregunta, sobre todo si el resumen
+        empieza con su verbo ('remove files or directories' para "borrar").
+        En una pregunta como "¿cómo copio una carpeta?" el primer grupo es el
+        verbo y el segundo el objeto.
+        """
+        if not groups:
+            return []
+        # Cada término entre comillas: nada se interpreta como operador
+        match = " OR ".join('"{}"'.format(term.replace('"', '')) for group in groups for term in group)
+        rows = self._read("SELECT name, summary, body, bm25(commands, ?, ?, ?) AS score FROM commands "
+                          "WHERE commands MATCH ? ORDER BY score LIMIT ?",
+                          COMMAND_COLUMN_WEIGHTS + (match, limit))
+        patterns = _command_patterns(groups)
+        words = _command_word_patterns(groups)
+        hits = []
+        for name, summary, body, score in rows:
+            title = f"{name} {summary}"
+            in_title = [bool(word.search(title)) for word in words]
+            title_coverage = sum(in_title) / len(groups)
+            coverage = sum(1 for pattern in patterns if pattern.search(title) or pattern.search(body)) / len(groups)
+            lead = summary.split(None, 1)[0] if summary else ""
+            verb = bool(words[0].fullmatch(lead))
+            has_object = len(groups) > 1 and in_title[1]
+            score = -score * (1 + COMMAND_TITLE_BOOST * title_coverage)
+            if verb:
+                score *= 1 + COMMAND_VERB_BOOST
+            if '-' in name.split()[0]:
+                score *= COMMAND_SUBCOMMAND_PENALTY
+            hits.append(CommandHit(name, summary, body, score, coverage, title_coverage, verb, has_object))
+        hits.sort(key=lambda hit: -hit.score)
+        return hits
+
+    def command_names(self, words):
+        """Las palabras que son el nombre de una orden indexada ('ssh', 'python')"""
+        if not words:
+            return set()
+        match = " OR ".join('name : "{}"'.format(word.replace('"', '')) for word in words)
+        rows = self._read("SELECT name FROM commands WHERE commands MATCH ? ORDER BY rank LIMIT 50", (match,))
+        names = {name for row in rows for name in row[0].lower().split()}
+        return set(words) & names
+
+    def stats(self):
+        rows = self._read("SELECT kind, count(*) FROM commands GROUP BY kind")
+        stats = dict(rows)
+        try:
+            stats['bytes'] = sum(os.path.getsize(self.path + suffix) for suffix in ('', '-wal')
+                                 if os.path.exists(self.path + suffix))
+        except OSError:
+            pass
+        stats.update(self.last_update)
+        return stats
+
+def _stem(term):
+    """Raíz aproximada para comprobar si un término aparece en un texto (compress -> compre)"""
+    return term[:max(4, len(term) - 2)]
+
+def _command_patterns(groups):
+    """Una expresión por grupo que encuentra cualquiera de sus términos al principio de una palabra"""
+    return [re.compile(r"\b(?:{})".format("|".join(re.escape(_stem(term)) for term in group)), re.I)
+            for group in groups]
+
+def _command_word_patterns(groups):
+    """Como _command_patterns pero con palabras enteras en inglés: 'file' encuentra 'files'
+    y 'directory' 'directories', pero 'line' no encuentra 'newline' ni 'count' 'counter'
+    """
+    def word(term):
+        term = re.escape(term)
+        if term.endswith('y'):
+            return term[:-1] + "(?:y|ies)"
+        return term + "(?:s|es)?"
+    return [re.compile(r"\b(?:{})\b".format("|".join(word(term) for term in group)), re.I)
+            for group in groups]
+
+def command_lines(hit, groups, limit=COMMAND_ANSWER_LINES):
+    """Opciones o ejemplos de la página con más palabras de la pregunta
+    
+    El nombre de la orden no cuenta: en "¿qué hace ls?" cualquier línea que
+    mencione 'ls' no dice nada nuevo.
+    """
+    names = set(hit.name.lower().split())
+    groups = [group for group in groups if group[0] not in names]
+    if not groups:
+        return []
+    patterns = _command_patterns(groups)
+    lines = []
+    for line in hit.body.split("\n"):
+        matches = sum(1 for pattern in patterns if pattern.search(line))
+        if matches:
+            lines.append((matches, line))
+    lines.sort(key=lambda item: -item[0])
+    return [line for _, line in lines[:limit]]
+
+command_index = CommandIndex()
+
+def start_command_index():
+    """Construye o pone al día el índice de comandos en segundo plano"""
+    thread = threading.Thread(target=command_index.update, name="tux-commands", daemon=True)
+    thread.start()
+    return thread
+
+# Palabras de la pregunta que no ayudan a buscar el comando
+COMMAND_QUERY_STOPWORDS = {
+    'que', 'cual', 'como', 'comando', 'comandos', 'uso', 'usar', 'utilizo', 'utilizar', 'hago', 'hacer',
+    'puedo', 'se', 'sirve', 'hace', 'para', 'por', 'de', 'del', 'la', 'el', 'los', 'las', 'lo', 'un',
+    'una', 'unos', 'unas', 'en', 'con', 'sin', 'y', 'o', 'a', 'al', 'mi', 'mis', 'me', 'tu', 'su', 'sus',
+    'linux', 'terminal', 'consola', 'linea', 'tux', 'oye', 'es', 'hay', 'algun', 'alguna', 'quiero',
+    'necesito', 'favor', 'debo', 'tengo', 'todo', 'todos', 'todas', 'desde', 'otro', 'otra', 'dentro',
+    'dos', 'varios', 'varias', 'te', 'estas', 'esta', 'este', 'eso', 'esto', 'mejor', 'bien',
+}
+
+# Palabras en español (o su raíz, si acaba en '*') -> términos en inglés de las páginas man
+COMMAND_QUERY_SYNONYMS = {
+    'compri*': ['compress', 'archive'], 'descompri*': ['decompress', 'extract'],
+    'empaquet*': ['archive'], 'extra*': ['extract'], 'list*': ['list'], 'copi*': ['copy'],
+    'mov*': ['move'], 'muev*': ['move'], 'renombr*': ['rename', 'move'], 'borr*': ['remove', 'delete'],
+    'elimin*': ['remove', 'delete'], 'busc*': ['search', 'find', 'match'], 'encontr*': ['find'],
+    'encuentr*': ['find'], 'carpeta*': ['directory'], 'directorio*': ['directory'],
+    'archivo*': ['file'], 'fichero*': ['file'], 'oculto*': ['hidden', 'all'], 'permiso*': ['permission', 'mode'],
+    'propietario*': ['owner'], 'dueno*': ['owner'], 'usuario*': ['user'], 'grupo*': ['group'],
+    'contrasena*': ['password'], 'clave*': ['password', 'key'], 'cambi*': ['change'],
+    'cre*': ['create', 'make'], 'mostr*': ['show', 'display', 'print', 'output'],
+    'muestr*': ['show', 'display', 'print', 'output'], 'simbolic*': ['symbolic'],
+    'ver': ['show', 'display', 'output'], 'veo': ['show', 'display', 'output'], 'texto': ['text'],
+    'linea*': ['line'], 'contar': ['count'], 'cuent*': ['count'], 'palabra*': ['word'],
+    'descarg*': ['download'], 'conect*': ['connect'], 'remot*': ['remote'], 'servidor*': ['server', 'host'],
+    'matar': ['kill'], 'mata': ['kill'], 'mato': ['kill'], 'termin*': ['terminate', 'kill'], 'proceso*': ['process'],
+    'espacio': ['space', 'usage'], 'libre': ['free'], 'tamano*': ['size'], 'ocup*': ['usage', 'size'],
+    'enlace*': ['link'], 'acceso*': ['link', 'access'], 'fecha*': ['date'], 'hora': ['time'],
+    'instal*': ['install'], 'desinstal*': ['remove'], 'paquete*': ['package'],
+    'actualiz*': ['upgrade', 'update'], 'montar': ['mount'], 'monta*': ['mount'], 'desmont*': ['umount'],
+    'red': ['network'], 'firma*': ['sign'], 'cifr*': ['encrypt'], 'sincroniz*': ['synchronize', 'sync'],
+    'comparar': ['compare', 'difference'], 'compar*': ['compare', 'difference'], 'diferencia*': ['difference'],
+    'orden*': ['sort'], 'reinici*': ['restart', 'reboot'], 'apag*': ['shutdown', 'power'],
+    'servicio*': ['service', 'unit'], 'registro*': ['log', 'journal'], 'ultim*': ['last', 'tail'],
+    'primer*': ['first', 'head'], 'reemplaz*': ['replace', 'substitute'], 'sustitu*': ['substitute'],
+    'recursiv*': ['recursive'], 'subcarpeta*': ['recursive'], 'permanente*': ['permanent'],
+    'memoria': ['memory'], 'disco*': ['disk'], 'particion*': ['partition'], 'formate*': ['format'],
+    'imagen*': ['image'], 'pantalla': ['screen'], 'teclado': ['keyboard'], 'tiempo': ['time'],
+    'ejecut*': ['run', 'execute'], 'program*': ['schedule'],
+}
+
+def _command_synonyms():
+    """Separa COMMAND_QUERY_SYNONYMS en palabras exactas y raíces"""
+    exact, prefixes = {}, []
+    for key, terms in COMMAND_QUERY_SYNONYMS.items():
+        if key.endswith('*'):
+            prefixes.append((key[:-1], terms))
+        else:
+            exact[key] = terms
+    # Las raíces más largas primero: 'descompri' antes que 'compri'
+    prefixes.sort(key=lambda item: -len(item[0]))
+    return exact, prefixes
+
+_COMMAND_SYNONYMS_EXACT, _COMMAND_SYNONYMS_PREFIXES = _command_synonyms()
+
+def command_query_groups(question):
+    """Un grupo de términos (la palabra y sus traducciones) por cada palabra útil de la pregunta"""
+    groups = []
+    for token in tokenize_question(question):
+        if token in COMMAND_QUERY_STOPWORDS or len(token) < 2:
+            continue
+        terms = _COMMAND_SYNONYMS_EXACT.get(token)
+        if terms is None:
+            terms = next((terms for prefix, terms in _COMMAND_SYNONYMS_PREFIXES if token.startswith(prefix)), [])
+        group = [token] + [term for term in terms if term != token]
+        if group not in groups:
+            groups.append(group)
+    return groups
+
+def answer_from_commands(question, index=None):
+    """Respuesta inmediata si el índice de comandos está seguro; "" para que conteste la IA"""
+    index = index or command_index
+    groups = command_query_groups(question)
+    if not groups:
+        return ""
+    hits = index.search(groups)
+    if not hits:
+        return ""
+
+    # Si la pregunta nombra una orden instalada ("¿qué hace ls?", "reinicio el servicio ssh"),
+    # solo puede responder su página y con el resto de la pregunta en su resumen; si no, la IA.
+    # Las palabras en español con traducción no cuentan aunque coincidan con una orden ('red')
+    mentioned = index.command_names([group[0] for group in groups if len(group) == 1])
+    if mentioned:
+        best = next((hit for hit in hits if mentioned & set(hit.name.lower().split())), None)
+        if best is None:
+            return ""
+        title = f"{best.name} {best.summary}"
+        others = [group for group in groups if group[0] not in mentioned]
+        if not all(word.search(title) for word in _command_word_patterns(others)):
+            return ""
+    else:
+        # El resumen tiene que empezar con el verbo de la pregunta y nombrar su objeto
+        # ('copy files and directories'); que aparezcan en alguna opción no basta.
+        # Si otra página también cumple y puntúa parecido, la elección no es clara
+        candidates = [hit for hit in hits if hit.verb and hit.object]
+        if not candidates:
+            return ""
+        best = candidates[0]
+        confident = (best.title_coverage >= COMMAND_MIN_TITLE_COVERAGE and
+                     best.coverage >= COMMAND_MIN_COVERAGE and best.score >= COMMAND_MIN_SCORE and
+                     (len(candidates) < 2 or best.score >= candidates[1].score * COMMAND_MIN_MARGIN))
+        if not confident:
+            return ""
+
+    respuesta = f"📘 {best.name}: {best.summary}\n"
+    for line in command_lines(best, groups):
+        tag, _, description = line.partition("\t")
+        respuesta += f"• {tag} — {description}\n"
+    return respuesta
+
+# 💬 HISTORIAL DEL CHAT
+class ChatHistoryModel(QAbstractListModel):
+    """Mensajes recientes del chat; la vista solo ve una ventana acotada con los últimos
+    
+    En memoria se guarda un anillo de `max_messages` (el resto está en el
+    HistoryStore). Cada mensaje se identifica por su posición, que no cambia
+    aunque los más antiguos salgan del anillo.
+    """
+    IsUserRole = Qt.UserRole + 1
+    
+    def __init__(self, max_rows=CHAT_MAX_ROWS, max_messages=HISTORY_MEMORY_MESSAGES):
+        super().__init__()
+        self.messages = deque(maxlen=max(max_messages, max_rows))
+        self.base = 0  # Posición del mensaje más antiguo que sigue en memoria
+        self.first = 0  # Posición del mensaje que ocupa la primera fila
+        self.max_rows = max_rows
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.base + len(self.messages) - self.first
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[self.first - self.base + index.row()]
+        if role == Qt.DisplayRole:
+            return message.text
+        if role == self.IsUserRole:
+            return message.is_user
+        return None
+    
+    def message(self, position):
+        """Mensaje en una posición (None si ya salió de memoria)"""
+        if position < self.base:
+            return None
+        return self.messages[position - self.base]
+    
+    def index_of(self, position):
+        """Índice de la vista de un mensaje (inválido si no está en la ventana)"""
+        if position < self.first:
+            return QModelIndex()
+        return self.index(position - self.first)
+    
+    def extend(self, messages):
+        """Añade varios ChatMessage de una vez (historial guardado)"""
+        messages = list(messages)[-self.messages.maxlen:]
+        if not messages:
+            return
+        self.beginResetModel()
+        for message in messages:
+            self._push(message)
+        self.first = max(self.first, self.base + len(self.messages) - self.max_rows)
+        self.endResetModel()
+    
+    def append(self, text, is_user):
+        """Añade un mensaje al final y devuelve su posición"""
+        if len(self.messages) == self.messages.maxlen and self.first == self.base:
+            # El más antiguo sale del anillo: antes tiene que salir de la vista
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self.first += 1
+            self.endRemoveRows()
+        
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._push(ChatMessage(text, is_user, time.time()))
+        self.endInsertRows()
+        self.trim()
+        return self.base + len(self.messages) - 1
+    
+    def _push(self, message):
+        if len(self.messages) == self.messages.maxlen:
+            self.base += 1
+        self.messages.append(message)
+    
+    def trim(self):
+        """Saca de la ventana los mensajes más antiguos si sobran"""
+        extra = self.rowCount() - self.max_rows
+        if extra > 0:
+            self.beginRemoveRows(QModelIndex(), 0, extra - 1)
+            self.first += extra
+            self.endRemoveRows()
+    
+    def set_text(self, position, text):
+        if position < self.base:
+            return
+        offset = position - self.base
+        self.messages[offset] = self.messages[offset]._replace(text=text)
+        index = self.index_of(position)
+        if index.isValid():
+            self.dataChanged.emit(index, index, [Qt.DisplayRole])
+    
+    def has_older(self):
+        return self.first > self.base
+    
+    def load_older(self, count=CHAT_FETCH_ROWS):
+        """Vuelve a poner en la ventana mensajes anteriores; devuelve cuántos"""
+        count = min(count, self.first - self.base)
+        if count:
+            self.beginInsertRows(QModelIndex(), 0, count - 1)
+            self.first -= count
+            self.endInsertRows()
+        return count
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    """Dibuja cada mensaje como una burbuja con un único estilo compartido
+    
+    El texto maquetado (QTextLayout) se guarda por contenido, así recolocar
+    la lista o repintarla no vuelve a partir las líneas.
+    """
+    MAX_WIDTH = 300  # Ancho máximo de la burbuja (con relleno)
+    PADDING = 12
+    MARGIN_X = 10
+    MARGIN_Y = 4
+    RADIUS = 15
+    
+    def __init__(self, parent=None, cache_size=CHAT_LAYOUT_CACHE):
+        super().__init__(parent)
+        self.font = QFont()
+        self.font.setFamilies(['Segoe UI', 'Arial'])
+        self.font.setPointSize(11)
+        self.font.setWeight(QFont.Medium)
+        self.text_option = QTextOption()
+        self.text_option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+        
+        self.user_brush = QBrush(QColor('#FF6C2C'))
+        self.user_text = QColor('#0A0A0F')
+        self.tux_brush = QBrush(QColor(255, 108, 44, 51))
+        self.tux_border = QPen(QColor('#FF6C2C'), 1)
+        self.tux_text = QColor('#FFFFFF')
+        self.selected_border = QPen(QColor('#FFAD6C'), 2)
+        
+        self.layouts = OrderedDict()  # texto -> (QTextLayout, ancho, alto)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+    
+    def text_layout(self, text):
+        """Texto partido en líneas (de la caché si ya se maquetó)"""
+        cached = self.layouts.get(text)
+        if cached is not None:
+            self.layouts.move_to_end(text)
+            self.hits += 1
+            return cached
+        
+        self.misses += 1
+        # En QTextLayout los saltos de línea se indican con U+2028
+        layout = QTextLayout(text.replace('\n', '\u2028'), self.font)
+        layout.setTextOption(self.text_option)
+        layout.setCacheEnabled(True)
+        text_width = self.MAX_WIDTH - 2 * self.PADDING
+        width = height = 0.0
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(text_width)
+            line.setPosition(QPointF(0, height))
+            height += line.height()
+            width = max(width, line.naturalTextWidth())
+        layout.endLayout()
+        
+        cached = (layout, math.ceil(width), math.ceil(height))
+        self.layouts[text] = cached
+        if len(self.layouts) > self.cache_size:
+            self.layouts.popitem(last=False)
+        return cached
+    
+    def sizeHint(self, option, index):
+        layout, width, height = self.text_layout(index.data(Qt.DisplayRole) or "")
+        return QSize(width + 2 * (self.PADDING + self.MARGIN_X),
+                     height + 2 * (self.PADDING + self.MARGIN_Y))
+    
+    def paint(self, painter, option, index):
+        layout, width, height = self.text_layout(index.data(Qt.DisplayRole) or "")
+        is_user = index.data(ChatHistoryModel.IsUserRole)
+        rect = option.rect
+        bubble_width = width + 2 * self.PADDING
+        if is_user:
+            x = rect.right() - self.MARGIN_X - bubble_width
+        else:
+            x = rect.left() + self.MARGIN_X
+        bubble = QRectF(x, rect.top() + self.MARGIN_Y, bubble_width, height + 2 * self.PADDING)
+        
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        if option.state & QStyle.State_Selected:
+            painter.setPen(self.selected_border)
+        elif is_user:
+            painter.setPen(Qt.NoPen)
+        else:
+            painter.setPen(self.tux_border)
+        painter.setBrush(self.user_brush if is_user else self.tux_brush)
+        painter.drawRoundedRect(bubble.adjusted(0.5, 0.5, -0.5, -0.5), self.RADIUS, self.RADIUS)
+        
+        painter.setPen(self.user_text if is_user else self.tux_text)
+        layout.draw(painter, QPointF(x + self.PADDING, bubble.top() + self.PADDING))
+        painter.restore()
+
+class ChatListView(QListView):
+    """Lista de mensajes del chat; Ctrl+C copia los mensajes seleccionados"""
+    
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Copy):
+            rows = sorted(self.selectionModel().selectedRows(), key=lambda index: index.row())
+            if rows:
+                QApplication.clipboard().setText("\n\n".join(index.data(Qt.DisplayRole) for index in rows))
+            return
+        super().keyPressEvent(event)
+
 class ChatWindow(QWidget):
     def __init__(self, tux_assistant):
         super().__init__()
@@ -683,10 +3492,15 @@ class ChatWindow(QWidget):
         self.init_ui()
         self.setup_animations()
         
-        # Timer para verificar cambios de pantalla
-        self.screen_check_timer = QTimer()
-        self.screen_check_timer.timeout.connect(self.update_screen_if_needed)
-        self.screen_check_timer.start(100)
+        # Respuesta en streaming: mensaje del chat que se va completando
+        self.stream_message = None
+        self.stream_batcher = StreamBatcher(self.on_ai_partial)
+        
+        self.stream_job = None  # Trabajo cuya respuesta se está mostrando por partes
+        
+        # Cambios de pantalla (por señales, sin sondeo)
+        tux_assistant.screen_tracker.screenChanged.connect(self.update_screen_if_needed)
+        tux_assistant.screen_tracker.geometryChanged.connect(self.update_screen_if_needed)
         
     def init_ui(self):
         """Inicializa la interfaz de usuario del chat"""
@@ -725,18 +3539,19 @@ class ChatWindow(QWidget):
         title_layout.addStretch()
         title_layout.addWidget(close_button)
         
-        # Área de chat (scrollable)
-        self.chat_area = QScrollArea()
-        self.chat_area.setWidgetResizable(True)
-        self.chat_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        
-        self.chat_container = QWidget()
-        self.chat_layout = QVBoxLayout(self.chat_container)
-        self.chat_layout.setSpacing(8)
-        self.chat_layout.setContentsMargins(5, 5, 5, 5)
-        self.chat_layout.addStretch()
+        # Área de chat: lista virtual (solo se dibujan los mensajes visibles)
+        self.history_model = ChatHistoryModel()
+        self.history_model.extend(history_store.recent(CHAT_MAX_ROWS))
+        self.message_history = self.history_model.messages
+        self.chat_delegate = ChatMessageDelegate(self)
         
-        self.chat_area.setWidget(self.chat_container)
+        self.chat_view = ChatListView()
+        self.chat_view.setModel(self.history_model)
+        self.chat_view.setItemDelegate(self.chat_delegate)
+        self.chat_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.chat_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.chat_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.chat_view.verticalScrollBar().valueChanged.connect(self.on_chat_scrolled)
         
         # Área de entrada
         input_widget = QWidget()
@@ -759,7 +3574,7 @@ class ChatWindow(QWidget):
         
         # Agregar todos los widgets al layout principal
         main_layout.addLayout(title_layout)
-        main_layout.addWidget(self.chat_area)
+        main_layout.addWidget(self.chat_view)
         main_layout.addWidget(input_widget)
         
         # Configurar el layout principal en el widget ChatWindow
@@ -768,246 +3583,51 @@ class ChatWindow(QWidget):
         
         # Aplicar estilos
         self.apply_styles()
-        
-        # Historial de mensajes
-        self.message_history = []
     
     def get_tux_screen(self):
         """Obtiene la pantalla donde está el Tux"""
         if not self.tux_assistant:
             return QApplication.primaryScreen()
-        
-        screens = QGuiApplication.screens()
-        tux_pos = self.tux_assistant.pos()
-        
-        for screen in screens:
-            screen_geometry = screen.geometry()
-            if screen_geometry.contains(tux_pos):
-                return screen
-        
-        return QApplication.primaryScreen()
+        return self.tux_assistant.screen_tracker.current_screen or QApplication.primaryScreen()
     
-    def update_screen_if_needed(self):
-        """Actualiza la pantalla si el Tux cambió de monitor"""
-        if not self.tux_assistant or not self.isVisible():
-            return
-        
-        new_screen = self.get_tux_screen()
-        if new_screen != self.current_screen:
-            self.current_screen = new_screen
-            if self.isVisible():
-                self.position_near_tux()
+    def update_screen_if_needed(self, screen=None):
+        """El Tux cambió de monitor (o cambió la geometría): recolocar si está visible"""
+        self.current_screen = self.get_tux_screen()
+        if self.isVisible():
+            self.position_near_tux()
     
     def position_near_tux(self):
-        """Posiciona la ventana de chat arriba o abajo del Tux"""
+        """Posiciona la ventana de chat arriba o abajo del Tux (sin tapar la burbuja)"""
         if not self.tux_assistant:
             return
         
-        try:
-            screen = self.current_screen or self.get_tux_screen()
-            screen_geometry = screen.availableGeometry()
-            
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            tux_x = tux_global_pos.x()
-            tux_y = tux_global_pos.y()
-            tux_width = self.tux_assistant.width()
-            tux_height = self.tux_assistant.height()
-            
-            # Calcular posición centrada horizontalmente
-            chat_x = tux_x + (tux_width // 2) - (self.width() // 2)
-            
-            # Primero intentar posicionar ARRIBA del Tux
-            chat_y = tux_y - self.height() - 10  # 10px de espacio
-            
-            # Verificar si hay espacio suficiente arriba
-            space_above = tux_y - screen_geometry.y()
-            if space_above < self.height() + 20:  # Menos de espacio necesario arriba
-                # No hay espacio arriba, posicionar ABAJO del Tux
-                chat_y = tux_y + tux_height + 10
-            
-            # Ajustar horizontalmente para no salirse de la pantalla
-            margin = 20  # Margen mínimo desde los bordes
-            
-            if chat_x < screen_geometry.x() + margin:
-                chat_x = screen_geometry.x() + margin
-            elif chat_x + self.width() > screen_geometry.x() + screen_geometry.width() - margin:
-                chat_x = screen_geometry.x() + screen_geometry.width() - self.width() - margin
-            
-            # Asegurar que no se salga verticalmente
-            if chat_y < screen_geometry.y() + margin:
-                chat_y = screen_geometry.y() + margin
-            elif chat_y + self.height() > screen_geometry.y() + screen_geometry.height() - margin:
-                chat_y = screen_geometry.y() + screen_geometry.height() - self.height() - margin
-            
-            # Si la burbuja está visible, verificar que no se superpongan
-            if self.tux_assistant.bubble and self.tux_assistant.bubble.isVisible():
-                bubble_pos = self.tux_assistant.bubble.pos()
-                bubble_size = self.tux_assistant.bubble.size()
-                
-                # Crear rectángulos para verificar colisión
-                chat_rect = QRect(chat_x, chat_y, self.width(), self.height())
-                bubble_rect = QRect(bubble_pos.x(), bubble_pos.y(), 
-                                  bubble_size.width(), bubble_size.height())
-                
-                # Si se superponen, mover el chat a la posición opuesta
-                if chat_rect.intersects(bubble_rect):
-                    if chat_y < tux_y:  # Si el chat estaba arriba
-                        # Mover abajo
-                        chat_y = tux_y + tux_height + 10
-                    else:  # Si el chat estaba abajo
-                        # Mover arriba si hay espacio
-                        if space_above >= self.height() + 20:
-                            chat_y = tux_y - self.height() - 10
-            
-            self.move(int(chat_x), int(chat_y))
-            
-        except Exception as e:
-            # En caso de error, posicionar en la esquina
-            screen = QGuiApplication.primaryScreen().availableGeometry()
-            self.move(screen.width() - self.width() - 50, 50)
-
+        bubble = self.tux_assistant.bubble
+        self.apply_placement(self.tux_assistant.solve_layout(bubble=bubble.isVisible(), chat=True))
 
-    def position_near_tux_smooth(self):
-        """Posiciona la ventana de chat cerca del Tux con animación suave"""
-        if not self.tux_assistant:
+    def apply_placement(self, placement, animate=False):
+        """Mueve el chat a la posición calculada"""
+        if placement.chat is None:
             return
         
-        try:
-            screen = self.current_screen or self.get_tux_screen()
-            screen_geometry = screen.availableGeometry()
-            
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            tux_x = tux_global_pos.x()
-            tux_y = tux_global_pos.y()
-            tux_width = self.tux_assistant.width()
-            tux_height = self.tux_assistant.height()
-            
-            # Calcular posición centrada horizontalmente
-            target_x = tux_x + (tux_width // 2) - (self.width() // 2)
-            
-            # Primero intentar posicionar ARRIBA del Tux
-            target_y = tux_y - self.height() - 10  # 10px de espacio
-            
-            # Verificar si hay espacio suficiente arriba
-            space_above = tux_y - screen_geometry.y()
-            if space_above < self.height() + 20:  # Menos de espacio necesario arriba
-                # No hay espacio arriba, posicionar ABAJO del Tux
-                target_y = tux_y + tux_height + 10
-            
-            # Ajustar horizontalmente para no salirse de la pantalla
-            margin = 20  # Margen mínimo desde los bordes
-            
-            if target_x < screen_geometry.x() + margin:
-                target_x = screen_geometry.x() + margin
-            elif target_x + self.width() > screen_geometry.x() + screen_geometry.width() - margin:
-                target_x = screen_geometry.x() + screen_geometry.width() - self.width() - margin
-            
-            # Asegurar que no se salga verticalmente
-            if target_y < screen_geometry.y() + margin:
-                target_y = screen_geometry.y() + margin
-            elif target_y + self.height() > screen_geometry.y() + screen_geometry.height() - margin:
-                target_y = screen_geometry.y() + screen_geometry.height() - self.height() - margin
-            
-            # Si la burbuja está visible, verificar que no se superpongan
-            if self.tux_assistant.bubble and self.tux_assistant.bubble.isVisible():
-                bubble_pos = self.tux_assistant.bubble.pos()
-                bubble_size = self.tux_assistant.bubble.size()
-                
-                # Crear rectángulos para verificar colisión
-                chat_rect = QRect(target_x, target_y, self.width(), self.height())
-                bubble_rect = QRect(bubble_pos.x(), bubble_pos.y(), 
-                                  bubble_size.width(), bubble_size.height())
-                
-                # Si se superponen, mover el chat a la posición opuesta
-                if chat_rect.intersects(bubble_rect):
-                    if target_y < tux_y:  # Si el chat estaba arriba
-                        # Mover abajo
-                        target_y = tux_y + tux_height + 10
-                    else:  # Si el chat estaba abajo
-                        # Mover arriba si hay espacio
-                        if space_above >= self.height() + 20:
-                            target_y = tux_y - self.height() - 10
-            
-            # Crear animación para movimiento suave
-            animation = QPropertyAnimation(self, b"pos")
-            animation.setDuration(200)
-            animation.setStartValue(self.pos())
-            animation.setEndValue(QPoint(int(target_x), int(target_y)))
-            animation.setEasingCurve(QEasingCurve.OutCubic)
-            animation.start()
-            
-        except Exception as e:
-            # En caso de error, posicionar sin animación
-            self.position_near_tux()
-
-    def position_above_tux(self):
-        """Posiciona el chat arriba del Tux"""
-        if not self.tux_assistant:
+        target = QPoint(placement.chat.x, placement.chat.y)
+        running = self.move_animation.state() == QPropertyAnimation.Running
+        if not animate:
+            if running:
+                self.move_animation.stop()
+            self.move(target)
             return
         
-        try:
-            screen = self.current_screen or self.get_tux_screen()
-            screen_geometry = screen.availableGeometry()
-            
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            tux_x = tux_global_pos.x()
-            tux_y = tux_global_pos.y()
-            tux_width = self.tux_assistant.width()
-            
-            # Calcular posición centrada horizontalmente
-            chat_x = tux_x + (tux_width // 2) - (self.width() // 2)
-            chat_y = tux_y - self.height() - 10  # 10px de espacio
-            
-            # Ajustar para no salirse de la pantalla
-            margin = 20
-            if chat_x < screen_geometry.x() + margin:
-                chat_x = screen_geometry.x() + margin
-            elif chat_x + self.width() > screen_geometry.x() + screen_geometry.width() - margin:
-                chat_x = screen_geometry.x() + screen_geometry.width() - self.width() - margin
-            
-            if chat_y < screen_geometry.y() + margin:
-                chat_y = screen_geometry.y() + margin
-            
-            self.move(int(chat_x), int(chat_y))
-            
-        except Exception as e:
-            screen = QGuiApplication.primaryScreen().availableGeometry()
-            self.move(screen.width() - self.width() - 50, 50)
-
-    def position_below_tux(self):
-        """Posiciona el chat abajo del Tux"""
-        if not self.tux_assistant:
+        if running:
+            if self.move_animation.endValue() == target:
+                return
+            # Redirigir la animación en curso desde donde está ahora
+            self.move_animation.stop()
+        elif self.pos() == target:
             return
         
-        try:
-            screen = self.current_screen or self.get_tux_screen()
-            screen_geometry = screen.availableGeometry()
-            
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            tux_x = tux_global_pos.x()
-            tux_y = tux_global_pos.y()
-            tux_width = self.tux_assistant.width()
-            tux_height = self.tux_assistant.height()
-            
-            # Calcular posición centrada horizontalmente
-            chat_x = tux_x + (tux_width // 2) - (self.width() // 2)
-            chat_y = tux_y + tux_height + 10  # 10px de espacio
-            
-            # Ajustar para no salirse de la pantalla
-            margin = 20
-            if chat_x < screen_geometry.x() + margin:
-                chat_x = screen_geometry.x() + margin
-            elif chat_x + self.width() > screen_geometry.x() + screen_geometry.width() - margin:
-                chat_x = screen_geometry.x() + screen_geometry.width() - self.width() - margin
-            
-            if chat_y + self.height() > screen_geometry.y() + screen_geometry.height() - margin:
-                chat_y = screen_geometry.y() + screen_geometry.height() - self.height() - margin
-            
-            self.move(int(chat_x), int(chat_y))
-            
-        except Exception as e:
-            screen = QGuiApplication.primaryScreen().availableGeometry()
-            self.move(screen.width() - self.width() - 50, screen.height() - self.height() - 50)
+        self.move_animation.setStartValue(self.pos())
+        self.move_animation.setEndValue(target)
+        self.move_animation.start()
  
  
     def apply_styles(self):
@@ -1049,7 +3669,7 @@ class ChatWindow(QWidget):
                 background-color: #FF4C0C;
             }
             
-            QScrollArea {
+            QListView {
                 border: none;
                 background-color: transparent;
             }
@@ -1125,26 +3745,21 @@ class ChatWindow(QWidget):
         self.hide_animation.setEasingCurve(QEasingCurve.InCubic)
         self.hide_animation.finished.connect(self.hide_completely)
         
+        # Una sola animación de posición, reutilizada y redirigida mientras se arrastra el Tux
+        self.move_animation = QPropertyAnimation(self, b"pos")
+        self.move_animation.setDuration(200)
+        self.move_animation.setEasingCurve(QEasingCurve.OutCubic)
+        
     def show_chat(self):
         """Muestra la ventana de chat con animación"""
         self.current_screen = self.get_tux_screen()
         
-        # Primero posicionar sin mostrar
-        self.position_near_tux()
+        # Es probable que Tux tenga que pensar enseguida (y con datos del sistema)
+        self.tux_assistant.animation_cache.prefetch(THINKING_ANIMATIONS)
+        wake_system_sampler()
         
-        # Asegurarse de que no esté superpuesto con la burbuja
-        if self.tux_assistant.bubble and self.tux_assistant.bubble.isVisible():
-            # Si hay burbuja visible, intentar posicionar en el lado opuesto
-            bubble_pos = self.tux_assistant.bubble.pos()
-            tux_global_pos = self.tux_assistant.mapToGlobal(QPoint(0, 0))
-            
-            # Determinar dónde está la burbuja (arriba o abajo del Tux)
-            if bubble_pos.y() < tux_global_pos.y():
-                # Burbuja arriba, poner chat abajo
-                self.position_below_tux()
-            else:
-                # Burbuja abajo, poner chat arriba
-                self.position_above_tux()
+        # Primero posicionar sin mostrar (sin tapar la burbuja)
+        self.position_near_tux()
         
         self.show()
         self.show_animation.start()
@@ -1154,67 +3769,46 @@ class ChatWindow(QWidget):
         """Oculta completamente la ventana después de la animación"""
         super().hide()
         
-    def add_message(self, text, is_user=True):
-        """Añade un mensaje al chat"""
-        message_widget = QWidget()
-        message_widget.setObjectName("userMessage" if is_user else "tuxMessage")
+    def add_message(self, text, is_user=True, persist=True):
+        """Añade un mensaje al chat y devuelve su posición en el historial"""
+        position = self.history_model.append(text, is_user)
+        if persist:
+            history_store.append(text, is_user)
         
-        message_layout = QHBoxLayout(message_widget)
-        message_layout.setContentsMargins(10, 8, 10, 8)
+        # Scroll al final
+        QTimer.singleShot(50, self.scroll_to_bottom)
         
-        message_label = QLabel(text)
-        message_label.setObjectName("messageText")
-        message_label.setWordWrap(True)
-        message_label.setMaximumWidth(300)
-        message_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        return position
+    
+    def append_to_message(self, position, text):
+        """Añade texto a un mensaje ya mostrado (respuestas en streaming)"""
+        message = self.history_model.message(position)
+        if message is not None:
+            self.set_message_text(position, message.text + text)
         
-        if is_user:
-            message_label.setStyleSheet("""
-                #messageText {
-                    background-color: #FF6C2C;
-                    color: #0A0A0F;
-                    border-radius: 15px;
-                    padding: 12px;
-                    font-family: 'Segoe UI', 'Arial';
-                    font-size: 11pt;
-                    font-weight: 500;
-                }
-            """)
-            message_layout.addStretch()
-            message_layout.addWidget(message_label)
-        else:
-            message_label.setStyleSheet("""
-                #messageText {
-                    background-color: rgba(255, 108, 44, 0.2);
-                    color: #FFFFFF;
-                    border: 1px solid #FF6C2C;
-                    border-radius: 15px;
-                    padding: 12px;
-                    font-family: 'Segoe UI', 'Arial';
-                    font-size: 11pt;
-                    font-weight: 500;
-                }
-            """)
-            message_layout.addWidget(message_label)
-            message_layout.addStretch()
-        
-        # Insertar al principio (arriba del stretch)
-        self.chat_layout.insertWidget(self.chat_layout.count() - 1, message_widget)
-        
-        # Guardar en historial
-        self.message_history.append({
-            'text': text,
-            'is_user': is_user,
-            'time': time.time()
-        })
+        QTimer.singleShot(0, self.scroll_to_bottom)
         
-        # Scroll al final
-        QTimer.singleShot(50, self.scroll_to_bottom)
+    def set_message_text(self, position, text):
+        """Cambia el texto de un mensaje (y su altura en la lista)"""
+        self.history_model.set_text(position, text)
+        index = self.history_model.index_of(position)
+        if index.isValid():
+            self.chat_delegate.sizeHintChanged.emit(index)
         
     def scroll_to_bottom(self):
         """Desplaza el chat hasta el final"""
-        scrollbar = self.chat_area.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        self.chat_view.scrollToBottom()
+        
+    def on_chat_scrolled(self, value):
+        """Arriba del todo: cargar mensajes anteriores sin mover lo que se está viendo"""
+        if value != 0 or not self.history_model.has_older():
+            return
+        
+        scrollbar = self.chat_view.verticalScrollBar()
+        old_maximum = scrollbar.maximum()
+        if self.history_model.load_older():
+            self.chat_view.doItemsLayout()
+            scrollbar.setValue(scrollbar.maximum() - old_maximum)
         
     def send_message(self):
         """Envía el mensaje del usuario"""
@@ -1238,70 +3832,123 @@ class ChatWindow(QWidget):
         self.tux_assistant.start_thinking_animation()
         self.tux_assistant.thinking.start()
         
+        # Respuesta ya conocida y todavía válida. Solo al empezar conversación, como en
+        # AIWorker.cacheable(): a mitad ("¿y la RAM?") la pregunta depende de los turnos
+        # anteriores y el contexto de Ollama se quedaría sin este intercambio
+        first_turn = not self.tux_assistant.conversation.get_context()
+        cached_answer = first_turn and self.tux_assistant.answer_cache.get(text, get_cached_system_snapshot())
+        if cached_answer:
+            self.show_answer(cached_answer)
+            return
+        
         # Verificar si es pregunta del sistema
-        system_keywords = ['proceso', 'memoria', 'cpu', 'disco', 'almacenamiento', 
-                          'sistema', 'consumiendo', 'ram', 'red', 'redes']
-        is_system_question = any(keyword in text.lower() for keyword in system_keywords)
+        route = intent_router.route(text)
+        is_system_question = (route.intent in SYSTEM_ANSWER_INTENTS and
+                              route.confidence >= ROUTE_MIN_CONFIDENCE)
         
         if is_system_question:
-            detailed_answer = get_detailed_system_answer(text)
-            if detailed_answer:
-                self.tux_assistant.thinking.stop()
-                self.tux_assistant.stop_thinking_animation()
-                self.tux_assistant.say(detailed_answer, play_sound=True)
-                # También añadir al chat
-                self.add_message(detailed_answer, is_user=False)
-                return
+            self.submit_job(AssistantJob('system', text, route, timeout_ms=SYSTEM_ANSWER_TIMEOUT_MS))
+        else:
+            self.submit_job(AssistantJob('llm', text, route))
         
-        # Usar IA para otras preguntas
-        if self.tux_assistant.ai_worker and self.tux_assistant.ai_worker.isRunning():
-            self.tux_assistant.ai_worker.stop()
-            self.tux_assistant.ai_worker.wait(1000)
+    def submit_job(self, job):
+        """Entrega un trabajo al planificador y conecta su respuesta al chat"""
+        scheduled = self.tux_assistant.scheduler.submit(job)
+        if scheduled is None:
+            self.show_answer("🐧 Tengo demasiadas preguntas pendientes.\nEspera un momento y vuelve a preguntar.")
+            return
+        if scheduled is not job:
+            # La misma pregunta ya está en marcha: su respuesta sirve para las dos
+            return
         
-        self.tux_assistant.ai_worker = AIWorker(text, include_system_info=True)
-        self.tux_assistant.ai_worker.finished.connect(self.on_ai_response)
-        self.tux_assistant.ai_worker.error.connect(self.on_ai_error)
-        self.tux_assistant.ai_worker.start()
+        if job.kind == 'system':
+            job.finished.connect(functools.partial(self.on_system_answer, job))
+            job.error.connect(functools.partial(self.on_system_answer_error, job))
+        else:
+            job.finished.connect(functools.partial(self.on_ai_response, job))
+            job.error.connect(functools.partial(self.on_ai_error, job))
+            job.partial.connect(functools.partial(self.on_job_partial, job))
         
-    def on_ai_response(self, answer):
-        """Maneja la respuesta de la IA"""
+    def show_answer(self, answer):
+        """Muestra una respuesta completa en la burbuja y en el chat"""
         self.tux_assistant.thinking.stop()
         self.tux_assistant.stop_thinking_animation()
-        
-        # Mostrar en burbuja
         self.tux_assistant.say(answer, play_sound=True)
-        
-        # Añadir al chat
         self.add_message(answer, is_user=False)
         
-        # Limpiar worker
-        if self.tux_assistant.ai_worker:
-            try:
-                self.tux_assistant.ai_worker.finished.disconnect()
-                self.tux_assistant.ai_worker.error.disconnect()
-            except:
-                pass
-            self.tux_assistant.ai_worker = None
-            
-    def on_ai_error(self, error_msg):
-        """Maneja errores de la IA"""
-        self.tux_assistant.thinking.stop()
-        self.tux_assistant.stop_thinking_animation()
-        
-        # Mostrar error en burbuja
-        self.tux_assistant.say(error_msg, play_sound=True)
+        if self.tux_assistant.scheduler.pending() and self.stream_job is None:
+            # Quedan preguntas por responder: Tux sigue pensando
+            self.tux_assistant.start_thinking_animation()
         
-        # Añadir al chat
-        self.add_message(error_msg, is_user=False)
+    def on_system_answer(self, job, answer):
+        """Maneja la respuesta del sistema (vacía si no hay una específica)"""
+        if not answer:
+            # No hay respuesta directa: preguntar a la IA
+            self.submit_job(AssistantJob('llm', job.question, job.route))
+            return
         
-        # Limpiar worker
-        if self.tux_assistant.ai_worker:
-            try:
-                self.tux_assistant.ai_worker.finished.disconnect()
-                self.tux_assistant.ai_worker.error.disconnect()
-            except:
-                pass
-            self.tux_assistant.ai_worker = None
+        self.show_answer(answer)
+        
+    def on_system_answer_error(self, job, error_msg):
+        """Si falla o tarda la respuesta del sistema, se usa la IA"""
+        self.on_system_answer(job, "")
+        
+    def reset_stream(self):
+        """Descarta el estado de la respuesta en streaming actual"""
+        self.stream_batcher.clear()
+        self.stream_message = None
+        self.stream_job = None
+        
+    def on_job_partial(self, job, text):
+        """Solo una respuesta se muestra por partes; las demás aparecen al terminar"""
+        if self.stream_job is None or self.stream_job.state == 'cancelled':
+            self.reset_stream()
+            self.stream_job = job
+        if job is self.stream_job:
+            self.stream_batcher.push(text)
+        
+    def on_ai_partial(self, text):
+        """Muestra texto parcial de la IA (como máximo una vez por frame)"""
+        if self.stream_message is None:
+            # Primer fragmento: termina la animación de pensamiento
+            self.tux_assistant.thinking.stop()
+            self.tux_assistant.stop_thinking_animation()
+            self.tux_assistant.begin_streamed_answer()
+            self.stream_message = self.add_message("", is_user=False, persist=False)
+        
+        self.tux_assistant.append_streamed_answer(text)
+        self.append_to_message(self.stream_message, text)
+        
+    def on_ai_response(self, job, answer):
+        """Maneja la respuesta de la IA"""
+        if job.worker and job.worker.final_data.get("done"):
+            # "¿y eso?" en mitad de una conversación (o con recuerdos en el prompt) no se
+            # puede reutilizar en otra: solo se guardan las respuestas a preguntas sueltas
+            if job.worker.cacheable():
+                self.tux_assistant.answer_cache.put(job.question, answer, get_cached_system_snapshot())
+            semantic_memory.remember(job.question, answer)
+        
+        if job is self.stream_job:
+            self.stream_batcher.flush()
+        
+        if job is self.stream_job and self.stream_message is not None:
+            # La respuesta ya se mostró por partes: dejar el texto final
+            self.set_message_text(self.stream_message, answer)
+            history_store.append(answer, is_user=False)
+            self.tux_assistant.finish_streamed_answer(answer)
+            self.reset_stream()
+            if self.tux_assistant.scheduler.pending():
+                self.tux_assistant.start_thinking_animation()
+        else:
+            if job is self.stream_job:
+                self.reset_stream()
+            self.show_answer(answer)
+            
+    def on_ai_error(self, job, error_msg):
+        """Maneja errores de la IA"""
+        if job is self.stream_job:
+            self.reset_stream()
+        self.show_answer(error_msg)
 
 
 
@@ -1331,50 +3978,241 @@ class ThinkingIndicator:
         self.bubble.show_text(f"{dots}", play_sound=False)
         self.step += 1
 
+class StreamBatcher:
+    """Agrupa los fragmentos de texto parcial y los entrega una vez por frame"""
+    def __init__(self, callback, interval=STREAM_FRAME_MS):
+        self.callback = callback
+        self.pending = []
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def push(self, text):
+        if not text:
+            return
+        self.pending.append(text)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.pending:
+            return
+        text = "".join(self.pending)
+        self.pending = []
+        self.callback(text)
+
+    def clear(self):
+        self.timer.stop()
+        self.pending = []
+
+class DragStats:
+    """Latencia del arrastre: desde el evento del ratón hasta que se aplica la posición"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.events = 0
+        self.frames = 0
+        self.latencies = []
+
+    def record_frame(self, latency):
+        self.frames += 1
+        self.latencies.append(latency)
+
+    def report(self):
+        """Eventos, frames y latencia (ms) del último arrastre"""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'events': self.events, 'frames': 0}
+        return {
+            'events': self.events,
+            'frames': self.frames,
+            'avg_ms': sum(latencies) / len(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if len(latencies) > 1 else latencies[0] * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+
+class CancellationToken:
+    """Cancela una petición a Ollama desde otro hilo cortando su conexión
+    
+    OllamaClient registra la conexión antes de enviar la petición, así que se
+    puede cancelar también mientras Ollama carga el modelo o evalúa el prompt
+    (antes de que lleguen las cabeceras).
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def attach(self, connection):
+        """Asocia la conexión HTTP de la petición en curso (se corta si ya se canceló)"""
+        with self._lock:
+            self._connection = connection
+        if self.cancelled:
+            self._abort(connection)
+
+    def detach(self):
+        """La conexión vuelve al pool: cancelar ya no debe cortarla"""
+        with self._lock:
+            self._connection = None
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            connection = self._connection
+        if connection is not None:
+            self._abort(connection)
+
+    @staticmethod
+    def _abort(connection):
+        """Corta el socket: el hilo bloqueado se desbloquea y Ollama aborta la generación"""
+        sock = connection.sock
+        try:
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+class ConversationSession:
+    """Mantiene el contexto (caché KV) de Ollama entre preguntas de una conversación"""
+    def __init__(self, max_context=CONVERSATION_MAX_CONTEXT):
+        self.max_context = max_context
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Olvida la conversación; la siguiente pregunta vuelve a enviar el prompt completo"""
+        with self.lock:
+            self.context = None
+            self.turns = 0
+            self.last_prompt_eval_count = 0
+            self.last_eval_count = 0
+            self.total_prompt_eval_count = 0
+            self.total_eval_count = 0
+
+    def get_context(self):
+        """Contexto de la conversación (None si la siguiente pregunta empieza de cero)"""
+        with self.lock:
+            return self.context
+
+    def record(self, data):
+        """Guarda el contexto y las métricas devueltas en el último fragmento de Ollama"""
+        with self.lock:
+            context = data.get("context")
+            if context and len(context) <= self.max_context:
+                self.context = context
+            else:
+                self.context = None
+            
+            self.turns += 1
+            self.last_prompt_eval_count = data.get("prompt_eval_count", 0)
+            self.last_eval_count = data.get("eval_count", 0)
+            self.total_prompt_eval_count += self.last_prompt_eval_count
+            self.total_eval_count += self.last_eval_count
+        
+        logger.debug(
+            "Turno %d: %d tokens de prompt evaluados, %d generados",
+            self.turns, self.last_prompt_eval_count, self.last_eval_count
+        )
+
+    def stats(self):
+        """Devuelve las métricas de tokens de la conversación"""
+        with self.lock:
+            return {
+                'turnos': self.turns,
+                'tokens_contexto': len(self.context) if self.context else 0,
+                'prompt_eval_ultimo': self.last_prompt_eval_count,
+                'eval_ultimo': self.last_eval_count,
+                'prompt_eval_total': self.total_prompt_eval_count,
+                'eval_total': self.total_eval_count
+            }
+
 class AIWorker(QThread):
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
+    partial = pyqtSignal(str)
     
-    def __init__(self, prompt, include_system_info=True):
+    def __init__(self, prompt, include_system_info=True, stream=STREAM_RESPONSES, conversation=None, route=None):
         super().__init__()
         self.prompt = prompt
         self.include_system_info = include_system_info
-        self.is_running = True
+        self.stream = stream
+        self.conversation = conversation or ConversationSession()
+        self.route = route
+        self.built_prompt = None
+        self.first_turn = True  # Sin contexto de turnos anteriores
+        self.final_data = {}
+        self.cancel_token = CancellationToken()
+        self.busy = False  # Ollama respondió 503 (cola llena)
         
     def run(self):
+        import requests
+        
         try:
-            system_context = ""
+            # Con contexto previo el modelo ya recibió la personalidad y los turnos anteriores
+            context = self.conversation.get_context()
+            self.first_turn = not context
+            route = self.route or intent_router.route(self.prompt)
+            
+            system_info = None
             if self.include_system_info:
                 try:
-                    system_info = get_system_info()
-                    system_context = format_system_info_for_prompt(system_info)
+                    # Solo se ponen al día las secciones que pueden entrar en el prompt
+                    system_info = get_system_snapshot(prompt_builder.select_sections(route, self.first_turn))
                 except Exception as e:
-                    system_context = "[Información del sistema no disponible]"
+                    system_info = {'error': str(e)}
             
-            full_prompt = f"{TUX_SYSTEM_PROMPT}\n\n"
+            # Conversaciones anteriores parecidas a esta pregunta
+            memories = semantic_memory.recall(self.prompt)
             
-            if system_context:
-                full_prompt += f"INFORMACIÓN ACTUAL DEL SISTEMA:\n{system_context}\n\n"
+            self.built_prompt = prompt_builder.build(
+                self.prompt, system_info, route, first_turn=self.first_turn, memories=memories
+            )
             
-            full_prompt += f"Usuario: {self.prompt}\nTux:"
+            payload = {
+                "model": MODEL_NAME,
+                "prompt": self.built_prompt.text,
+                "stream": self.stream,
+                "keep_alive": OLLAMA_KEEP_ALIVE
+            }
+            if context:
+                payload["context"] = context
             
-            session = requests.Session()
-            session.timeout = (5, 30)
+            if self.cancel_token.cancelled:
+                return
             
-            response = session.post(
-                OLLAMA_URL,
-                json={
-                    "model": MODEL_NAME,
-                    "prompt": full_prompt,
-                    "stream": False
-                }
-            )
+            response = None
+            try:
+                # La conexión se registra en el token antes de enviar: stop() la corta
+                # también mientras Ollama carga el modelo o evalúa el prompt
+                response = ollama_client.generate(payload, stream=self.stream, cancel_token=self.cancel_token)
+                if response.status_code == 503:
+                    # Ollama tiene su cola llena: el planificador reintentará más tarde
+                    self.busy = True
+                    self.error.emit("🐧 Ollama está muy ocupado ahora mismo.\nInténtalo de nuevo en un momento.")
+                    return
+                
+                if self.stream:
+                    text = self.read_stream(response).strip()
+                else:
+                    self.final_data = response.json()
+                    text = self.final_data.get("response", "").strip()
+            finally:
+                self.cancel_token.detach()
+                if response is not None:
+                    response.close()
             
-            if not self.is_running:
+            if self.cancel_token.cancelled:
                 return
-                
-            data = response.json()
-            text = data.get("response", "").strip()
+            
+            if self.final_data.get("done"):
+                self.conversation.record(self.final_data)
             
             if not text:
                 self.finished.emit("🤔 Mmm… no supe qué decir.\nIntenta preguntarme de otra forma.")
@@ -1382,34 +4220,162 @@ class AIWorker(QThread):
                 self.finished.emit(text)
                 
         except requests.exceptions.Timeout:
-            if self.is_running:
+            if not self.cancel_token.cancelled:
                 self.error.emit("⏳ La respuesta tardó demasiado.\nIntenta con una pregunta más corta.")
         except Exception as e:
-            if self.is_running:
+            if not self.cancel_token.cancelled:
                 self.error.emit("No puedo conectarme con Ollama 😢")
     
-    def stop(self):
-        """Método para detener el hilo de forma segura"""
+    def cacheable(self):
+        """La respuesta depende solo de la pregunta: primer turno, sin recuerdos y completa"""
+        return (bool(self.final_data.get("done")) and self.built_prompt is not None and
+                self.first_turn and not self.built_prompt.memory_tokens)
+    
+    def read_stream(self, response):
+        """Lee los fragmentos NDJSON de Ollama y emite cada parte al llegar"""
+        chunks = []
+        for line in response.iter_lines():
+            # Entre fragmentos: si se canceló, dejar de leer (la conexión ya se cerró)
+            if self.cancel_token.cancelled:
+                break
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise RuntimeError(data["error"])
+            chunk = data.get("response", "")
+            if not chunks:
+                # Evitar emitir espacios en blanco iniciales
+                chunk = chunk.lstrip()
+            if chunk:
+                chunks.append(chunk)
+                self.partial.emit(chunk)
+            if data.get("done"):
+                self.final_data = data
+                break
+        return "".join(chunks)
+    
+    def stop(self, timeout=AI_STOP_TIMEOUT_MS):
+        """Cancela la respuesta (cerrando la conexión) y espera un tiempo acotado"""
+        self.cancel_token.cancel()
+        return self.wait(timeout)
+
+class ModelWarmupWorker(QThread):
+    """Carga el modelo en memoria con un prompt vacío para que la primera pregunta no espere"""
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    
+    def __init__(self):
+        super().__init__()
+        self.cancel_token = CancellationToken()
+    
+    def run(self):
+        response = None
+        try:
+            started = time.monotonic()
+            # Cargar un modelo grande puede tardar minutos: stop() corta la conexión
+            response = ollama_client.generate(
+                {
+                    "model": MODEL_NAME,
+                    "prompt": "",
+                    "stream": False,
+                    "keep_alive": OLLAMA_KEEP_ALIVE
+                },
+                timeout=(5, 300),
+                cancel_token=self.cancel_token
+            )
+            response.raise_for_status()
+            logger.info("Modelo %s cargado en %.2f s (keep_alive=%s)",
+                        MODEL_NAME, time.monotonic() - started, OLLAMA_KEEP_ALIVE)
+            self.finished.emit("")
+        except Exception as e:
+            if self.cancel_token.cancelled:
+                logger.debug("Precarga del modelo cancelada")
+                return
+            logger.warning("No se pudo precargar el modelo: %s", e)
+            self.error.emit(str(e))
+        finally:
+            self.cancel_token.detach()
+            if response is not None:
+                response.close()
+    
+    def stop(self, timeout=AI_STOP_TIMEOUT_MS):
+        """Cancela la precarga (cerrando la conexión) y espera un tiempo acotado"""
+        self.cancel_token.cancel()
+        return self.wait(timeout)
+
+class SystemAnswerWorker(QThread):
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    
+    def __init__(self, question, route=None):
+        super().__init__()
+        self.question = question
+        self.route = route
+        self.is_running = True
+        
+    def run(self):
+        try:
+            answer = get_detailed_system_answer(self.question, self.route)
+            if self.is_running:
+                self.finished.emit(answer)
+        except Exception as e:
+            if self.is_running:
+                self.error.emit(str(e))
+    
+    def stop(self, timeout=0):
+        """Descarta el resultado; el hilo termina por sí solo (la E/S tiene timeout)"""
         self.is_running = False
-        self.terminate()
-        self.wait(2000)
+        return self.wait(timeout)
 
-def get_detailed_system_answer(question_type: str) -> str:
+_public_ip_cache = {'ip': None, 'time': 0.0}
+
+def get_public_ip(timeout=PUBLIC_IP_TIMEOUT) -> Optional[str]:
+    """Obtiene la IP pública (con timeout y reutilizando el último valor)"""
+    if _public_ip_cache['ip'] and time.monotonic() - _public_ip_cache['time'] < PUBLIC_IP_TTL:
+        return _public_ip_cache['ip']
+    
+    import urllib.request
+    public_ip = urllib.request.urlopen('https://api.ipify.org', timeout=timeout).read().decode('utf8')
+    _public_ip_cache['ip'] = public_ip
+    _public_ip_cache['time'] = time.monotonic()
+    return public_ip
+
+def get_detailed_system_answer(question_type: str, route: Optional[Route] = None) -> str:
     """Obtiene respuestas detalladas para preguntas específicas del sistema"""
     try:
-        system_info = get_system_info()
-        
-        if "proceso" in question_type.lower() or "consumiendo" in question_type.lower():
-            if 'procesos_top' in system_info and system_info['procesos_top']:
-                respuesta = "🎯 Procesos que más consumen:\n"
-                for i, proc in enumerate(system_info['procesos_top'][:5], 1):
+        route = route or intent_router.route(question_type)
+        intent = route.intent
+        system_info = get_system_snapshot(route_sections(route))
+        
+        if intent == 'historial':
+            return answer_from_history(question_type)
+        
+        if intent == 'comandos':
+            # Vacía si el índice no está seguro: on_system_answer pregunta a la IA
+            return answer_from_commands(question_type)
+        
+        if intent == 'procesos':
+            if 'memoria' in route.scores:
+                section, titulo = 'procesos_memoria', "🎯 Procesos que más memoria usan:\n"
+            elif 'discos' in route.scores:
+                section, titulo = 'procesos_io', "🎯 Procesos que más leen/escriben en disco:\n"
+            else:
+                section, titulo = 'procesos_top', "🎯 Procesos que más consumen:\n"
+            
+            if section in system_info and system_info[section]:
+                respuesta = titulo
+                for i, proc in enumerate(system_info[section][:5], 1):
                     respuesta += f"{i}. {proc['nombre']} (PID: {proc['pid']})\n"
-                    respuesta += f"   CPU: {proc['cpu']} | Memoria: {proc['memoria']}\n"
+                    if section == 'procesos_io':
+                        respuesta += f"   E/S: {proc['io']} | CPU: {proc['cpu']}\n"
+                    else:
+                        respuesta += f"   CPU: {proc['cpu']} | Memoria: {proc['memoria']} ({proc['rss']})\n"
                 return respuesta
             else:
                 return "No pude obtener información de procesos en este momento."
         
-        elif "memoria" in question_type.lower() or "ram" in question_type.lower():
+        elif intent == 'memoria':
             if 'memoria' in system_info:
                 mem = system_info['memoria']
                 respuesta = "🧠 Estado de la memoria:\n"
@@ -1420,7 +4386,7 @@ def get_detailed_system_answer(question_type: str) -> str:
                 respuesta += f"• Swap usado: {mem['swap_usada']}\n"
                 return respuesta
         
-        elif "disco" in question_type.lower() or "almacenamiento" in question_type.lower():
+        elif intent == 'discos':
             if 'discos' in system_info and system_info['discos']:
                 respuesta = "💾 Estado de los discos:\n"
                 for disk in system_info['discos']:
@@ -1429,7 +4395,7 @@ def get_detailed_system_answer(question_type: str) -> str:
                     respuesta += f"  Libre: {disk['libre']} | FS: {disk['sistema_archivos']}\n"
                 return respuesta
         
-        elif "cpu" in question_type.lower() or "procesador" in question_type.lower():
+        elif intent == 'cpu':
             if 'cpu' in system_info:
                 cpu = system_info['cpu']
                 respuesta = "⚡ Estado del CPU:\n"
@@ -1440,7 +4406,7 @@ def get_detailed_system_answer(question_type: str) -> str:
                     respuesta += f"• Frecuencia: {cpu['frecuencia_actual']}\n"
                 return respuesta
         
-        elif "sistema" in question_type.lower() or "información" in question_type.lower():
+        elif intent == 'sistema':
             respuesta = "📊 Información completa del sistema:\n"
             if 'sistema' in system_info:
                 sys_info = system_info['sistema']
@@ -1454,8 +4420,9 @@ def get_detailed_system_answer(question_type: str) -> str:
             if 'carga_sistema' in system_info:
                 load = system_info['carga_sistema']
                 respuesta += f"• Carga sistema: 1min:{load['1_minuto']:.2f} | 5min:{load['5_minutos']:.2f} | 15min:{load['15_minutos']:.2f}\n"
+            return respuesta
 
-        elif "red" in question_type.lower() or "ip" in question_type.lower() or "conexión" in question_type.lower() or "internet" in question_type.lower():
+        elif intent == 'red':
             if 'red' in system_info and system_info['red']:
                 respuesta = "🌐 Información de red:\n"
                 for net in system_info['red']:
@@ -1465,8 +4432,7 @@ def get_detailed_system_answer(question_type: str) -> str:
                         respuesta += f"  Máscara: {net['mascara']}\n"
                 
                 try:
-                    import urllib.request
-                    public_ip = urllib.request.urlopen('https://api.ipify.org').read().decode('utf8')
+                    public_ip = get_public_ip()
                     respuesta += f"• IP Pública: {public_ip}\n"
                 except:
                     respuesta += "• IP Pública: No se pudo obtener\n"
@@ -1478,8 +4444,287 @@ def get_detailed_system_answer(question_type: str) -> str:
     except Exception as e:
         return ""
 
+# 🗂️ PLANIFICADOR DE TRABAJOS DEL ASISTENTE
+PRIORITY_INTERACTIVE = 0  # Preguntas del usuario
+PRIORITY_BACKGROUND = 10  # Precargas y trabajo que nadie está esperando
+
+class AssistantJob(QObject):
+    """Trabajo del asistente: pregunta a la IA ('llm'), respuesta del sistema ('system') o precarga ('prefetch')"""
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    partial = pyqtSignal(str)
+    
+    def __init__(self, kind, question="", route=None, priority=PRIORITY_INTERACTIVE, timeout_ms=None):
+        super().__init__()
+        self.kind = kind
+        self.question = question
+        self.route = route
+        self.priority = priority
+        self.timeout_ms = timeout_ms
+        # Dos preguntas iguales (normalizadas) se atienden con un solo trabajo
+        self.key = (kind, normalize_question(question))
+        self.state = 'queued'  # queued | running | done | cancelled
+        self.seq = 0
+        self.worker = None
+        self.attempts = 0
+        self.timer = None
+        self.started_at = None
+        self.first_output_at = None
+    
+    @property
+    def uses_ollama(self):
+        return self.kind in AssistantScheduler.OLLAMA_KINDS
+
+class AssistantScheduler(QObject):
+    """Cola acotada con prioridades para el trabajo del asistente
+    
+    Une preguntas repetidas, limita las peticiones simultáneas a Ollama y
+    frena (backoff) cuando Ollama responde 503 o tarda demasiado.
+    """
+    OLLAMA_KINDS = ('llm', 'prefetch')
+    
+    def __init__(self, worker_factories, max_concurrent=OLLAMA_MAX_CONCURRENT, max_queue=SCHEDULER_MAX_QUEUE):
+        super().__init__()
+        self.worker_factories = worker_factories  # tipo -> función(job) que crea el QThread
+        self.max_concurrent = max(1, max_concurrent)
+        self.limit = self.max_concurrent  # Límite efectivo (baja mientras Ollama va lento)
+        self.max_queue = max_queue
+        self.queue = []  # Montículo de (prioridad, orden, trabajo)
+        self.queued = 0
+        self.jobs_by_key = {}
+        self.running = []
+        self.retired_workers = []
+        self.sequence = 0
+        self.ollama_state = 'starting'
+        self.backoff = 0.0
+        self.resume_at = 0.0
+        
+        self.resume_timer = QTimer()
+        self.resume_timer.setSingleShot(True)
+        self.resume_timer.timeout.connect(self.dispatch)
+    
+    def submit(self, job):
+        """Encola un trabajo
+        
+        Devuelve el trabajo que lo atenderá (otro igual si ya estaba pendiente)
+        o None si la cola está llena.
+        """
+        existing = self.jobs_by_key.get(job.key)
+        if existing is not None:
+            if existing.state == 'queued' and job.priority < existing.priority:
+                # Alguien espera ahora este trabajo: subirlo de prioridad
+                existing.priority = job.priority
+                heapq.heappush(self.queue, (existing.priority, existing.seq, existing))
+            return existing
+        
+        if self.queued >= self.max_queue and not self._drop_lowest(job.priority):
+            logger.warning("Cola del asistente llena, se descarta: %s", job.key)
+            return None
+        
+        self.sequence += 1
+        job.seq = self.sequence
+        self._enqueue(job)
+        self.jobs_by_key[job.key] = job
+        self.dispatch()
+        return job
+    
+    def _enqueue(self, job):
+        job.state = 'queued'
+        heapq.heappush(self.queue, (job.priority, job.seq, job))
+        self.queued += 1
+    
+    def _drop_lowest(self, priority):
+        """Descarta el trabajo pendiente menos prioritario si lo es menos que priority"""
+        candidates = [entry for entry in self.queue if entry[2].state == 'queued' and entry[0] == entry[2].priority]
+        if not candidates:
+            return False
+        worst = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= priority:
+            return False
+        self.cancel(worst[2])
+        return True
+    
+    def pending(self, priority=PRIORITY_INTERACTIVE):
+        """Trabajos en cola o en curso con al menos esa prioridad"""
+        return sum(1 for job in self.jobs_by_key.values() if job.priority <= priority)
+    
+    def set_ollama_state(self, state):
+        """'starting' retiene el trabajo de Ollama; 'unavailable' lo rechaza"""
+        self.ollama_state = state
+        if state == 'unavailable':
+            for job in [entry[2] for entry in self.queue]:
+                if job.state == 'queued' and job.uses_ollama:
+                    self._fail(job, "No puedo conectarme con Ollama 😢")
+        self.dispatch()
+    
+    def _ollama_slot_free(self, now):
+        if self.ollama_state == 'starting':
+            return False
+        if now < self.resume_at:
+            if not self.resume_timer.isActive():
+                self.resume_timer.start(int((self.resume_at - now) * 1000) + 1)
+            return False
+        return sum(1 for job in self.running if job.uses_ollama) < self.limit
+    
+    def dispatch(self):
+        """Arranca los trabajos pendientes que tengan sitio, por prioridad"""
+        now = time.monotonic()
+        waiting = []
+        while self.queue:
+            priority, seq, job = heapq.heappop(self.queue)
+            if job.state != 'queued' or priority != job.priority:
+                continue  # Entrada obsoleta (cancelado o con otra prioridad)
+            if job.uses_ollama and not self._ollama_slot_free(now):
+                # Lo que no usa Ollama (respuestas del sistema) puede seguir
+                waiting.append((priority, seq, job))
+                continue
+            self.queued -= 1
+            self._start(job)
+        for entry in waiting:
+            heapq.heappush(self.queue, entry)
+    
+    def _start(self, job):
+        job.state = 'running'
+        job.attempts += 1
+        job.started_at = time.monotonic()
+        job.first_output_at = None
+        worker = self.worker_factories[job.kind](job)
+        job.worker = worker
+        worker.finished.connect(functools.partial(self._on_worker_finished, job, worker))
+        worker.error.connect(functools.partial(self._on_worker_error, job, worker))
+        if hasattr(worker, 'partial'):
+            worker.partial.connect(functools.partial(self._on_worker_partial, job, worker))
+        self.running.append(job)
+        
+        if job.timeout_ms:
+            job.timer = QTimer()
+            job.timer.setSingleShot(True)
+            job.timer.timeout.connect(functools.partial(self._on_timeout, job, worker))
+            job.timer.start(job.timeout_ms)
+        
+        worker.start()
+    
+    def _is_current(self, job, worker):
+        return job.state == 'running' and job.worker is worker
+    
+    def _on_worker_partial(self, job, worker, text):
+        if not self._is_current(job, worker):
+            return
+        if job.first_output_at is None:
+            job.first_output_at = time.monotonic()
+        job.partial.emit(text)
+    
+    def _on_worker_finished(self, job, worker, result):
+        if not self._is_current(job, worker):
+            return
+        self._record_latency(job)
+        self._release(job)
+        job.state = 'done'
+        job.finished.emit(result)
+        self.dispatch()
+    
+    def _on_worker_error(self, job, worker, message):
+        if not self._is_current(job, worker):
+            return
+        self._release(job)
+        if getattr(worker, 'busy', False):
+            self._apply_backoff()
+            if job.attempts <= OLLAMA_BUSY_RETRIES:
+                # Ollama está lleno: reintentar la misma pregunta tras la espera
+                self._enqueue(job)
+                self.jobs_by_key[job.key] = job
+                self.dispatch()
+                return
+        job.state = 'done'
+        job.error.emit(message)
+        self.dispatch()
+    
+    def _on_timeout(self, job, worker):
+        if not self._is_current(job, worker):
+            return
+        self._release(job)
+        job.state = 'done'
+        job.error.emit("⏳ La respuesta tardó demasiado.")
+        self.dispatch()
+    
+    def _fail(self, job, message):
+        """Termina con error un trabajo que aún estaba en cola"""
+        self.queued -= 1
+        self.jobs_by_key.pop(job.key, None)
+        job.state = 'done'
+        job.error.emit(message)
+    
+    def _release(self, job):
+        """Saca el trabajo de ejecución y retira su hilo"""
+        if job.timer:
+            job.timer.stop()
+            job.timer = None
+        if job in self.running:
+            self.running.remove(job)
+        if self.jobs_by_key.get(job.key) is job:
+            del self.jobs_by_key[job.key]
+        
+        worker = job.worker
+        try:
+            worker.finished.disconnect()
+            worker.error.disconnect()
+            if hasattr(worker, 'partial'):
+                worker.partial.disconnect()
+        except:
+            pass
+        worker.stop()
+        # Un QThread destruido mientras corre cierra la aplicación
+        self.retired_workers = [w for w in self.retired_workers if w.isRunning()]
+        if worker.isRunning():
+            self.retired_workers.append(worker)
+    
+    def _record_latency(self, job):
+        """Ajusta el límite de concurrencia según lo que tardó Ollama en empezar a responder"""
+        if job.kind != 'llm':
+            return
+        first_output = (job.first_output_at or time.monotonic()) - job.started_at
+        if first_output > OLLAMA_SLOW_SECONDS:
+            if self.limit > 1:
+                self.limit -= 1
+                logger.warning("Ollama va lento (%.1f s): máximo %d peticiones a la vez", first_output, self.limit)
+        elif self.limit < self.max_concurrent:
+            self.limit += 1
+        self.backoff = 0.0
+    
+    def _apply_backoff(self):
+        self.backoff = min(max(1.0, self.backoff * 2), OLLAMA_BACKOFF_MAX)
+        self.resume_at = time.monotonic() + self.backoff
+        logger.warning("Ollama ocupado (503): se reintenta en %.0f s", self.backoff)
+    
+    def cancel(self, job):
+        """Cancela un trabajo en cola o en curso sin avisar a quien lo pidió"""
+        if job.state == 'queued':
+            self.queued -= 1
+            self.jobs_by_key.pop(job.key, None)
+        elif job.state == 'running':
+            self._release(job)
+        else:
+            return
+        job.state = 'cancelled'
+    
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'running': len(self.running),
+            'limit': self.limit,
+            'backoff': self.backoff,
+        }
+    
+    def shutdown(self):
+        """Cancela todo y espera (acotado) a que terminen los hilos"""
+        self.resume_timer.stop()
+        for job in list(self.jobs_by_key.values()):
+            self.cancel(job)
+        for worker in self.retired_workers:
+            worker.wait(1000)
+
 class TuxAssistant(QLabel):
-    def __init__(self):
+    def __init__(self, launch_ollama=False):
         super().__init__()
 
         self.tux_size = QSize(130, 130)
@@ -1487,8 +4732,10 @@ class TuxAssistant(QLabel):
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setFixedSize(self.tux_size)
 
-        self.animations = {}
-        self.load_animations()
+        self.animation_cache = AnimationCache(TUX_ANIMATIONS, self.tux_size,
+                                              device_pixel_ratio=self.devicePixelRatioF())
+        self.power_policy = AnimationPowerPolicy()
+        self.window_exposed = True
         
         self.current_animation = 'sentado'
         self.is_thinking = False
@@ -1512,26 +4759,66 @@ class TuxAssistant(QLabel):
         self.inactivity_timer.timeout.connect(self.check_inactivity)
         self.inactivity_timer.start(10000)
         
-        self.movie = self.animations.get('sentado', self.create_default_animation())
-        self.movie.setScaledSize(self.tux_size)
+        self.movie = self.animation_cache.get('sentado') or self.create_default_animation()
+        self.animation_cache.pin('sentado')
+        self.movie.frameChanged.connect(self.show_animation_frame)
         self.movie.start()
-        self.setMovie(self.movie)
+
+        self.screen_tracker = ScreenTracker(self)
+        
+        self.screen_tracker.screenChanged.connect(self.on_screen_changed)
 
         self.bubble = Bubble(play_sound=True)
         self.bubble.set_tux_assistant(self)
         self.thinking = ThinkingIndicator(self)
 
-        # Inicializar ventana de chat
-        self.chat_window = ChatWindow(self)
+        # La ventana de chat se crea con el primer doble clic
+        self.chat_window = None
+        self.first_frame_shown = False
         
         self.drag_offset = None
         self.initial_press_pos = None
-        self.ai_worker = None
+        
+        # Arrastre: como máximo un movimiento + colocación por frame de pantalla
+        self.pending_move = None
+        self.pending_since = None
+        self.pending_animate_chat = False
+        self.applying_frame = False
+        self.last_frame_time = 0.0
+        self.frame_timer = QTimer()
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.timeout.connect(self.apply_frame)
+        self.drag_stats = DragStats()
+        
+        # Conversación con el modelo (reutiliza el contexto entre preguntas)
+        self.conversation = ConversationSession()
+        self.answer_cache = AnswerCache()
+        
+        # Todo el trabajo del asistente pasa por el planificador
+        self.scheduler = AssistantScheduler({
+            'llm': lambda job: AIWorker(job.question, conversation=self.conversation, route=job.route),
+            'system': lambda job: SystemAnswerWorker(job.question, job.route),
+            'prefetch': lambda job: ModelWarmupWorker(),
+        })
+        
+        # Esperar a Ollama sin bloquear: las preguntas se encolan hasta que responda
+        self.ollama_ready_time = None
+        self.ollama_probe = OllamaReadinessProbe(started_at=ollama_launch_time, launch=launch_ollama)
+        self.ollama_probe.ready.connect(self.on_ollama_ready)
+        self.ollama_probe.failed.connect(self.on_ollama_failed)
+        self.ollama_probe.start()
+        
+        # Precarga del modelo
+        self.last_warmup_time = None
 
         self.bubble_closed_by_user = False
 
         self.position_at_bottom_right()
         self.show()
+        self.screen_tracker.attach_window()
+        if self.windowHandle():
+            # Saber si la ventana está tapada o la pantalla bloqueada
+            self.windowHandle().installEventFilter(self)
 
         QTimer.singleShot(
             800,
@@ -1555,39 +4842,75 @@ class TuxAssistant(QLabel):
         except Exception as e:
             self.move(100, 100)
 
-    def load_animations(self):
-        """Carga todas las animaciones disponibles"""
-        for name, path in TUX_ANIMATIONS.items():
-            if os.path.exists(path):
-                movie = QMovie(path)
-                movie.setScaledSize(self.tux_size)
-                self.animations[name] = movie
-
     def create_default_animation(self):
         """Crea una animación por defecto si no hay archivos"""
-        movie = QMovie()
-        movie.setScaledSize(self.tux_size)
-        return movie
+        return FrameAnimation()
     
     def set_animation(self, animation_name):
         """Cambia la animación actual"""
         if animation_name == self.current_animation:
             return
         
-        if animation_name in self.animations:
+        movie = self.animation_cache.get(animation_name)
+        if movie is not None:
             self.current_animation = animation_name
+            self.animation_cache.pin(animation_name)
             self.movie.stop()
-            self.movie = self.animations[animation_name]
-            self.movie.setScaledSize(self.tux_size)
+            try:
+                self.movie.frameChanged.disconnect(self.show_animation_frame)
+            except TypeError:
+                pass
+            self.movie = movie
+            self.movie.frameChanged.connect(self.show_animation_frame)
             self.movie.start()
-            self.setMovie(self.movie)
+            self.update_power_mode()
+
+    def update_power_mode(self):
+        """Elige el modo de energía de la animación según el estado de Tux"""
+        busy = self.is_thinking or self.is_moving or self.is_dragging
+        mode = self.power_policy.choose(self.window_exposed, busy, self.inactivity_state)
+        self.power_policy.set_mode(mode)
+        self.apply_power_mode()
+
+    def apply_power_mode(self):
+        """Aplica el modo de energía a la animación actual"""
+        speed = ANIMATION_POWER_SPEED[self.power_policy.mode]
+        if speed:
+            self.movie.setSpeed(speed)
+            self.movie.setPaused(False)
+        else:
+            # Imagen fija: ningún temporizador mientras tanto
+            self.movie.setPaused(True)
+
+    def eventFilter(self, obj, event):
+        """Eventos de la ventana nativa: exposición (tapada, minimizada, pantalla bloqueada)"""
+        if event.type() == QEvent.Expose and obj is self.windowHandle():
+            exposed = obj.isExposed()
+            if exposed and not self.first_frame_shown:
+                self.first_frame_shown = True
+                startup_mark('primer frame')
+            if exposed != self.window_exposed:
+                self.window_exposed = exposed
+                self.update_power_mode()
+        return super().eventFilter(obj, event)
+
+    def show_animation_frame(self, frame):
+        """Muestra el frame actual de la animación"""
+        self.setPixmap(self.movie.currentPixmap())
+
+    def on_screen_changed(self, screen):
+        """En una pantalla con otra densidad de píxeles se recargan los frames"""
+        if self.animation_cache.set_device_pixel_ratio(screen.devicePixelRatio() if screen else 1.0):
+            name = self.current_animation
+            self.current_animation = None
+            self.set_animation(name)
     
     def start_thinking_animation(self):
         """Inicia animación de búsqueda"""
         self.is_thinking = True
         
         import random
-        chosen_animation = random.choice(['busqueda', 'busqueda2'])
+        chosen_animation = random.choice(THINKING_ANIMATIONS)
         self.set_animation(chosen_animation)
     
     def stop_thinking_animation(self):
@@ -1628,7 +4951,10 @@ class TuxAssistant(QLabel):
     
     def check_inactivity(self):
         """Verifica inactividad con estados más controlados"""
+        self.animation_cache.evict_idle()
+        
         if self.is_thinking or self.is_moving or self.is_dragging:
+            self.update_power_mode()
             return
             
         current_time = time.time()
@@ -1675,6 +5001,8 @@ class TuxAssistant(QLabel):
                     import random
                     self.current_relaxed_animation = random.choice(relaxed_animations)
                     self.set_animation(self.current_relaxed_animation)
+        
+        self.update_power_mode()
     
     def update_activity_time(self):
         """Actualiza el tiempo de última actividad"""
@@ -1685,19 +5013,64 @@ class TuxAssistant(QLabel):
             self.relaxed_start_time = None
             if not self.is_thinking and not self.is_moving:
                 self.set_animation('sentado')
+            self.update_power_mode()
+        elif self.inactivity_state == 'idle':
+            # Volver a animar en cuanto hay actividad (sin esperar a check_inactivity)
+            self.inactivity_state = 'active'
+            self.idle_start_time = None
+            self.update_power_mode()
+
+    def on_ollama_ready(self, elapsed):
+        """Ollama ya responde: atender las preguntas en espera"""
+        self.ollama_ready_time = elapsed
+        logger.info("Ollama listo en %.2f s", elapsed)
+        
+        # Una pregunta en espera ya carga el modelo
+        had_questions = self.scheduler.pending() > 0
+        self.scheduler.set_ollama_state('ready')
+        if not had_questions:
+            self.warm_up_model()
+
+    def warm_up_model(self):
+        """Carga el modelo en segundo plano (y renueva su keep_alive)"""
+        if self.scheduler.ollama_state != 'ready':
+            return
+        if self.last_warmup_time and time.monotonic() - self.last_warmup_time < WARMUP_MIN_INTERVAL:
+            return
+        
+        self.last_warmup_time = time.monotonic()
+        self.scheduler.submit(AssistantJob('prefetch', priority=PRIORITY_BACKGROUND))
+
+    def on_ollama_failed(self, reason):
+        """Ollama no arrancó: responder con error a las preguntas en espera"""
+        logger.warning(reason)
+        self.scheduler.set_ollama_state('unavailable')
 
     def cleanup_threads(self):
         """Limpiar hilos antes de cerrar"""
-        if self.ai_worker and self.ai_worker.isRunning():
-            self.ai_worker.stop()
+        self.ollama_probe.stop()
+        self.ollama_probe.wait(2500)
+        
+        self.scheduler.shutdown()
+        logger.info("Latencias de Ollama: %s", ollama_client.stats())
+        logger.info("CPU por modo de animación: %s", self.power_policy.stats())
+        ollama_client.close()
+        
+        if system_sampler:
+            system_sampler.stop()
+        history_store.stop()
+        semantic_memory.stop()
+        logger.info("Memoria semántica: %s", semantic_memory.stats())
+        command_index.close()
         
         self.inactivity_timer.stop()
         self.walking_timer.stop()
         
-        try:
-            mixer.stop()
-        except:
-            pass
+        if audio_ready.is_set():
+            try:
+                mixer.stop()
+            except:
+                pass
 
     def say(self, text, play_sound=True):
         """Muestra un mensaje en la burbuja"""
@@ -1716,27 +5089,116 @@ class TuxAssistant(QLabel):
         
         self.bubble_closed_by_user = False
 
+    def begin_streamed_answer(self):
+        """Prepara la burbuja para una respuesta que llega por partes"""
+        self.bubble_closed_by_user = False
+        self.bubble.begin_stream()
+
+    def append_streamed_answer(self, text):
+        """Añade texto parcial a la burbuja si el usuario no la cerró"""
+        if self.bubble_closed_by_user:
+            return
+        
+        # Solo suena con el primer fragmento
+        first_chunk = not self.bubble.streamed_text
+        self.bubble.append_text(text, play_sound=first_chunk)
+        self.update_activity_time()
+
+    def finish_streamed_answer(self, answer):
+        """Muestra el texto final y programa el cierre de la burbuja"""
+        self.say(answer, play_sound=False)
+
     def update_bubble_position(self):
         """Actualiza la posición de la burbuja"""
         if self.bubble and self.bubble.isVisible():
             self.bubble.position_above_tux()
 
+    def get_chat_window(self):
+        """Ventana de chat (se construye la primera vez que se pide)"""
+        if self.chat_window is None:
+            started = time.perf_counter()
+            self.chat_window = ChatWindow(self)
+            logger.info("Ventana de chat creada en %.0f ms", (time.perf_counter() - started) * 1000)
+        return self.chat_window
+
+    def chat_visible(self):
+        return self.chat_window is not None and self.chat_window.isVisible()
+
+    def solve_layout(self, bubble=True, chat=True):
+        """Posiciones de la burbuja y el chat para la posición actual del Tux"""
+        geometry = self.geometry()
+        tux = Rect(geometry.x(), geometry.y(), geometry.width(), geometry.height())
+        return layout_solver.solve(
+            self.screen_tracker.index,
+            tux,
+            (self.bubble.width(), self.bubble.height()) if bubble else None,
+            (self.chat_window.width(), self.chat_window.height()) if chat else None
+        )
+
+    def update_follower_positions(self, animate_chat=False):
+        """Recoloca burbuja y chat visibles con un solo cálculo"""
+        bubble_visible = self.bubble.isVisible()
+        chat_visible = self.chat_visible()
+        if not bubble_visible and not chat_visible:
+            return
+        
+        placement = self.solve_layout(bubble=bubble_visible, chat=chat_visible)
+        if bubble_visible:
+            self.bubble.apply_placement(placement)
+        if chat_visible:
+            self.chat_window.apply_placement(placement, animate=animate_chat)
+
+    def frame_interval(self):
+        """Duración de un frame (s) según la frecuencia de la pantalla del Tux"""
+        screen = self.screen_tracker.current_screen
+        refresh_rate = screen.refreshRate() if screen else 0
+        return 1.0 / (refresh_rate if refresh_rate > 0 else 60)
+
+    def request_frame(self, animate_chat=False):
+        """Pide recolocar en el próximo frame (varias peticiones se juntan en una)"""
+        if self.pending_since is None:
+            self.pending_since = time.perf_counter()
+        self.pending_animate_chat = self.pending_animate_chat or animate_chat
+        
+        wait = self.last_frame_time + self.frame_interval() - time.perf_counter()
+        if wait <= 0:
+            # Ya pasó un frame desde la última vez: aplicar sin esperar
+            self.apply_frame()
+        elif not self.frame_timer.isActive():
+            self.frame_timer.start(int(wait * 1000) + 1)
+
+    def apply_frame(self):
+        """Aplica el último movimiento pendiente y recoloca burbuja y chat una vez"""
+        self.frame_timer.stop()
+        if self.pending_since is None:
+            return
+        
+        self.applying_frame = True
+        try:
+            if self.pending_move is not None:
+                self.move(self.pending_move)
+                self.pending_move = None
+            self.update_follower_positions(animate_chat=self.pending_animate_chat)
+        finally:
+            self.applying_frame = False
+        
+        now = time.perf_counter()
+        if self.is_dragging:
+            self.drag_stats.record_frame(now - self.pending_since)
+        self.last_frame_time = now
+        self.pending_since = None
+        self.pending_animate_chat = False
+
     def moveEvent(self, event):
         """Se ejecuta cuando el Tux se mueve"""
         super().moveEvent(event)
+        self.screen_tracker.update_position(event.pos())
         
-        # Actualizar posición de la burbuja
-        if self.bubble and self.bubble.isVisible():
-            QTimer.singleShot(20, self.update_bubble_position)
-        
-        # Actualizar posición del chat
-        if self.chat_window and self.chat_window.isVisible():
-            QTimer.singleShot(20, self.update_chat_position)
-
-    def update_chat_position(self):
-        """Actualiza la posición del chat"""
-        if self.chat_window and self.chat_window.isVisible():
-            self.chat_window.position_near_tux()
+        # Actualizar posición de la burbuja y del chat (durante el arrastre ya lo hace el frame)
+        if self.applying_frame or self.is_dragging:
+            return
+        if self.bubble.isVisible() or self.chat_visible():
+            self.request_frame()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -1759,6 +5221,7 @@ class TuxAssistant(QLabel):
             
             if not self.is_dragging and distance > self.drag_distance_threshold:
                 self.is_dragging = True
+                self.drag_stats.reset()
                 
                 if not self.is_thinking:
                     self.start_walking_animation()
@@ -1766,15 +5229,10 @@ class TuxAssistant(QLabel):
                 self.walking_timer.start(100)
             
             if self.is_dragging:
-                new_pos = event.globalPos() - self.drag_offset
-                self.move(new_pos)
-                
-                # Actualizar posiciones de burbuja y chat inmediatamente
-                if self.bubble and self.bubble.isVisible():
-                    self.bubble.position_above_tux()
-                
-                if self.chat_window and self.chat_window.isVisible():
-                    self.chat_window.position_near_tux_smooth()  # Usar versión suave
+                # Solo se aplica la última posición de cada frame (chat con animación suave)
+                self.pending_move = event.globalPos() - self.drag_offset
+                self.drag_stats.events += 1
+                self.request_frame(animate_chat=True)
                 
                 self.last_mouse_move_time = time.time()
         
@@ -1782,6 +5240,11 @@ class TuxAssistant(QLabel):
 
     def mouseReleaseEvent(self, event):
         if self.drag_offset:
+            if self.is_dragging:
+                # Dejar al Tux donde se soltó
+                self.apply_frame()
+                logger.info("Arrastre: %s", self.drag_stats.report())
+            
             self.drag_offset = None
             self.initial_press_pos = None
             self.is_dragging = False
@@ -1800,36 +5263,12 @@ class TuxAssistant(QLabel):
     def mouseDoubleClickEvent(self, event):
         """Muestra la ventana de chat al hacer doble clic"""
         if event.button() == Qt.LeftButton:
-            self.chat_window.show_chat()
+            self.get_chat_window().show_chat()
+            # Es probable que venga una pregunta: asegurar que el modelo esté cargado
+            self.warm_up_model()
         
         self.update_activity_time()
 
-    def on_ai_response(self, answer):
-        self.thinking.stop()
-        self.stop_thinking_animation()
-        self.say(f"{answer}", play_sound=True)
-
-        if self.ai_worker:
-            try:
-                self.ai_worker.finished.disconnect()
-                self.ai_worker.error.disconnect()
-            except:
-                pass
-            self.ai_worker = None
-
-    def on_ai_error(self, error_msg):
-        self.thinking.stop()
-        self.stop_thinking_animation()
-        self.say(error_msg, play_sound=True)
-        
-        if self.ai_worker:
-            try:
-                self.ai_worker.finished.disconnect()
-                self.ai_worker.error.disconnect()
-            except:
-                pass
-            self.ai_worker = None
-
 def close_app(sig=None, frame=None):
     app = QApplication.instance()
     if app:
@@ -1843,13 +5282,19 @@ signal.signal(signal.SIGINT, close_app)
 signal.signal(signal.SIGTERM, close_app)
 
 if __name__ == "__main__":
-    ollama_process = None
+    logging.basicConfig(
+        level=logging.DEBUG if os.environ.get("TUX_DEBUG") else logging.WARNING,
+        format="%(asctime)s [%(name)s] %(message)s"
+    )
+    
     try:
-        audio_initialized = init_audio()
-        ollama_process = start_ollama()
+        startup_mark('imports')
+        start_background_services()
         
         app = QApplication(sys.argv)
-        tux = TuxAssistant()
+        startup_mark('QApplication')
+        tux = TuxAssistant(launch_ollama=True)
+        startup_mark('TuxAssistant')
         
         app.aboutToQuit.connect(lambda: tux.cleanup_threads())
         
@@ -1868,9 +5313,10 @@ if __name__ == "__main__":
             except subprocess.TimeoutExpired:
                 ollama_process.kill()
 
-        try:
-            pygame.quit()
-        except:
-            pass
+        if pygame:
+            try:
+                pygame.quit()
+            except:
+                pass
     
     sys.exit(exit_code)
\ No newline at end of file